@@ -3,6 +3,7 @@ from copy import deepcopy
 from Agents.Core.Agent import Agent
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.Core.PrioritizedReplayMemory import PrioritizedReplayMemory
+from Agents.Core.FlatParameters import sync_net
 from utils.utils import torchvector
 import random
 import torch
@@ -221,7 +222,7 @@ class A3CWorker(mp.Process):
         self.globalOptimizer.step()
         #
         # # update local net
-        self.localNet.load_state_dict(self.globalNet.state_dict())
+        sync_net(self.localNet, self.globalNet)
 
         #if self.totalStep % self.lossRecordStep == 0:
         #    self.losses.append([self.globalStepCount, self.epIdx, loss])
@@ -0,0 +1,157 @@
+import contextlib
+import threading
+from copy import deepcopy
+from Agents.Core.FlatParameters import sync_net
+
+
+def overridden_methods(agent, baseClass, names):
+    '''
+    names of methods of baseClass which the class of agent overrides. Actor learner training runs the episode loop and
+    the learner step of baseClass, overrides of these methods would not be called
+    '''
+    return [name for name in names if getattr(type(agent), name) is not getattr(baseClass, name)]
+
+
+class ActorLearner(object):
+    """class to run environment stepping in actor threads and gradient updates in the learner thread of one process.
+        Actors run episodes with their own environments and select actions with a copy of the policy net, which the
+        learner refreshes every syncStep updates. Actors and learner share the replay memory of the agent, every access
+        to it holds the memoryLock of the agent. The learner performs updateToDataRatio gradient updates per environment
+        step of all actors on average, counted from the step at which the memory is ready for learning. It waits for
+        new experiences when it is ahead, and actors wait when the learner is more than maxUpdateLag updates behind.
+        Torch kernels and C++ simulators release the GIL, so environment steps overlap with forward and backward
+        passes of the learner.
+        # Argument
+        net: policy net of the agent, actors use a copy of it
+        numActors: number of actor threads
+        numEpisodes: total number of episodes run by all actors
+        updateToDataRatio: gradient updates per environment step
+        syncStep: number of updates between refreshes of the policy copy of the actors
+        maxUpdateLag: number of updates the learner can be behind before actors wait
+        """
+    def __init__(self, net, numActors, numEpisodes, updateToDataRatio=1.0, syncStep=1, maxUpdateLag=100):
+        self.net = net
+        self.actorNet = deepcopy(net)
+        self.numActors = numActors
+        self.numEpisodes = numEpisodes
+        self.updateToDataRatio = updateToDataRatio
+        self.syncStep = syncStep
+        self.maxUpdateLag = maxUpdateLag
+        # lock of the policy copy
+        self.netLock = threading.Lock()
+        # lock for bookkeeping of the agent shared by actors, e.g., step counts and episode rewards
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.envSteps = 0
+        self.updates = 0
+        self.startSteps = None
+        self.episodes = 0
+        self.ready = None
+        self.numRunning = 0
+        self.stopped = False
+        self.errors = []
+
+    @contextlib.contextmanager
+    def policy(self):
+        '''
+        context giving the policy copy of the actors, the learner does not refresh it meanwhile
+        '''
+        with self.netLock:
+            yield self.actorNet
+
+    def sync(self):
+        '''
+        refresh the policy copy of the actors from the policy net
+        '''
+        with self.netLock:
+            sync_net(self.actorNet, self.net)
+
+    def start_episode(self):
+        '''
+        called by actors before each episode, return False when all episodes are started or training stops
+        '''
+        with self.condition:
+            if self.stopped or self.episodes >= self.numEpisodes:
+                return False
+            self.episodes += 1
+            return True
+
+    def check_ready(self):
+        # learning starts with the environment step at which the memory becomes ready, as in serial training
+        if self.startSteps is None and self.ready is not None and self.ready():
+            self.startSteps = self.envSteps - 1
+
+    def owed_updates(self):
+        if self.startSteps is None:
+            return 0
+        return self.updateToDataRatio * (self.envSteps - self.startSteps) - self.updates
+
+    def step(self):
+        '''
+        called by actors after each environment step, block while the learner is more than maxUpdateLag updates
+        behind. return False when training stops
+        '''
+        with self.condition:
+            self.envSteps += 1
+            self.check_ready()
+            self.condition.notify_all()
+            while not self.stopped and self.owed_updates() > self.maxUpdateLag:
+                self.condition.wait()
+            return not self.stopped
+
+    def wait_update(self):
+        '''
+        block until an update is due, return False when actors are done and no update is owed
+        '''
+        with self.condition:
+            while not self.stopped:
+                if self.owed_updates() >= 1:
+                    return True
+                if self.numRunning == 0:
+                    return False
+                self.condition.wait()
+            return False
+
+    def run_actor(self, actor, actorIdx):
+        try:
+            actor(actorIdx)
+        except Exception as e:
+            # re-raised in the learner thread
+            with self.condition:
+                self.errors.append(e)
+                self.stopped = True
+        finally:
+            with self.condition:
+                self.numRunning -= 1
+                self.condition.notify_all()
+
+    def run(self, actor, learner, ready):
+        '''
+        start the actor threads and perform gradient updates in the calling thread until all episodes are done.
+        actor(actorIdx): runs episodes in actor thread actorIdx, calling start_episode and step
+        learner(): performs one gradient update
+        ready(): whether the memory holds enough experiences to learn from
+        '''
+        self.sync()
+        self.ready = ready
+        self.numRunning = self.numActors
+        threads = [threading.Thread(target=self.run_actor, args=(actor, actorIdx), daemon=True)
+                   for actorIdx in range(self.numActors)]
+        for thread in threads:
+            thread.start()
+        try:
+            while self.wait_update():
+                learner()
+                with self.condition:
+                    self.updates += 1
+                    self.condition.notify_all()
+                if self.updates % self.syncStep == 0:
+                    self.sync()
+        finally:
+            with self.condition:
+                self.stopped = True
+                self.condition.notify_all()
+            for thread in threads:
+                thread.join()
+        if self.errors:
+            raise self.errors[0]
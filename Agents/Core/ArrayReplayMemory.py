@@ -0,0 +1,227 @@
+from collections import namedtuple
+import random
+import numpy as np
+import torch
+
+from Agents.Core.ReplayMemory import Transition
+from Agents.Core.StateCodec import RawCodec
+
+# a minibatch of experiences gathered from array storage.
+# nonFinalNextState only contains next states of non-terminal transitions, in the same order as nonFinalMask
+TransitionBatch = namedtuple('TransitionBatch',
+                             ('state', 'action', 'nonFinalNextState', 'reward', 'nonFinalMask'))
+
+
+def state_to_tensor(state, device, dtype=torch.float32):
+    '''
+    convert a batch of states (array or dictionary of arrays) sampled from ArrayReplayMemory to torch tensors
+    '''
+    if isinstance(state, dict):
+        return {key: torch.from_numpy(value).to(device, dtype=dtype) for key, value in state.items()}
+    return torch.from_numpy(state).to(device, dtype=dtype)
+
+
+def map_state(func, state):
+    # apply func to array states or to each field of dictionary states
+    if isinstance(state, dict):
+        return {key: func(value) for key, value in state.items()}
+    return func(state)
+
+
+class ArrayReplayMemory(object):
+    """class to store experience in preallocated numpy arrays and sample minibatch experience for training.
+        Columns for state, action, next_state, reward and done flag are allocated from the first pushed transition
+        and experiences are then written into them in a ring buffer fashion. Sampling returns a TransitionBatch of
+        numpy arrays obtained by one fancy-indexing gather per column.
+        A terminal transition is indicated by next_state being None, same as ReplayMemory.
+        States can be numpy arrays or dictionaries of numpy arrays (e.g., {'sensor': ..., 'target': ...}). For
+        dictionary states, each field is stored in its own column and sampled states are dictionaries of arrays.
+        Each state field is encoded by a codec (see StateCodec) when pushed and decoded in batch when sampled.
+        # Argument
+        capacity: number of experiences to store. Depending on the complexicity of problem, typical capacity ranges from 1k to 1M.
+        stateDtype: dtype used to store state and next_state. If None, it is inferred from the first pushed state.
+        actionDtype: dtype used to store action. If None, it is inferred from the first pushed action.
+        codecs: codec for array states or dictionary of codecs keyed by state field for dictionary states.
+        Fields without codec are stored raw.
+        schema: StateSchema for dictionary states. If given, state columns are allocated from the declared fields instead
+        of the first pushed state, and codecs given above override the codecs of the schema.
+        """
+    def __init__(self, capacity, stateDtype=None, actionDtype=None, codecs=None, schema=None):
+        self.capacity = capacity
+        self.stateDtype = stateDtype
+        self.actionDtype = actionDtype
+        self.codecs = codecs
+        self.schema = schema
+        self.position = 0
+        self.size = 0
+        self.columns = None
+        # None for array states, list of fields for dictionary states
+        self.stateKeys = None
+        self.stateCodecs = None
+        # total number of pushed experiences
+        self.pushCount = 0
+
+    def allocate_column(self, name, shape, dtype, rows=None):
+        '''
+        allocate storage for one column, the first dimension is the number of rows, default to the capacity
+        '''
+        rows = self.capacity if rows is None else rows
+        return np.zeros((rows,) + tuple(shape), dtype=dtype)
+
+    def allocate(self, transition):
+        '''
+        allocate all columns based on the shape and dtype of the first transition
+        '''
+        action = np.asarray(transition.action, dtype=self.actionDtype)
+
+        self.columns = {}
+        self.allocate_state_columns(transition.state, ['state', 'next_state'])
+        self.columns['action'] = self.allocate_column('action', action.shape, action.dtype)
+        self.columns['reward'] = self.allocate_column('reward', (), np.float32)
+        self.columns['done'] = self.allocate_column('done', (), np.bool_)
+
+    def allocate_state_columns(self, state, prefixes, rows=None):
+        '''
+        set up the codec of each state field and allocate one column per field and prefix
+        '''
+        fieldCodecs = self.codecs if isinstance(self.codecs, dict) else {}
+        if self.schema is not None:
+            self.stateKeys = list(self.schema.keys)
+            self.stateCodecs = self.schema.make_codecs()
+            self.stateCodecs.update({key: codec for key, codec in fieldCodecs.items() if key in self.stateKeys})
+            fieldSpecs = {key: (self.schema.shapes[key], self.schema.dtypes[key]) for key in self.stateKeys}
+        elif isinstance(state, dict):
+            self.stateKeys = list(state.keys())
+            self.stateCodecs = {key: fieldCodecs[key] if key in fieldCodecs else RawCodec(self.stateDtype)
+                                for key in self.stateKeys}
+            fieldSpecs = {key: (np.shape(state[key]), np.asarray(state[key]).dtype) for key in self.stateKeys}
+        else:
+            self.stateCodecs = {None: self.codecs if self.codecs is not None else RawCodec(self.stateDtype)}
+            fieldSpecs = {None: (np.shape(state), np.asarray(state).dtype)}
+
+        for key, codec in self.stateCodecs.items():
+            shape, dtype = codec.setup(*fieldSpecs[key])
+            for prefix in prefixes:
+                name = self.state_column(prefix, key)
+                self.columns[name] = self.allocate_column(name, shape, dtype, rows)
+
+    def state_column(self, prefix, key):
+        # column name of a state field, e.g., state for array states and state.sensor for dictionary states
+        return prefix if key is None else prefix + '.' + key
+
+    def push(self, *args):
+        """Saves a transition"""
+        if len(args) == 1 and isinstance(*args, Transition):
+            transition = args[0]
+        else:
+            transition = Transition(*args)
+
+        if self.columns is None:
+            self.allocate(transition)
+
+        self.write(self.position, transition)
+
+        # write on the earlier experience
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.pushCount += 1
+
+    def write(self, idx, transition):
+        '''
+        write a single transition into row idx of all columns
+        '''
+        self.write_row(self.columns, idx, transition)
+
+    def write_row(self, columns, row, transition):
+        self.write_state(columns, 'state', row, transition.state)
+        columns['action'][row] = transition.action
+        columns['reward'][row] = transition.reward
+        if transition.next_state is None:
+            columns['done'][row] = True
+        else:
+            columns['done'][row] = False
+            self.write_state(columns, 'next_state', row, transition.next_state)
+
+    def write_state(self, columns, prefix, row, state):
+        if self.stateKeys is None:
+            columns[prefix][row] = self.stateCodecs[None].encode(state)
+        else:
+            for key in self.stateKeys:
+                columns[self.state_column(prefix, key)][row] = self.stateCodecs[key].encode(state[key])
+
+    def read_state(self, prefix, idx):
+        '''
+        read and decode states at rows idx, return an array or a dictionary of arrays
+        '''
+        if self.stateKeys is None:
+            return self.stateCodecs[None].decode(self.read(prefix, idx))
+        return {key: self.stateCodecs[key].decode(self.read(self.state_column(prefix, key), idx))
+                for key in self.stateKeys}
+
+    def read(self, name, idx):
+        '''
+        read rows idx of one column
+        '''
+        return self.columns[name][idx]
+
+    def sample_index(self, batch_size):
+        # sample indices without replacement, same as random.sample on a list of experiences
+        return np.array(random.sample(range(self.size), batch_size), dtype=np.int64)
+
+    def gather(self, idx):
+        '''
+        gather experiences at indices idx into a TransitionBatch of numpy arrays
+        '''
+        nonFinalMask = ~self.read('done', idx)
+        return TransitionBatch(self.read_state('state', idx),
+                               self.read('action', idx),
+                               self.read_state('next_state', idx[nonFinalMask]),
+                               self.read('reward', idx),
+                               nonFinalMask)
+
+    def sample(self, batch_size):
+        # sample of minibatch of experiences
+        return self.gather(self.sample_index(batch_size))
+
+    def fetch_all(self):
+        return self.gather(np.arange(self.size))
+
+    def clear(self):
+        self.position = 0
+        self.size = 0
+        self.pushCount = 0
+
+    # experience k is written at row k % capacity, see MemoryCheckpoint
+    def write_count(self):
+        return self.pushCount
+
+    def read_slots(self, slots):
+        if self.columns is None:
+            return None
+        return {name: column[slots] for name, column in self.columns.items()}
+
+    def write_slots(self, slots, data):
+        if data is None:
+            return
+        if self.columns is None:
+            self.columns = {name: self.allocate_column(name, value.shape[1:], value.dtype)
+                            for name, value in data.items()}
+        for name, value in data.items():
+            self.columns[name][slots] = value
+
+    def get_checkpoint_state(self):
+        return {'position': self.position, 'size': self.size, 'pushCount': self.pushCount,
+                'stateKeys': self.stateKeys, 'stateCodecs': self.stateCodecs}
+
+    def set_checkpoint_state(self, state):
+        self.position = state['position']
+        self.size = state['size']
+        self.pushCount = state['pushCount']
+        self.stateKeys = state['stateKeys']
+        self.stateCodecs = state['stateCodecs']
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return 'ArrayReplayMemory(capacity={}, size={}, position={})'.format(self.capacity, self.size, self.position)
@@ -0,0 +1,167 @@
+import warnings
+import torch
+from Agents.Core.Precision import autocast_context
+
+
+COMPILE_MODES = ['eager', 'compile', 'trace']
+
+
+def full_next_state(nonFinalNextState, nonFinalMask):
+    '''
+    return the next states of the whole minibatch with shape (batch, ...), terminal next states are zeros.
+    The compiled losses see the same shapes in every update this way, independent of the number of terminal
+    experiences. Return None for dictionary states
+    '''
+    if not torch.is_tensor(nonFinalNextState) or not torch.is_tensor(nonFinalMask):
+        return None
+    nextState = nonFinalNextState.new_zeros((nonFinalMask.shape[0],) + tuple(nonFinalNextState.shape[1:]))
+    if len(nonFinalNextState):
+        nextState[nonFinalMask] = nonFinalNextState
+    return nextState
+
+
+class DQNLoss(torch.nn.Module):
+    """class of the loss of DQN type agents as a function of fixed shape minibatch tensors.
+        Next states of the whole minibatch are evaluated and terminal ones are masked out (see full_next_state),
+        instead of indexing the non terminal next states. Targets are detached, there is no gradient flow from them.
+        # Argument
+        policyNet, targetNet: networks of the agent
+        updateOption: targetNet or doubleQ
+        lossFunc: element wise loss, e.g., mse with reduction none
+        gamma: discount of the next state values
+        fuseForward: evaluate states and next states in one policy net forward for doubleQ
+        precision: fp32 or bf16 (see Precision)
+        device: device of the networks
+        """
+    def __init__(self, policyNet, targetNet, updateOption, lossFunc, gamma, fuseForward=True, precision='fp32',
+                 device='cpu'):
+        super(DQNLoss, self).__init__()
+        if updateOption not in ('targetNet', 'doubleQ'):
+            raise NotImplementedError
+        self.policyNet = policyNet
+        self.targetNet = targetNet
+        self.updateOption = updateOption
+        self.lossFunc = lossFunc
+        self.gamma = gamma
+        self.fuseForward = fuseForward
+        self.precision = precision
+        self.device = device
+
+    def forward(self, state, action, reward, nextState, nonFinalMask):
+        '''
+        return the element wise loss and the detached TD errors, both with shape (batch, 1).
+        nonFinalMask is a float tensor with shape (batch,)
+        '''
+        batchSize = state.shape[0]
+        with autocast_context(self.precision, self.device):
+            nextAction = None
+            if self.updateOption == 'doubleQ' and self.fuseForward:
+                Q = self.policyNet(torch.cat((state, nextState)))
+                QValues = Q[:batchSize].gather(1, action).float()
+                nextAction = Q[batchSize:].detach().max(1)[1].unsqueeze(-1)
+            else:
+                QValues = self.policyNet(state).gather(1, action).float()
+            if self.updateOption == 'doubleQ':
+                if nextAction is None:
+                    nextAction = self.policyNet(nextState).detach().max(1)[1].unsqueeze(-1)
+                QNext = self.targetNet(nextState).detach().gather(1, nextAction).squeeze(-1).float()
+            else:
+                QNext = self.targetNet(nextState).detach().max(1)[0].float()
+
+        targetValues = reward + self.gamma * (QNext * nonFinalMask).unsqueeze(-1)
+        return self.lossFunc(QValues, targetValues), (QValues - targetValues).detach()
+
+
+class DDPGCriticLoss(torch.nn.Module):
+    """class of the critic loss of DDPG agents as a function of fixed shape minibatch tensors.
+        Next states of the whole minibatch are evaluated and terminal ones are masked out (see full_next_state).
+        # Argument
+        criticNet, actorNet_target, criticNet_target: networks of the agent
+        lossFunc: loss of Q values and their targets, e.g., mse
+        gamma: discount of the next state values
+        precision: fp32 or bf16 (see Precision)
+        device: device of the networks
+        """
+    def __init__(self, criticNet, actorNet_target, criticNet_target, lossFunc, gamma, precision='fp32', device='cpu'):
+        super(DDPGCriticLoss, self).__init__()
+        self.criticNet = criticNet
+        self.actorNet_target = actorNet_target
+        self.criticNet_target = criticNet_target
+        self.lossFunc = lossFunc
+        self.gamma = gamma
+        self.precision = precision
+        self.device = device
+
+    def forward(self, state, action, reward, nextState, nonFinalMask):
+        with autocast_context(self.precision, self.device):
+            QValues = self.criticNet.forward(state, action).squeeze().float()
+            nextAction = self.actorNet_target.forward(nextState).detach()
+            QNext = self.criticNet_target.forward(nextState, nextAction).detach().squeeze().float()
+
+        targetValues = reward + self.gamma * QNext * nonFinalMask
+        return self.lossFunc(QValues, targetValues)
+
+
+class DDPGActorLoss(torch.nn.Module):
+    """class of the actor loss of DDPG agents, the negative mean critic value of the actions of the actor.
+        # Argument
+        actorNet, criticNet: networks of the agent
+        precision: fp32 or bf16 (see Precision)
+        device: device of the networks
+        """
+    def __init__(self, actorNet, criticNet, precision='fp32', device='cpu'):
+        super(DDPGActorLoss, self).__init__()
+        self.actorNet = actorNet
+        self.criticNet = criticNet
+        self.precision = precision
+        self.device = device
+
+    def forward(self, state):
+        with autocast_context(self.precision, self.device):
+            return -self.criticNet.forward(state, self.actorNet.forward(state)).float().mean()
+
+
+class CompiledLoss(object):
+    """class to run a loss module through a compiled graph for fixed input shapes.
+        The graph is built at the first call for the shapes, dtypes and devices of its inputs, and its backward pass
+        is compiled as well. Calls with other input shapes, e.g., a minibatch of a different size, run the eager
+        module instead of compiling another graph. If compiling fails, the module runs eagerly from then on.
+        The networks in the loss module keep their parameter objects, optimizer steps, target net syncs and
+        load_state_dict update them in place and are seen by the graph.
+        # Argument
+        lossModule: a torch.nn.Module computing losses from tensors
+        compileMode: compile (torch.compile), trace (torch.jit.trace) or eager
+        """
+    def __init__(self, lossModule, compileMode='compile'):
+        if compileMode not in COMPILE_MODES:
+            raise ValueError('compileMode is invalid')
+        self.lossModule = lossModule
+        self.compileMode = compileMode
+        self.signature = None
+        self.compiled = None
+
+    def compile(self, inputs):
+        if self.compileMode == 'trace':
+            # forward passes are recorded once, the traced graph keeps the parameters of the networks
+            return torch.jit.trace(self.lossModule, inputs, check_trace=False)
+        if self.compileMode == 'compile' and hasattr(torch, 'compile'):
+            return torch.compile(self.lossModule, dynamic=False)
+        return None
+
+    def __call__(self, *inputs):
+        signature = tuple((x.shape, x.dtype, x.device) for x in inputs)
+        if self.signature is None:
+            self.signature = signature
+            if self.compileMode != 'eager':
+                try:
+                    self.compiled = self.compile(inputs)
+                    if self.compiled is not None:
+                        # torch.compile builds the graph at the first call
+                        return self.compiled(*inputs)
+                except Exception as e:
+                    warnings.warn('compiling the loss failed, running eagerly: {}'.format(e))
+                    self.compiled = None
+
+        if self.compiled is not None and signature == self.signature:
+            return self.compiled(*inputs)
+        return self.lossModule(*inputs)
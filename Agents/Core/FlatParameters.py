@@ -0,0 +1,117 @@
+import copy
+import torch
+
+
+class FlatParameters(object):
+    """class to back all parameters of a network with one flat contiguous tensor.
+        The parameters of net are copied into the flat tensor and become views of it, so that copying, averaging or
+        sharing the weights of networks with the same architecture (e.g., policy and target nets, local and global
+        nets) is one operation on the flat tensors instead of per tensor operations through state_dict. The parameter
+        objects are kept, so optimizers and load_state_dict work as before. It applies to any torch.nn.Module, e.g.,
+        the nets in MLPNet, DuelingNet or user defined CNNs.
+        The FlatParameters is attached to the network as net.flatParameters and survives deepcopy, torch.save, pickle
+        and passing the network to other processes. Copies made by deepcopy and plain pickle are flattened again.
+        After share_memory_(), processes started afterwards share the flat tensor without copies.
+        Flatten a network after moving it to its device, moving it to another device afterwards breaks the views
+        (see intact). Buffers, e.g., running statistics of batch normalization, are not flattened and are copied
+        one by one.
+        # Argument
+        net: a torch.nn.Module whose parameters have the same dtype and device
+        """
+    def __init__(self, net):
+        self.params = list(net.parameters())
+        self.buffers = list(net.buffers())
+        if len(set((p.dtype, p.device) for p in self.params)) > 1:
+            raise ValueError('parameters need the same dtype and device to be flattened')
+
+        self.flatten()
+        net.flatParameters = self
+
+    def flatten(self):
+        '''
+        copy the parameters into a new flat tensor and make them views of it
+        '''
+        if self.params:
+            self.flat = torch.cat([p.detach().reshape(-1) for p in self.params])
+        else:
+            self.flat = torch.zeros(0)
+        self.offsets = []
+        offset = 0
+        for p in self.params:
+            p.data = self.flat[offset:offset + p.numel()].view_as(p)
+            self.offsets.append(offset)
+            offset += p.numel()
+
+    def __deepcopy__(self, memo):
+        # deepcopy clones parameters one by one, the copies are flattened again
+        other = FlatParameters.__new__(FlatParameters)
+        other.params = [copy.deepcopy(p, memo) for p in self.params]
+        other.buffers = [copy.deepcopy(b, memo) for b in self.buffers]
+        other.flatten()
+        return other
+
+    def __setstate__(self, state):
+        # plain pickle restores the parameters as separate tensors, they are flattened again. torch.save and passing
+        # to other processes keep the views
+        self.__dict__.update(state)
+        if not self.intact():
+            self.flatten()
+
+    def intact(self):
+        '''
+        whether all parameters are still views of the flat tensor
+        '''
+        base = self.flat.data_ptr()
+        itemSize = self.flat.element_size()
+        return all(p.data_ptr() == base + offset * itemSize for p, offset in zip(self.params, self.offsets))
+
+    def copy_(self, other):
+        '''
+        copy the weights of a network with the same architecture
+        '''
+        with torch.no_grad():
+            self.flat.copy_(other.flat)
+            for buffer, otherBuffer in zip(self.buffers, other.buffers):
+                buffer.copy_(otherBuffer)
+        return self
+
+    def share_memory_(self):
+        '''
+        move the flat tensor and the buffers to shared memory, parameters stay views of it
+        '''
+        self.flat.share_memory_()
+        for buffer in self.buffers:
+            buffer.share_memory_()
+        return self
+
+
+def flat_parameters(net):
+    '''
+    return the FlatParameters of net if its parameters are backed by an intact flat tensor, otherwise None
+    '''
+    flat = getattr(net, 'flatParameters', None)
+    if flat is not None and flat.intact():
+        return flat
+    return None
+
+
+def flatten_parameters(net):
+    '''
+    back the parameters of net with a flat tensor unless it is already done, return the FlatParameters
+    '''
+    flat = flat_parameters(net)
+    if flat is None:
+        flat = FlatParameters(net)
+    return flat
+
+
+def sync_net(targetNet, net):
+    '''
+    copy the weights of net to targetNet, with one contiguous copy if both are flattened with the same layout
+    '''
+    targetFlat = flat_parameters(targetNet)
+    flat = flat_parameters(net)
+    if targetFlat is not None and flat is not None and targetFlat.flat.shape == flat.flat.shape:
+        targetFlat.copy_(flat)
+    else:
+        targetNet.load_state_dict(net.state_dict())
@@ -0,0 +1,148 @@
+from collections import OrderedDict
+import random
+import numpy as np
+
+from Agents.Core.ReplayMemory import Transition
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory, TransitionBatch
+
+
+class FrameReplayMemory(ArrayReplayMemory):
+    """class to store each observation only once and let experiences refer to them by index.
+        The next_state of a transition is usually the state of the following transition, so ArrayReplayMemory keeps
+        most observations twice. Here observations are stored in a frame table, which is a ring buffer of its own,
+        and each experience stores (state frame, action, reward, next state frame or -1 for terminal).
+        An observation is recognized as already stored when the very same object is pushed again within the last
+        frameLookback stored frames, e.g., when the agent pushes state = nextState of the previous step. States
+        should therefore not be modified in place after being pushed.
+        When a frame is overwritten, the oldest experiences are evicted until none of the remaining experiences can
+        refer to it, so the number of experiences can be smaller than capacity if frameCapacity is too small
+        (e.g., very short episodes or hindsight experiences, which have their own observations).
+        # Argument
+        capacity: number of experiences to store.
+        frameCapacity: number of observations to store. Default is 1.1 x capacity plus frameLookback.
+        frameLookback: number of recently stored observations checked for reuse.
+        stateDtype: dtype used to store states. If None, it is inferred from the first pushed state.
+        actionDtype: dtype used to store action. If None, it is inferred from the first pushed action.
+        codecs: codec for array states or dictionary of codecs keyed by state field for dictionary states.
+        schema: StateSchema for dictionary states, see ArrayReplayMemory.
+        """
+    def __init__(self, capacity, frameCapacity=None, frameLookback=32, stateDtype=None, actionDtype=None, codecs=None, schema=None):
+        super(FrameReplayMemory, self).__init__(capacity, stateDtype, actionDtype, codecs, schema)
+        self.frameLookback = frameLookback
+        self.frameCapacity = frameCapacity
+        if self.frameCapacity is None:
+            self.frameCapacity = capacity + capacity // 10 + frameLookback
+        if self.frameCapacity <= self.frameLookback + 2:
+            raise ValueError('frameCapacity should be larger than frameLookback + 2')
+        # total number of frames ever stored, frame n is stored at row n % frameCapacity
+        self.frameCount = 0
+        # the oldest experience
+        self.tail = 0
+        # id of recently stored observations -> (observation, frame number)
+        self.recentFrames = OrderedDict()
+
+    def allocate(self, transition):
+        action = np.asarray(transition.action, dtype=self.actionDtype)
+
+        self.columns = {}
+        self.allocate_state_columns(transition.state, ['frame'], self.frameCapacity)
+        self.columns['stateFrame'] = self.allocate_column('stateFrame', (), np.int64)
+        self.columns['nextStateFrame'] = self.allocate_column('nextStateFrame', (), np.int64)
+        # experiences are evicted once a frame at or before evictFrame is overwritten
+        self.columns['evictFrame'] = self.allocate_column('evictFrame', (), np.int64)
+        self.columns['action'] = self.allocate_column('action', action.shape, action.dtype)
+        self.columns['reward'] = self.allocate_column('reward', (), np.float32)
+        self.columns['done'] = self.allocate_column('done', (), np.bool_)
+
+    def add_frame(self, state):
+        '''
+        store an observation if it is not stored recently and return its row in the frame table
+        '''
+        key = id(state)
+        if key in self.recentFrames and self.recentFrames[key][0] is state:
+            return self.recentFrames[key][1] % self.frameCapacity
+
+        frame = self.frameCount
+        if frame >= self.frameCapacity:
+            self.evict(frame - self.frameCapacity)
+        self.write_state(self.columns, 'frame', frame % self.frameCapacity, state)
+        self.frameCount += 1
+
+        # keep a reference so that the id is not reused by another object while in the lookback window
+        self.recentFrames[key] = (state, frame)
+        if len(self.recentFrames) > self.frameLookback:
+            self.recentFrames.popitem(last=False)
+        return frame % self.frameCapacity
+
+    def evict(self, overwrittenFrame):
+        '''
+        evict the oldest experiences that may refer to the frame to be overwritten
+        '''
+        while self.size > 0 and self.columns['evictFrame'][self.tail] <= overwrittenFrame:
+            self.tail = (self.tail + 1) % self.capacity
+            self.size -= 1
+
+    def push(self, *args):
+        """Saves a transition"""
+        if len(args) == 1 and isinstance(*args, Transition):
+            transition = args[0]
+        else:
+            transition = Transition(*args)
+
+        if self.columns is None:
+            self.allocate(transition)
+
+        # frames referred by this experience are not older than the lookback window
+        evictFrame = self.frameCount - self.frameLookback
+        stateFrame = self.add_frame(transition.state)
+        nextStateFrame = -1 if transition.next_state is None else self.add_frame(transition.next_state)
+
+        if self.size == self.capacity:
+            self.tail = (self.tail + 1) % self.capacity
+            self.size -= 1
+
+        row = (self.tail + self.size) % self.capacity
+        self.columns['stateFrame'][row] = stateFrame
+        self.columns['nextStateFrame'][row] = nextStateFrame
+        self.columns['evictFrame'][row] = evictFrame
+        self.columns['action'][row] = transition.action
+        self.columns['reward'][row] = transition.reward
+        self.columns['done'][row] = transition.next_state is None
+
+        self.size += 1
+        self.position = (row + 1) % self.capacity
+
+    def sample_index(self, batch_size):
+        offset = np.array(random.sample(range(self.size), batch_size), dtype=np.int64)
+        return (self.tail + offset) % self.capacity
+
+    def gather(self, idx):
+        nonFinalMask = ~self.read('done', idx)
+        return TransitionBatch(self.read_state('frame', self.read('stateFrame', idx)),
+                               self.read('action', idx),
+                               self.read_state('frame', self.read('nextStateFrame', idx[nonFinalMask])),
+                               self.read('reward', idx),
+                               nonFinalMask)
+
+    def fetch_all(self):
+        return self.gather((self.tail + np.arange(self.size)) % self.capacity)
+
+    def clear(self):
+        super(FrameReplayMemory, self).clear()
+        self.tail = 0
+        self.frameCount = 0
+        self.recentFrames.clear()
+
+    def __getstate__(self):
+        # object ids are meaningless after unpickling
+        state = self.__dict__.copy()
+        state['recentFrames'] = OrderedDict()
+        return state
+
+    def write_count(self):
+        # observations are stored in a ring buffer of their own, checkpoints pickle the whole memory
+        return None
+
+    def __repr__(self):
+        return 'FrameReplayMemory(capacity={}, size={}, frameCapacity={}, frameCount={})'.format(
+            self.capacity, self.size, self.frameCapacity, self.frameCount)
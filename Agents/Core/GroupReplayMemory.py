@@ -18,6 +18,8 @@ class GroupReplayMemory(object):
         self.numAgents = numAgents
         self.memory = [ []  for _ in range(self.numAgents)]
         self.position = 0
+        # total number of pushed experiences
+        self.pushCount = 0
 
     def push(self, transitions):
         """Saves a transition"""
@@ -31,6 +33,7 @@ class GroupReplayMemory(object):
             for n in range(self.numAgents):
                 self.memory[n][self.position] = transitions[n]
             self.position = (self.position + 1) % self.capacity
+        self.pushCount += 1
 
     def sample(self, batch_size):
         index = random.sample(range(0, len(self.memory[0])), batch_size)
@@ -43,6 +46,28 @@ class GroupReplayMemory(object):
         for n in range(self.numAgents):
             self.memory[n].clear()
         self.position = 0
+        self.pushCount = 0
+
+    # experience k is written at slot k % capacity, see MemoryCheckpoint
+    def write_count(self):
+        return self.pushCount
+
+    def read_slots(self, slots):
+        return [[self.memory[n][i] for i in slots] for n in range(self.numAgents)]
+
+    def write_slots(self, slots, data):
+        for n in range(self.numAgents):
+            if len(slots) > 0 and len(self.memory[n]) <= np.max(slots):
+                self.memory[n].extend([None] * (np.max(slots) + 1 - len(self.memory[n])))
+            for i, transition in zip(slots, data[n]):
+                self.memory[n][i] = transition
+
+    def get_checkpoint_state(self):
+        return {'position': self.position, 'pushCount': self.pushCount}
+
+    def set_checkpoint_state(self, state):
+        self.position = state['position']
+        self.pushCount = state['pushCount']
 
     def __len__(self):
         return len(self.memory[0])
@@ -0,0 +1,61 @@
+import numpy as np
+
+from Agents.Core.ReplayMemory import Transition
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory, TransitionBatch, map_state
+
+
+def stack_states(states):
+    # stack the states of all agents along a new first axis, field by field for dictionary states
+    if isinstance(states[0], dict):
+        return {key: np.stack([state[key] for state in states]) for key in states[0]}
+    return np.stack(states)
+
+
+def agent_major(value):
+    # (batch, numAgents, ...) -> (numAgents, batch, ...)
+    return np.swapaxes(value, 0, 1)
+
+
+class JointReplayMemory(ArrayReplayMemory):
+    """class to store joint experiences of a group of agents in preallocated numpy arrays.
+        A joint experience is pushed as a list of transitions, one per agent, in the same way as GroupReplayMemory.
+        The states and actions of all agents are stacked along an agent axis into one row of the array columns
+        (see ArrayReplayMemory), the reward is shared by all agents. A joint experience is terminal if the next state
+        of the first agent is None. Sampling gathers all agents with one index set and returns a TransitionBatch
+        whose state, action and nonFinalNextState arrays have shape (numAgents, batch, ...), while reward and
+        nonFinalMask have shape (batch,).
+        All agents need states of the same shape (or dictionaries with the same fields and shapes).
+        # Argument
+        capacity: number of joint experiences to store.
+        numAgents: number of agents
+        stateDtype, actionDtype, codecs: see ArrayReplayMemory, codecs encode the stacked states of all agents
+        """
+    def __init__(self, capacity, numAgents, stateDtype=None, actionDtype=None, codecs=None):
+        super(JointReplayMemory, self).__init__(capacity, stateDtype, actionDtype, codecs)
+        self.numAgents = numAgents
+
+    def push(self, transitions):
+        """Saves the transitions of all agents as one joint experience"""
+        if transitions[0].next_state is None:
+            nextState = None
+        else:
+            nextState = stack_states([transition.next_state for transition in transitions])
+        super(JointReplayMemory, self).push(Transition(stack_states([transition.state for transition in transitions]),
+                                                       np.array([transition.action for transition in transitions]),
+                                                       nextState,
+                                                       transitions[0].reward))
+
+    def gather(self, idx):
+        '''
+        gather joint experiences at indices idx into a TransitionBatch with the agent axis first
+        '''
+        batch = super(JointReplayMemory, self).gather(idx)
+        return TransitionBatch(map_state(agent_major, batch.state),
+                               agent_major(batch.action),
+                               map_state(agent_major, batch.nonFinalNextState),
+                               batch.reward,
+                               batch.nonFinalMask)
+
+    def __repr__(self):
+        return 'JointReplayMemory(capacity={}, size={}, numAgents={})'.format(self.capacity, self.size,
+                                                                              self.numAgents)
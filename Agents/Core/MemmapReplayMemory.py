@@ -0,0 +1,130 @@
+import os
+import numpy as np
+
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+
+
+class MemmapReplayMemory(ArrayReplayMemory):
+    """class to store experience in memory-mapped files on disk, so that the capacity is limited by disk instead of RAM.
+        Each column of ArrayReplayMemory is backed by a np.memmap file in folder. Recently pushed experiences are kept
+        in a small in-RAM cache and written to disk as one contiguous block when the cache is full, and sampled
+        experiences still in the cache are read from RAM.
+        The memory can be pickled; only the meta data are pickled and the memmap files are reopened on loading.
+        Checkpoints (see MemoryCheckpoint) save the experiences in segment files like ArrayReplayMemory, since the
+        memmap files are overwritten as training goes on. Loading a checkpoint writes its experiences to the memmap
+        files of the newly initialized memory.
+        # Argument
+        capacity: number of experiences to store.
+        folder: folder to store the memmap files, e.g., dataLogFolder of the agent
+        cacheSize: number of recently pushed experiences kept in RAM before writing to disk
+        stateDtype: dtype used to store state and next_state. If None, it is inferred from the first pushed state.
+        actionDtype: dtype used to store action. If None, it is inferred from the first pushed action.
+        codecs: codec for array states or dictionary of codecs keyed by state field for dictionary states.
+        schema: StateSchema for dictionary states, see ArrayReplayMemory.
+        """
+    def __init__(self, capacity, folder, cacheSize=1024, stateDtype=None, actionDtype=None, codecs=None, schema=None):
+        super(MemmapReplayMemory, self).__init__(capacity, stateDtype, actionDtype, codecs, schema)
+        self.folder = folder
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        self.cacheSize = min(cacheSize, capacity)
+        self.columnSpecs = {}
+        # number of rows of each column, None for one row per experience
+        self.columnRows = {}
+        self.cache = None
+        # cached experiences occupy rows [cacheStart, cacheStart + cacheCount) of the ring buffer
+        self.cacheStart = 0
+        self.cacheCount = 0
+
+    def column_file(self, name):
+        return os.path.join(self.folder, 'replayMemory_' + name + '.dat')
+
+    def allocate_column(self, name, shape, dtype, rows=None, mode='w+'):
+        self.columnSpecs[name] = (tuple(shape), np.dtype(dtype))
+        self.columnRows[name] = rows
+        return np.memmap(self.column_file(name), dtype=dtype, mode=mode,
+                         shape=(self.capacity if rows is None else rows,) + tuple(shape))
+
+    def allocate(self, transition):
+        super(MemmapReplayMemory, self).allocate(transition)
+        self.cache = {name: np.zeros((self.cacheSize,) + shape, dtype=dtype)
+                      for name, (shape, dtype) in self.columnSpecs.items()}
+
+    def write(self, idx, transition):
+        # new experiences first go to the cache
+        self.write_row(self.cache, idx - self.cacheStart, transition)
+
+    def push(self, *args):
+        """Saves a transition"""
+        super(MemmapReplayMemory, self).push(*args)
+        self.cacheCount += 1
+        # the cached block has to be contiguous in the ring buffer, so we also flush when wrapping around
+        if self.cacheCount == self.cacheSize or self.position == 0:
+            self.flush()
+
+    def flush(self):
+        '''
+        write cached experiences to the memmap files as one contiguous block
+        '''
+        if self.cacheCount > 0:
+            for name, column in self.columns.items():
+                column[self.cacheStart:self.cacheStart + self.cacheCount] = self.cache[name][:self.cacheCount]
+        self.cacheStart = self.position
+        self.cacheCount = 0
+
+    def read(self, name, idx):
+        out = np.asarray(self.columns[name][idx])
+        inCache = (idx >= self.cacheStart) & (idx < self.cacheStart + self.cacheCount)
+        if np.any(inCache):
+            out[inCache] = self.cache[name][idx[inCache] - self.cacheStart]
+        return out
+
+    def sample_index(self, batch_size):
+        # sorted indices give mostly sequential disk access, the order inside a minibatch does not matter
+        return np.sort(super(MemmapReplayMemory, self).sample_index(batch_size))
+
+    def clear(self):
+        super(MemmapReplayMemory, self).clear()
+        self.cacheStart = 0
+        self.cacheCount = 0
+
+    def __getstate__(self):
+        # do not pickle the content of the memmap files, only make sure they are up to date
+        if self.columns is not None:
+            self.flush()
+            for column in self.columns.values():
+                column.flush()
+        state = self.__dict__.copy()
+        state['columns'] = None
+        state['cache'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.columnSpecs:
+            self.columns = {name: self.allocate_column(name, shape, dtype, self.columnRows[name], mode='r+')
+                            for name, (shape, dtype) in self.columnSpecs.items()}
+            self.cache = {name: np.zeros((self.cacheSize,) + shape, dtype=dtype)
+                          for name, (shape, dtype) in self.columnSpecs.items()}
+
+    def read_slots(self, slots):
+        # cached experiences are read from RAM
+        if self.columns is None:
+            return None
+        return {name: self.read(name, slots) for name in self.columns}
+
+    def write_slots(self, slots, data):
+        super(MemmapReplayMemory, self).write_slots(slots, data)
+        if self.cache is None and self.columns is not None:
+            self.cache = {name: np.zeros((self.cacheSize,) + shape, dtype=dtype)
+                          for name, (shape, dtype) in self.columnSpecs.items()}
+
+    def set_checkpoint_state(self, state):
+        super(MemmapReplayMemory, self).set_checkpoint_state(state)
+        # loaded experiences are written to disk, the cache starts empty
+        self.cacheStart = self.position
+        self.cacheCount = 0
+
+    def __repr__(self):
+        return 'MemmapReplayMemory(capacity={}, size={}, position={}, folder={})'.format(self.capacity, self.size,
+                                                                                      self.position, self.folder)
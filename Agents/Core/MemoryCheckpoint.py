@@ -0,0 +1,97 @@
+import os
+import pickle
+import uuid
+import numpy as np
+
+
+class MemoryCheckpoint(object):
+    """class to save replay memory incrementally at checkpoints instead of pickling the entire memory every time.
+        Experience k (counted from the first push) is stored at slot k % capacity of the memory, so the experiences
+        written since the last checkpoint are a contiguous range of write counts. Each checkpoint appends these
+        experiences as a new segment file and writes a small manifest listing the segments to replay and the state
+        of the memory (ring position, priorities, etc.). Segment files are never modified, so manifests of earlier
+        checkpoints stay valid. When the segments of a manifest add up to more than compactRatio x capacity
+        experiences, the next checkpoint writes the whole memory as a new first segment.
+        Memories supporting segments implement write_count, read_slots, write_slots, get_checkpoint_state and
+        set_checkpoint_state. Other memories (write_count returns None or is missing) are pickled as a whole.
+        # Argument
+        compactRatio: maximum number of experiences in the segments of a manifest relative to capacity
+        """
+    def __init__(self, compactRatio=2.0):
+        self.compactRatio = compactRatio
+        # segment files are named by a session token and their range of write counts
+        self.token = uuid.uuid4().hex[:8]
+        self.folder = None
+        self.segments = None
+        self.segmentRows = 0
+        self.lastCount = 0
+
+    def supported(self, memory):
+        return hasattr(memory, 'write_count') and memory.write_count() is not None
+
+    def save(self, memory, prefix):
+        '''
+        save memory for the checkpoint with file prefix, e.g., dirName + identifier + 'Epoch' + str(epIdx)
+        '''
+        folder = os.path.dirname(prefix)
+        segmentFolder = os.path.join(folder, 'memorySegments')
+        if not os.path.exists(segmentFolder):
+            os.makedirs(segmentFolder)
+
+        if not self.supported(memory):
+            with open(prefix + '_memory.pickle', 'wb') as file:
+                pickle.dump(memory, file)
+            # a manifest left at the same prefix would take precedence on loading
+            if os.path.exists(prefix + '_memory_manifest.pickle'):
+                os.remove(prefix + '_memory_manifest.pickle')
+            return
+
+        count = memory.write_count()
+        newCount = count - self.lastCount
+        if self.segments is None or self.folder != folder or newCount < 0 or newCount >= memory.capacity \
+                or self.segmentRows + newCount > self.compactRatio * memory.capacity:
+            # start over with a segment of all experiences in memory
+            start = count - min(count, memory.capacity)
+            self.segments = []
+            self.segmentRows = 0
+        else:
+            start = self.lastCount
+        self.folder = folder
+
+        if count > start or len(self.segments) == 0:
+            slots = np.arange(start, count) % memory.capacity
+            name = os.path.join('memorySegments', 'memorySegment_{}_{}_{}.pickle'.format(self.token, start, count))
+            with open(os.path.join(folder, name), 'wb') as file:
+                pickle.dump({'slots': slots, 'data': memory.read_slots(slots)}, file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.segments.append(name)
+            self.segmentRows += len(slots)
+        self.lastCount = count
+
+        manifest = {'segments': list(self.segments),
+                    'writeCount': count,
+                    'state': memory.get_checkpoint_state()}
+        with open(prefix + '_memory_manifest.pickle', 'wb') as file:
+            pickle.dump(manifest, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, memory, prefix):
+        '''
+        load the memory saved for the checkpoint with file prefix. memory should be a newly initialized memory of
+        the same type, which is filled from the segments. Return the loaded memory
+        '''
+        if not os.path.exists(prefix + '_memory_manifest.pickle'):
+            with open(prefix + '_memory.pickle', 'rb') as file:
+                return pickle.load(file)
+
+        with open(prefix + '_memory_manifest.pickle', 'rb') as file:
+            manifest = pickle.load(file)
+        folder = os.path.dirname(prefix)
+        for name in manifest['segments']:
+            with open(os.path.join(folder, name), 'rb') as file:
+                segment = pickle.load(file)
+            memory.write_slots(segment['slots'], segment['data'])
+        memory.set_checkpoint_state(manifest['state'])
+
+        # the next checkpoint may be in another folder, so it starts with all experiences
+        self.segments = None
+        self.lastCount = manifest['writeCount']
+        return memory
@@ -0,0 +1,80 @@
+import queue
+import threading
+
+
+class PreparedMinibatch(tuple):
+    """output of prepare_minibatch computed ahead by MinibatchPrefetcher, agents use it as it is
+        """
+    pass
+
+
+class MinibatchPrefetcher(object):
+    """class to sample and collate minibatches in a background thread while the learner performs gradient steps.
+        The background thread keeps up to depth prepared minibatches in a bounded queue. Replay memory is shared with
+        the learner, so every access to the memory (push, sample, priority update) has to hold lock.
+        Prefetched minibatches are sampled up to depth steps earlier than in the sequential case. For prioritized
+        memory, priority updates of experiences overwritten since they were sampled are discarded (see
+        PrioritizedReplayMemory.batch_update).
+        # Argument
+        sample: function returning a minibatch of raw experiences and an info dictionary, e.g., agent.sample_minibatch
+        prepare: function converting raw experiences to tensors, e.g., agent.prepare_minibatch
+        depth: number of prepared minibatches kept ready
+        """
+    def __init__(self, sample, prepare, depth=2):
+        self.sample = sample
+        self.prepare = prepare
+        self.depth = depth
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=depth)
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.error = None
+
+    def start(self):
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            while not self.stopEvent.is_set():
+                with self.lock:
+                    transitions_raw, info = self.sample()
+                # collation does not touch the memory and overlaps with gradient steps of the learner
+                item = (PreparedMinibatch(self.prepare(transitions_raw)), info)
+                while not self.stopEvent.is_set():
+                    try:
+                        self.queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except Exception as e:
+            # re-raised in the learner thread
+            self.error = e
+            self.queue.put((None, None))
+
+    def get(self):
+        '''
+        return the next prepared minibatch and its info dictionary, the background thread is started on first call
+        '''
+        if self.thread is None:
+            self.start()
+        item = self.queue.get()
+        if self.error is not None:
+            error = self.error
+            self.close()
+            raise error
+        return item
+
+    def close(self):
+        '''
+        stop and join the background thread and discard prefetched minibatches, e.g., at the end of training or when
+        the memory is replaced. A later get starts the thread again
+        '''
+        if self.thread is not None:
+            self.stopEvent.set()
+            self.thread.join()
+            self.thread = None
+        self.error = None
+        while not self.queue.empty():
+            self.queue.get_nowait()
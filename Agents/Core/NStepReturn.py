@@ -0,0 +1,113 @@
+import numpy as np
+from Agents.Core.ReplayMemory import Transition
+
+
+def discounted_cumsum(x, discount):
+    '''
+    return y with y[t] = x[t] + discount[t] * y[t + 1] and y[T] = 0 along the first axis of x.
+    discount can be a scalar or an array with one entry per step, e.g., gamma * nonFinal to stop at episode ends.
+    The recursion is evaluated with log2(T) vectorized passes instead of a python loop over steps
+    '''
+    y = np.array(x, dtype=np.float64)
+    c = np.array(np.broadcast_to(discount, y.shape[:1]), dtype=np.float64)
+    c = c.reshape(c.shape + (1,) * (y.ndim - 1))
+    # after the pass with shift s, y[t] sums 2s terms of x and c[t] discounts from t to t + 2s
+    shift = 1
+    while shift < len(y):
+        y[:-shift] += c[:-shift] * y[shift:]
+        c[:-shift] *= c[shift:]
+        shift *= 2
+    return y
+
+
+def lambda_returns(reward, nextValue, nonFinal, gamma, lamb, episodeEnd=None):
+    '''
+    return lambda returns G[t] = r[t] + gamma * ((1 - lamb) * V(s[t+1]) + lamb * G[t+1]) of consecutive experiences.
+    nextValue: value estimates V(s[t+1]), ignored where nonFinal is False
+    episodeEnd: True for the last stored experience of an episode, e.g., truncated episodes, whose return
+    bootstraps with V(s[t+1]) only. Defaults to terminal experiences. The last experience always ends an episode
+    '''
+    nonFinal = np.asarray(nonFinal, dtype=np.float64)
+    if episodeEnd is None:
+        episodeEnd = nonFinal == 0
+    continuing = np.logical_not(episodeEnd).astype(np.float64)
+    continuing[-1] = 0.0
+    x = np.asarray(reward, dtype=np.float64) + gamma * nonFinal * (1 - lamb * continuing) * nextValue
+    return discounted_cumsum(x, gamma * lamb * continuing)
+
+
+class NStepReturn(object):
+    """class to compute n step returns of the experiences of an episode.
+        Rewards of the pending experiences are kept in a preallocated array. Once nStep experiences are pending, the
+        oldest one is returned with its n step return and the state nStep steps later. At the end of an episode
+        (next state being None), all pending experiences are returned at once as terminal experiences with their
+        backed-up returns, computed with one discounted cumulative sum.
+        # Argument
+        nStep: number of steps of the returns
+        gamma: discount factor
+        bootstrap: if False, only the backed-up returns at the end of episodes are computed and experiences leaving
+        the window are discarded, e.g., to back up terminal rewards to the nStep - 1 previous experiences
+        """
+    def __init__(self, nStep, gamma, bootstrap=True):
+        self.nStep = nStep
+        self.gamma = gamma
+        self.bootstrap = bootstrap
+        self.discount = gamma ** np.arange(nStep)
+        # pending experiences are moved to the front when the end of the arrays is reached
+        self.bufferLength = max(2 * nStep, 64)
+        self.rewards = np.zeros(self.bufferLength)
+        self.states = [None] * self.bufferLength
+        self.actions = [None] * self.bufferLength
+        self.head = 0
+        self.tail = 0
+
+    def clear(self):
+        '''
+        discard pending experiences, e.g., at the beginning of an episode
+        '''
+        self.states[self.head:self.tail] = [None] * (self.tail - self.head)
+        self.actions[self.head:self.tail] = [None] * (self.tail - self.head)
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def append(self, state, action, nextState, reward):
+        '''
+        add an experience of the episode and return the list of transitions whose returns are complete
+        '''
+        if self.tail == self.bufferLength:
+            count = self.tail - self.head
+            self.rewards[:count] = self.rewards[self.head:self.tail]
+            self.states[:count] = self.states[self.head:self.tail]
+            self.actions[:count] = self.actions[self.head:self.tail]
+            self.states[count:] = [None] * (self.bufferLength - count)
+            self.actions[count:] = [None] * (self.bufferLength - count)
+            self.head = 0
+            self.tail = count
+
+        self.rewards[self.tail] = reward
+        self.states[self.tail] = state
+        self.actions[self.tail] = action
+        self.tail += 1
+
+        if nextState is None:
+            # back up the terminal reward to all pending experiences
+            returns = discounted_cumsum(self.rewards[self.head:self.tail], self.gamma)
+            transitions = [Transition(self.states[i], self.actions[i], None, R)
+                           for i, R in zip(range(self.head, self.tail), returns.tolist())]
+            self.clear()
+            return transitions
+
+        if self.tail - self.head < self.nStep:
+            return []
+
+        transitions = []
+        if self.bootstrap:
+            R = float(np.dot(self.discount, self.rewards[self.head:self.tail]))
+            transitions.append(Transition(self.states[self.head], self.actions[self.head], nextState, R))
+        self.states[self.head] = None
+        self.actions[self.head] = None
+        self.head += 1
+        return transitions
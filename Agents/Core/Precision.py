@@ -0,0 +1,20 @@
+import contextlib
+import torch
+
+
+PRECISIONS = ['fp32', 'bf16']
+
+
+def autocast_context(precision, device='cpu'):
+    '''
+    return the context forward passes of training run in.
+    precision: fp32 (no autocast) or bf16 (torch.autocast with bfloat16 on the device type of device).
+    Weights, gradients and optimizer states stay in fp32, net outputs are cast back to fp32 (.float()) before they
+    enter losses, replay memory priorities or numpy
+    '''
+    if precision == 'fp32':
+        return contextlib.nullcontext()
+    if precision == 'bf16':
+        deviceType = 'cuda' if str(device).startswith('cuda') else 'cpu'
+        return torch.autocast(device_type=deviceType, dtype=torch.bfloat16)
+    raise ValueError('precision is invalid')
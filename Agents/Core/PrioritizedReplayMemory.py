@@ -86,11 +86,95 @@ class SumTree(object):
         data_idx = leaf_idx - self.capacity + 1
         return leaf_idx, self.tree[leaf_idx], self.data[data_idx]
 
+    def get_leaves(self, values):
+        '''
+        batch version of get_leaf. All values descend the tree together, one level per iteration.
+        Leaves can sit on two different levels when capacity is not a power of 2, so values that already
+        reached a leaf stay there while the others continue to descend.
+        '''
+        v = np.array(values, dtype=np.float64)
+        parent_idx = np.zeros(len(v), dtype=np.int64)
+        while True:
+            cl_idx = 2 * parent_idx + 1
+            active = cl_idx < len(self.tree)
+            if not np.any(active):
+                break
+            cl_idx = cl_idx[active]
+            v_active = v[active]
+            left_p = self.tree[cl_idx]
+            go_left = v_active <= left_p
+            # downward search, always search for a higher priority node
+            v[active] = np.where(go_left, v_active, v_active - left_p)
+            parent_idx[active] = np.where(go_left, cl_idx, cl_idx + 1)
+
+        leaf_idx = parent_idx
+        data_idx = leaf_idx - self.capacity + 1
+        return leaf_idx, self.tree[leaf_idx], self.data[data_idx]
+
+    def batch_update(self, tree_idx, ps):
+        '''
+        batch version of update. Leaves are written first, then parent nodes are recomputed as the sum of their
+        children in one vectorized pass per level until the root is reached.
+        Recomputing instead of adding changes makes repeated leaf indices in tree_idx safe.
+        '''
+        tree_idx = np.asarray(tree_idx, dtype=np.int64).ravel()
+        self.tree[tree_idx] = np.asarray(ps, dtype=np.float64).ravel()
+
+        # a parent may be recomputed early from a child that is updated later (leaves on different levels),
+        # it is recomputed again once that child propagates up, so the final values are always consistent
+        idx = np.unique(tree_idx)
+        while True:
+            idx = np.unique((idx[idx > 0] - 1) // 2)
+            if len(idx) == 0:
+                break
+            self.tree[idx] = self.tree[2 * idx + 1] + self.tree[2 * idx + 2]
+
     @property
     def total_p(self):
         return self.tree[0]  # the root
 
 
+class SegmentTree(object):
+    """
+    Segment tree with the same array layout as SumTree, where each parent node stores operation(left, right)
+    of its two children. It is used to track the minimum and maximum leaf priority, so that reading them costs
+    O(1) at the root and updating a leaf costs O(log N).
+    # Argument
+    capacity: number of leaves
+    operation: element-wise binary numpy function, e.g., np.minimum, np.maximum
+    neutral_element: value of empty leaves, e.g., inf for minimum
+    """
+
+    def __init__(self, capacity, operation, neutral_element):
+        self.capacity = capacity
+        self.operation = operation
+        self.neutral_element = neutral_element
+        self.tree = np.full(2 * capacity - 1, neutral_element, dtype=np.float64)
+
+    def update(self, tree_idx, p):
+        self.tree[tree_idx] = p
+        # then recompute the parents through the tree
+        while tree_idx != 0:
+            tree_idx = (tree_idx - 1) // 2
+            self.tree[tree_idx] = self.operation(self.tree[2 * tree_idx + 1], self.tree[2 * tree_idx + 2])
+
+    def batch_update(self, tree_idx, ps):
+        # same level by level recomputation as SumTree.batch_update
+        tree_idx = np.asarray(tree_idx, dtype=np.int64).ravel()
+        self.tree[tree_idx] = np.asarray(ps, dtype=np.float64).ravel()
+
+        idx = np.unique(tree_idx)
+        while True:
+            idx = np.unique((idx[idx > 0] - 1) // 2)
+            if len(idx) == 0:
+                break
+            self.tree[idx] = self.operation(self.tree[2 * idx + 1], self.tree[2 * idx + 2])
+
+    @property
+    def root(self):
+        return self.tree[0]
+
+
 class PrioritizedReplayMemory(object):  # stored as ( s, a, r, s_ ) in SumTree
     """
     This Memory class is modified based on the original code from:
@@ -99,6 +183,12 @@ class PrioritizedReplayMemory(object):  # stored as ( s, a, r, s_ ) in SumTree
 
     def __init__(self, capacity, config,  epsilon = 0.01, alpha = 0.6, beta = 0.4, beta_increment_per_sampling = 0.001, abs_err_upper = 1.):
         self.tree = SumTree(capacity)
+        # companion trees to track the extreme priorities without scanning all the leaves
+        self.minTree = SegmentTree(capacity, np.minimum, np.inf)
+        self.maxTree = SegmentTree(capacity, np.maximum, 0.0)
+        # number of stores so far and the store count at which each slot was last written
+        self.storeCount = 0
+        self.storeStep = np.zeros(capacity, dtype=np.int64)
 
         self.epsilon = 0.01  # small amount to avoid zero priority
         self.alpha = 0.6  # [0~1] convert the importance of TD error to priority
@@ -119,44 +209,95 @@ class PrioritizedReplayMemory(object):  # stored as ( s, a, r, s_ ) in SumTree
 
 
     def store(self, transition):
-        max_p = np.max(self.tree.tree[-self.tree.capacity:]) # get the maximum priority in the memory
+        max_p = self.maxTree.root # get the maximum priority in the memory
         if max_p == 0:
             max_p = self.abs_err_upper
         # set the max p for new p such that new experiences have higher probability to be selected
+        tree_idx = self.tree.data_pointer + self.tree.capacity - 1
+        self.storeStep[self.tree.data_pointer] = self.storeCount
+        self.storeCount += 1
         self.tree.add(max_p, transition)
+        self.minTree.update(tree_idx, max_p)
+        self.maxTree.update(tree_idx, max_p)
 
 
     # sample n transitions
     def sample(self, n):
-        b_idx = np.empty((n,), dtype=np.int32)
-        b_memory = []
-        ISWeights = np.empty((n, 1))
         pri_seg = self.tree.total_p / n       # priority segment
 
         # increase beta after every sampling
         self.beta = np.min([1., self.beta + self.beta_increment_per_sampling])  # max = 1
 
-        min_prob = np.min(self.tree.tree[-self.tree.capacity:]) / self.tree.total_p     # for later calculate ISweight
-        for i in range(n):
-            a, b = pri_seg * i, pri_seg * (i + 1)
-            v = np.random.uniform(a, b)
-            idx, p, data = self.tree.get_leaf(v)
-            prob = p / self.tree.total_p
-            ISWeights[i, 0] = np.power(prob/min_prob, -self.beta)
-            b_idx[i] = idx
-            b_memory.append(data)
-           # b_memory stores the list of transitions
-        return  b_memory, b_idx, ISWeights
+        min_prob = self.minTree.root / self.tree.total_p     # for later calculate ISweight
+        # one value uniformly drawn from each of the n priority segments
+        v = np.random.uniform(pri_seg * np.arange(n), pri_seg * np.arange(1, n + 1))
+        b_idx, p, data = self.tree.get_leaves(v)
+        prob = p / self.tree.total_p
+        ISWeights = np.power(prob/min_prob, -self.beta)[:, np.newaxis]
+        # b_memory stores the list of transitions
+        b_memory = list(data)
+        return  b_memory, b_idx.astype(np.int32), ISWeights
 
 
     # after training on these samples, we need to update the priority of these samples
     # this is because some samples will become of less priority
-    def batch_update(self, tree_idx, abs_errors):
+    def store_step(self, tree_idx):
+        '''
+        store count at which the experiences at tree_idx were written
+        '''
+        return self.storeStep[np.asarray(tree_idx) - self.tree.capacity + 1]
+
+    # storeStep: store_step of the experiences when they were sampled. If given, experiences that have been
+    # overwritten since then, e.g., when sampling ahead of the update, keep their priority
+    def batch_update(self, tree_idx, abs_errors, storeStep=None):
+        if storeStep is not None:
+            valid = self.store_step(tree_idx) == storeStep
+            tree_idx = np.asarray(tree_idx)[valid]
+            abs_errors = np.asarray(abs_errors)[valid]
         abs_errors += self.epsilon  # convert to abs and avoid 0
         clipped_errors = np.minimum(abs_errors, self.abs_err_upper)
         ps = np.power(clipped_errors, self.alpha)
-        for ti, p in zip(tree_idx, ps):
-            self.tree.update(ti, p)
+        self.tree.batch_update(tree_idx, ps)
+        self.minTree.batch_update(tree_idx, ps)
+        self.maxTree.batch_update(tree_idx, ps)
+
+    # experience k is stored at slot k % capacity, see MemoryCheckpoint
+    def write_count(self):
+        return self.storeCount
+
+    @property
+    def capacity(self):
+        return self.tree.capacity
+
+    def read_slots(self, slots):
+        return list(self.tree.data[slots])
+
+    def write_slots(self, slots, data):
+        for i, transition in zip(slots, data):
+            self.tree.data[i] = transition
+
+    def get_checkpoint_state(self):
+        # priorities change after every update, so they are saved entirely
+        filled = min(self.storeCount, self.tree.capacity)
+        return {'priorities': self.tree.tree[self.tree.capacity - 1:self.tree.capacity - 1 + filled].copy(),
+                'storeCount': self.storeCount,
+                'dataCount': self.tree.data_count,
+                'beta': self.beta}
+
+    def set_checkpoint_state(self, state):
+        capacity = self.tree.capacity
+        priorities = state['priorities']
+        tree_idx = np.arange(len(priorities)) + capacity - 1
+        self.tree.batch_update(tree_idx, priorities)
+        self.minTree.batch_update(tree_idx, priorities)
+        self.maxTree.batch_update(tree_idx, priorities)
+        self.storeCount = state['storeCount']
+        self.tree.data_count = state['dataCount']
+        self.tree.data_pointer = self.storeCount % capacity
+        self.beta = state['beta']
+        # last store count at which each slot was written
+        slots = np.arange(len(priorities))
+        self.storeStep[slots] = slots + (self.storeCount - 1 - slots) // capacity * capacity
 
     def __len__(self):
         return int(self.tree.data_count)
\ No newline at end of file
@@ -18,6 +18,8 @@ class ReplayMemory(object):
         self.capacity = capacity
         self.memory = []
         self.position = 0
+        # total number of pushed experiences
+        self.pushCount = 0
 
     def push(self, *args):
         """Saves a transition"""
@@ -31,6 +33,7 @@ class ReplayMemory(object):
         # write on the earlier experience
         self.memory[self.position] = transition
         self.position = (self.position + 1) % self.capacity
+        self.pushCount += 1
 
     def sample(self, batch_size):
         # sample of minibatch of experiences
@@ -47,6 +50,27 @@ class ReplayMemory(object):
     def clear(self):
         self.memory.clear()
         self.position = 0
+        self.pushCount = 0
+
+    # experience k is written at slot k % capacity, see MemoryCheckpoint
+    def write_count(self):
+        return self.pushCount
+
+    def read_slots(self, slots):
+        return [self.memory[i] for i in slots]
+
+    def write_slots(self, slots, data):
+        if len(slots) > 0 and len(self.memory) <= np.max(slots):
+            self.memory.extend([None] * (np.max(slots) + 1 - len(self.memory)))
+        for i, transition in zip(slots, data):
+            self.memory[i] = transition
+
+    def get_checkpoint_state(self):
+        return {'position': self.position, 'pushCount': self.pushCount}
+
+    def set_checkpoint_state(self, state):
+        self.position = state['position']
+        self.pushCount = state['pushCount']
 
     def totensor(self):
         return torch.tensor(self.memory)
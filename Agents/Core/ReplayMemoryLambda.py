@@ -1,121 +1,139 @@
-
-from collections import deque
-from collections import namedtuple
+import math
 import random
 import numpy as np
-import math
-import torch
-# Define a namedtuple with name Transition and attributes of state, action,
-# next_state, reward
-AugumentedTransition = namedtuple('AugumentedTransition', ('state', 'action', 'next_state', 'reward', 'process_reward'))
-
-class ReplayMemoryLambda(object):
-    def __init__(self, config, capacity, net = None, stateProcessor=None):
-    ## capacity of episodes
-        self.capacity = capacity
-        self.partitionNum = config['eligibilityTracePartitionNum']
-        self.partitionLength = self.capacity / self.partitionNum
-        self.paritionldx = 0
-        self.paritionRange = (0, 0)
-        self.memory = deque()
-        self.episodeLengths = deque()
-        self.position = 0
-        self.net = net
+
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+from Agents.Core.NStepReturn import lambda_returns
+
+
+class ReplayMemoryLambda(ArrayReplayMemory):
+    """class to store experiences and sample them with lambda returns as rewards.
+        Experiences are stored in array columns in the order they are pushed (see ArrayReplayMemory). The stored
+        experiences are divided into partitionNum partitions of consecutive experiences. A refresh recomputes the
+        lambda returns of one randomly selected partition with a single batched evaluation of the next state values
+        and a vectorized backward recursion (see lambda_returns), so its cost scales with the partition size.
+        Minibatches are sampled from the last refreshed partition, with the lambda return as reward. These rewards are
+        the targets of the Q values, no further bootstrapping is needed.
+        An episode ends with a terminal experience (next_state being None) or when start_episode is called,
+        e.g., for episodes truncated by a maximum length.
+        # Argument
+        config: a dictionary containing gamma and
+            eligibilityTraceLambda: lambda of the returns
+            eligibilityTracePartitionNum: number of partitions, default 10
+            eligibilityTraceRefreshStep: number of sampled minibatches between refreshes, default 100
+            partitionUpdateFlag: if False, all experiences are refreshed at once, default True
+        capacity: number of experiences to store
+        value: function returning the state values (e.g., max Q of the target net) of a batch of next states as a
+        numpy array. Next states are passed as sampled from ArrayReplayMemory.
+        stateDtype, actionDtype, codecs, schema: see ArrayReplayMemory
+        """
+    def __init__(self, config, capacity, value=None, stateDtype=None, actionDtype=None, codecs=None, schema=None):
+        super(ReplayMemoryLambda, self).__init__(capacity, stateDtype, actionDtype, codecs, schema)
+        self.value = value
         self.lamb = config['eligibilityTraceLambda']
         self.gamma = config['gamma']
-        self.partitionUpdateFlag = False
+
+        self.partitionNum = 10
+        if 'eligibilityTracePartitionNum' in config:
+            self.partitionNum = config['eligibilityTracePartitionNum']
+        self.partitionLength = int(math.ceil(self.capacity / self.partitionNum))
+
+        self.refreshStep = 100
+        if 'eligibilityTraceRefreshStep' in config:
+            self.refreshStep = config['eligibilityTraceRefreshStep']
+
+        self.partitionUpdateFlag = True
         if 'partitionUpdateFlag' in config:
             self.partitionUpdateFlag = config['partitionUpdateFlag']
-        self.stateProcessor = stateProcessor
 
-        self.device = 'cpu'
-        if 'device' in config:
-            self.device = config['device']
+        # range of write counts of the last refreshed partition
+        self.partitionRange = None
+        self.sampleCount = 0
+        self.newEpisode = True
 
-    def push(self, episode):
-    #Saves an episode of transitions
-        if len(self.memory) < self.capacity:
-            self.append(episode)
-        else:
-            self.popLeft()
-            self.append(episode)
+    def allocate(self, transition):
+        super(ReplayMemoryLambda, self).allocate(transition)
+        self.columns['episodeFirst'] = self.allocate_column('episodeFirst', (), np.bool_)
+        self.columns['lambdaReturn'] = self.allocate_column('lambdaReturn', (), np.float32)
 
-    def append(self, episode):
-        self.episodeLengths.append(len(episode))
-        self.totalLength += len(episode)
-        for e in episode:
-            e_aug = AugumentedTransition(e[0], e[1], e[2], e[3], 0)
-            self.memory.append(e_aug)
+    def start_episode(self):
+        '''
+        the next pushed experience starts a new episode
+        '''
+        self.newEpisode = True
 
-    def popLeft(self):
-        for i in range(self.episodeLengths[0]):
-            self.memory.popleft()
-        self.totalLength -= self.episodeLengths[0]
-        self.episodeLengths.popLeft()
-
-    def sample(self, batch_size):
-        return random.sample(self.memory[self.partitionRange[0]:self.partitionRange[1]], batch_size)
+    def write_row(self, columns, row, transition):
+        super(ReplayMemoryLambda, self).write_row(columns, row, transition)
+        columns['episodeFirst'][row] = self.newEpisode
+        self.newEpisode = transition.next_state is None
 
     def refresh(self):
+        '''
+        recompute the lambda returns of a randomly selected partition
+        '''
+        oldest = self.pushCount - self.size
         if self.partitionUpdateFlag:
-            # every time refresh, we only refresh current partition
-            # first update partition if necessary
-            if len(self.episodeLengths) == self.capacity:
-                actualPartitionNum = self.partitionNum
-            else:
-                actualPartitionNum = int(math.floor(self.totalLength / self.partitionLength))
-
-            accumLength = np.cumsum(self.episodeLengths)
-            selectPartition = random.randomInt(0, actualPartitionNum)
-            episodeStart = selectPartition*self.partitionLength
-            episodeEnd = (selectPartition + 1)*self.paritionLength
-            self.partitionRange = (accumLength[episodeStart] - self.episodeLength[episodeStart],
-            accumLength[episodeEnd - 1])
+            partition = random.randrange(int(math.ceil(self.size / self.partitionLength)))
+            start = oldest + partition * self.partitionLength
+            end = min(start + self.partitionLength, self.pushCount)
         else:
-            episodeStart = 0
-            episodeEnd = len(self.memory)
-            self.partitionRange = (0, self.totalLength)
-
-        transitions = AugumentedTransition(*zip(*self.memory[self.partitionRange[0]: self.partitionRange[1]]))
-        reward = torch.tensor(transitions.reward, device=self.device, dtype=torch.float32).unsqueeze(-1) # shape(batch, 1)
-        batchSize = reward.shape[0]
-
-
-
-        # get select partition of memory
-        if self.stateProcessor is not None:
-            state, _ = self.stateProcessor(transitions.state, self.device)
-            nonFinalNextState, nonFinalMask = self.stateProcessor(transitions.next_state, self.device)
+            start, end = oldest, self.pushCount
+
+        rows = np.arange(start, end) % self.capacity
+        nonFinal = ~self.read('done', rows)
+        nextValue = np.zeros(len(rows))
+        if nonFinal.any():
+            nextValue[nonFinal] = self.value(self.read_state('next_state', rows[nonFinal]))
+        # an episode also ends before the first experience of the next episode
+        episodeEnd = ~nonFinal
+        episodeEnd[:-1] |= self.read('episodeFirst', rows[1:])
+
+        self.columns['lambdaReturn'][rows] = lambda_returns(self.read('reward', rows), nextValue, nonFinal,
+                                                            self.gamma, self.lamb, episodeEnd)
+        self.partitionRange = (start, end)
+
+    def sample_index(self, batch_size):
+        if self.partitionRange is None or self.sampleCount % self.refreshStep == 0:
+            self.refresh()
+        self.sampleCount += 1
+        # experiences of the partition overwritten since the refresh are not sampled
+        start = max(self.partitionRange[0], self.pushCount - self.size)
+        population = range(start, self.partitionRange[1])
+        if len(population) < batch_size:
+            steps = random.choices(population, k=batch_size)
         else:
-#            state = torch.tensor(transitions.state, device=self.device, dtype=torch.float32)
-            nonFinalMask = torch.tensor(tuple(map(lambda s: s is not None, transitions.next_state)), device=self.device,
-                                        dtype=torch.uint8)
-            nonFinalNextState = torch.tensor([s for s in transitions.next_state if s is not None], device=self.device,
-                                             dtype=torch.float32)
-        QNext = torch.zeros(batchSize, device=self.device, dtype=torch.float32)
-        QNext[nonFinalMask] = self.net(nonFinalNextState).max(1)[0].detach()
-
-        offSet = accumLength[episodeStart] - self.episodeLengths[episodeStart]
-        for episode in reversed(range(episodeStart, episodeEnd)):
-            startIdx = accumLength[episode] - self.episodeLengths[episode]
-            endIdx = accumLength[episode]
-            # for each episode, we update the lambda return
-            if self.memory[endIdx - 1].next_state is None:
-                self.memory[idx].process_reward = self.memory[idx].reward
-            else:
-                self.memory[idx].process_reward = self.memory[idx].reward + self.gamma*QNext[endIdx - 1 - offSet]
-
-            for idx in reversed(range(startIdx, endIdx - 1)):
-                self.memory[idx].process_reward = self.memory[idx].reward
-                + self.gamma*(self.lamb*self.memory[idx + 1].process_return
-                + (1 - self.lamb) * QNext[idx - offSet])
+            steps = random.sample(population, batch_size)
+        return np.array(steps, dtype=np.int64) % self.capacity
 
+    def gather(self, idx):
+        '''
+        gather experiences at indices idx into a TransitionBatch with lambda returns as rewards
+        '''
+        batch = super(ReplayMemoryLambda, self).gather(idx)
+        return batch._replace(reward=self.read('lambdaReturn', idx))
 
-    def clear(self):
-        self.memory.clear()
+    def fetch_all(self):
+        return super(ReplayMemoryLambda, self).gather(np.arange(self.size))
 
-    def __len__(self):
-        return len(self.memory)
+    def clear(self):
+        super(ReplayMemoryLambda, self).clear()
+        self.partitionRange = None
+        self.sampleCount = 0
+        self.newEpisode = True
+
+    def get_checkpoint_state(self):
+        state = super(ReplayMemoryLambda, self).get_checkpoint_state()
+        state['partitionRange'] = self.partitionRange
+        state['sampleCount'] = self.sampleCount
+        state['newEpisode'] = self.newEpisode
+        return state
+
+    def set_checkpoint_state(self, state):
+        super(ReplayMemoryLambda, self).set_checkpoint_state(state)
+        self.partitionRange = state['partitionRange']
+        self.sampleCount = state['sampleCount']
+        self.newEpisode = state['newEpisode']
 
     def __repr__(self):
-        return str(self.memory)
\ No newline at end of file
+        return 'ReplayMemoryLambda(capacity={}, size={}, partitionNum={}, lambda={})'.format(
+            self.capacity, self.size, self.partitionNum, self.lamb)
@@ -1,25 +1,42 @@
-from collections import namedtuple
 import random
 import math
-import torch
 import numpy as np
-from copy import deepcopy
 from Agents.Core.ReplayMemory import Transition
-from Agents.Core.ReplayMemory import ReplayMemory
-from collections import deque
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+from Agents.Core.NStepReturn import NStepReturn
 
 # a replay memory with enhanced sampling on terminal states
-class ReplayMemoryReward(ReplayMemory):
-
-    def __init__(self, capacity, nStepBackup, gamma, terminalRatio = 0.3):
-        super(ReplayMemoryReward, self).__init__(capacity)
-        self.terminalMemory = []
-        self.nStepBuffer = []
+class ReplayMemoryReward(ArrayReplayMemory):
+    """class to store experiences and sample minibatches enriched with terminal experiences.
+        Non-terminal experiences and terminal experiences are kept in two ring buffers of capacity experiences, stored
+        as the first and second half of the same array columns (see ArrayReplayMemory). At the end of an episode, the
+        terminal reward is backed up to the nStepBackup previous experiences, which are stored in the terminal ring
+        buffer as terminal experiences together with the terminal experience.
+        A minibatch contains a fraction terminalRatio of terminal experiences and is gathered from both ring
+        buffers with one index array, so it comes out as one TransitionBatch.
+        # Argument
+        capacity: number of experiences stored in each ring buffer.
+        nStepBackup: number of previous experiences the terminal reward is backed up to, 0 for no backup
+        gamma: discount factor of the backup
+        terminalRatio: fraction of terminal experiences in a minibatch
+        stateDtype, actionDtype, codecs, schema: see ArrayReplayMemory
+        """
+    def __init__(self, capacity, nStepBackup, gamma, terminalRatio = 0.3, stateDtype=None, actionDtype=None,
+                 codecs=None, schema=None):
+        super(ReplayMemoryReward, self).__init__(capacity, stateDtype, actionDtype, codecs, schema)
+        # if nStepBackup is zero, then there is no backup
+        self.nStepBuffer = NStepReturn(nStepBackup + 1, gamma, bootstrap=False)
         self.gamma = gamma
         self.nStepBackup = nStepBackup
         self.terminalRatio = terminalRatio
-        self.positionOne = 0
+        # the terminal ring buffer starts at row capacity
         self.positionTwo = 0
+        self.terminalSize = 0
+
+    def allocate_column(self, name, shape, dtype, rows=None):
+        # rows of both ring buffers
+        rows = 2 * self.capacity if rows is None else rows
+        return super(ReplayMemoryReward, self).allocate_column(name, shape, dtype, rows)
 
     def push(self, *args):
         """Saves a transition"""
@@ -28,46 +45,53 @@ class ReplayMemoryReward(ReplayMemory):
         else:
             transition = Transition(*args)
 
-        # if it is terminal state
-        if transition.next_state is None:
+        if self.columns is None:
+            self.allocate(transition)
 
-            if len(self.terminalMemory) < self.capacity:
-                self.terminalMemory.append(None)
+        # terminal rewards are backed up to the nStepBackup previous experiences of the episode
+        backups = self.nStepBuffer.append(transition.state, transition.action, transition.next_state, transition.reward)
 
-            self.terminalMemory[self.positionTwo] = transition
-            self.positionTwo = (self.positionTwo + 1) % self.capacity
-            count = 1
-            R = transition.reward
-            for trans in self.nStepBuffer[::-1]:
-                # if nstepBackup is zero, then this is no backup
-                if count > self.nStepBackup:
-                    break
-                R = trans.reward + self.gamma * R
-                transNew = Transition(trans.state, trans.action, None, R)
-                if len(self.terminalMemory) < self.capacity:
-                    self.terminalMemory.append(None)
-                self.terminalMemory[self.positionTwo] = transNew
+        # if it is terminal state
+        if transition.next_state is None:
+            for transNew in backups:
+                self.write(self.capacity + self.positionTwo, transNew)
                 self.positionTwo = (self.positionTwo + 1) % self.capacity
-                count += 1
-
-            self.nStepBuffer.clear()
-        else: # if it is terminal state
-            if len(self.memory) < self.capacity:
-                self.memory.append(None)
-
-            self.nStepBuffer.append(transition)
+                self.terminalSize = min(self.terminalSize + 1, self.capacity)
+        else:
             # write on the earlier experience
-            self.memory[self.positionOne] = transition
-            self.positionOne = (self.positionOne + 1) % self.capacity
+            self.write(self.position, transition)
+            self.position = (self.position + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+        self.pushCount += 1
 
-    def sample(self, batchSize):
-        batchSizeTwo = min(int(math.floor(batchSize*self.terminalRatio)), len(self.terminalMemory))
+    def start_episode(self):
+        '''
+        experiences of a new episode follow, e.g., after an episode truncated without terminal state
+        '''
+        self.nStepBuffer.clear()
+
+    def sample_index(self, batchSize):
+        batchSizeTwo = min(int(math.floor(batchSize*self.terminalRatio)), self.terminalSize)
         batchSizeOne = batchSize - batchSizeTwo
 
-        sampleOne = random.sample(self.memory, batchSizeOne)
-        sampleTwo = random.sample(self.terminalMemory, batchSizeTwo)
-        return sampleOne + sampleTwo
+        sampleOne = random.sample(range(self.size), batchSizeOne)
+        sampleTwo = random.sample(range(self.capacity, self.capacity + self.terminalSize), batchSizeTwo)
+        return np.array(sampleOne + sampleTwo, dtype=np.int64)
 
+    def fetch_all(self):
+        return self.gather(np.concatenate((np.arange(self.size),
+                                           self.capacity + np.arange(self.terminalSize))).astype(np.int64))
 
+    def clear(self):
+        super(ReplayMemoryReward, self).clear()
+        self.nStepBuffer.clear()
+        self.positionTwo = 0
+        self.terminalSize = 0
 
+    def write_count(self):
+        # experiences are written to two ring buffers, checkpoints pickle the whole memory
+        return None
 
+    def __repr__(self):
+        return 'ReplayMemoryReward(capacity={}, size={}, terminalSize={})'.format(self.capacity, self.size,
+                                                                                 self.terminalSize)
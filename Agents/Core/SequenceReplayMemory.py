@@ -0,0 +1,110 @@
+from collections import namedtuple
+import numpy as np
+
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory, map_state
+
+# a minibatch of experience sequences of shape (batch, sequenceLength, ...).
+# padMask is False for padded steps at the beginning of sequences that cross the start of an episode.
+# nonFinalNextState contains the sequences shifted by one step for non-terminal sequences, with padding nextPadMask
+SequenceBatch = namedtuple('SequenceBatch',
+                           ('state', 'action', 'nonFinalNextState', 'reward', 'nonFinalMask', 'padMask',
+                            'nextPadMask'))
+
+
+class SequenceReplayMemory(ArrayReplayMemory):
+    """class to store experience of episodes and sample sequences of consecutive experiences for recurrent networks.
+        Experiences are stored in array columns (see ArrayReplayMemory) together with the write count of the first
+        experience of their episode. A sampled sequence ends at a uniformly sampled experience and contains the
+        sequenceLength - 1 preceding experiences of the same episode. Steps before the start of the episode are
+        padded with zeros and marked in padMask, all windows are gathered with one index computation.
+        An episode ends with a terminal experience (next_state being None) or when start_episode is called,
+        e.g., for episodes truncated by a maximum length.
+        # Argument
+        capacity: number of experiences to store.
+        sequenceLength: number of experiences in a sampled sequence.
+        stateDtype, actionDtype, codecs, schema: see ArrayReplayMemory
+        """
+    def __init__(self, capacity, sequenceLength=10, stateDtype=None, actionDtype=None, codecs=None, schema=None):
+        super(SequenceReplayMemory, self).__init__(capacity, stateDtype, actionDtype, codecs, schema)
+        self.sequenceLength = sequenceLength
+        # write count of the first experience of the current episode
+        self.episodeStart = 0
+        self.newEpisode = True
+
+    def allocate(self, transition):
+        super(SequenceReplayMemory, self).allocate(transition)
+        self.columns['episodeStart'] = self.allocate_column('episodeStart', (), np.int64)
+
+    def start_episode(self):
+        '''
+        the next pushed experience starts a new episode
+        '''
+        self.newEpisode = True
+
+    def write_row(self, columns, row, transition):
+        if self.newEpisode:
+            self.episodeStart = self.pushCount
+            self.newEpisode = False
+        super(SequenceReplayMemory, self).write_row(columns, row, transition)
+        columns['episodeStart'][row] = self.episodeStart
+        if transition.next_state is None:
+            self.newEpisode = True
+
+    def sample_index(self, batch_size):
+        # write counts of the last experiences of the sequences
+        return self.pushCount - self.size + super(SequenceReplayMemory, self).sample_index(batch_size)
+
+    def gather(self, end):
+        '''
+        gather sequences ending at write counts end into a SequenceBatch of numpy arrays
+        '''
+        steps = end[:, np.newaxis] - self.sequenceLength + 1 + np.arange(self.sequenceLength)
+        endRows = end % self.capacity
+        # sequences do not go before the start of their episode or the oldest experience in memory
+        start = np.maximum(self.read('episodeStart', endRows), self.pushCount - self.size)
+        padMask = steps >= start[:, np.newaxis]
+        # padded steps read the last row and are zeroed afterwards
+        rows = np.where(padMask, steps, end[:, np.newaxis]) % self.capacity
+
+        def pad(value):
+            value[~padMask] = 0
+            return value
+
+        state = map_state(pad, self.read_state('state', rows))
+        action = pad(self.read('action', rows))
+        reward = pad(self.read('reward', rows))
+        nonFinalMask = ~self.read('done', endRows)
+
+        nextState = self.read_state('next_state', endRows[nonFinalMask])
+        if isinstance(state, dict):
+            nonFinalNextState = {key: np.concatenate((state[key][nonFinalMask, 1:], nextState[key][:, np.newaxis]), axis=1)
+                                 for key in state}
+        else:
+            nonFinalNextState = np.concatenate((state[nonFinalMask, 1:], nextState[:, np.newaxis]), axis=1)
+        nextPadMask = np.concatenate((padMask[nonFinalMask, 1:], np.ones((nonFinalMask.sum(), 1), dtype=np.bool_)),
+                                     axis=1)
+
+        return SequenceBatch(state, action, nonFinalNextState, reward, nonFinalMask, padMask, nextPadMask)
+
+    def fetch_all(self):
+        return self.gather(self.pushCount - self.size + np.arange(self.size))
+
+    def clear(self):
+        super(SequenceReplayMemory, self).clear()
+        self.episodeStart = 0
+        self.newEpisode = True
+
+    def get_checkpoint_state(self):
+        state = super(SequenceReplayMemory, self).get_checkpoint_state()
+        state['episodeStart'] = self.episodeStart
+        state['newEpisode'] = self.newEpisode
+        return state
+
+    def set_checkpoint_state(self, state):
+        super(SequenceReplayMemory, self).set_checkpoint_state(state)
+        self.episodeStart = state['episodeStart']
+        self.newEpisode = state['newEpisode']
+
+    def __repr__(self):
+        return 'SequenceReplayMemory(capacity={}, size={}, sequenceLength={})'.format(self.capacity, self.size,
+                                                                                     self.sequenceLength)
@@ -0,0 +1,102 @@
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from Agents.Core.ReplayMemory import Transition
+from Agents.Core.ArrayReplayMemory import TransitionBatch
+
+
+class SharedReplayMemory(object):
+    """class to store experience in shared memory tensors, so that multiple processes can push to and sample from one
+        replay memory, e.g., the workers of DQNAsynER.
+        Columns are preallocated with share_memory_() and are shared with processes started afterwards (fork or
+        spawn through torch.multiprocessing). A writer reserves the next row by incrementing a shared write cursor under
+        its lock, so concurrent writers never get the same row, and then writes the row without holding the lock.
+        Each row has a stamp that is -1 while the row is being written and the write count of the experience once it
+        is complete. Readers gather rows without locking and check the stamps before and after the gather, rows that
+        were incomplete or overwritten during the gather are sampled again.
+        Only array states of a fixed shape are supported. Sampling is with replacement and returns a TransitionBatch.
+        # Argument
+        capacity: number of experiences to store.
+        stateShape: shape of a state, e.g., (env.stateDim,)
+        stateDtype: torch dtype used to store state and next_state
+        maxRetry: maximum number of gathers of the rows of a minibatch, sample raises if rows are still invalid afterwards
+        """
+    def __init__(self, capacity, stateShape, stateDtype=torch.float32, maxRetry=10):
+        self.capacity = capacity
+        self.stateShape = tuple(np.atleast_1d(stateShape))
+        self.maxRetry = maxRetry
+        self.columns = {'state': torch.zeros((capacity,) + self.stateShape, dtype=stateDtype),
+                        'next_state': torch.zeros((capacity,) + self.stateShape, dtype=stateDtype),
+                        'action': torch.zeros(capacity, dtype=torch.long),
+                        'reward': torch.zeros(capacity, dtype=torch.float32),
+                        'done': torch.zeros(capacity, dtype=torch.bool)}
+        self.stamp = torch.full((capacity,), -1, dtype=torch.long)
+        for column in self.columns.values():
+            column.share_memory_()
+        self.stamp.share_memory_()
+        # total number of reserved rows
+        self.cursor = mp.Value('q', 0)
+
+    def push(self, *args):
+        """Saves a transition"""
+        if len(args) == 1 and isinstance(*args, Transition):
+            transition = args[0]
+        else:
+            transition = Transition(*args)
+
+        with self.cursor.get_lock():
+            count = self.cursor.value
+            self.cursor.value += 1
+        row = count % self.capacity
+
+        self.stamp[row] = -1
+        self.columns['state'][row] = torch.as_tensor(np.asarray(transition.state))
+        self.columns['action'][row] = int(transition.action)
+        self.columns['reward'][row] = float(transition.reward)
+        if transition.next_state is None:
+            self.columns['done'][row] = True
+        else:
+            self.columns['done'][row] = False
+            self.columns['next_state'][row] = torch.as_tensor(np.asarray(transition.next_state))
+        self.stamp[row] = count
+
+    def sample(self, batch_size):
+        '''
+        sample a minibatch of complete experiences, concurrent pushes may take place
+        '''
+        size = len(self)
+        idx = torch.randint(size, (batch_size,))
+        batch = {name: column.new_empty((batch_size,) + column.shape[1:]) for name, column in self.columns.items()}
+        # rows of the minibatch still to be gathered, rows which were invalid are sampled and gathered again
+        rows = torch.arange(batch_size)
+        for attempt in range(self.maxRetry):
+            rowIdx = idx[rows]
+            before = self.stamp[rowIdx]
+            for name, column in self.columns.items():
+                batch[name][rows] = column[rowIdx]
+            after = self.stamp[rowIdx]
+            rows = rows[(before != after) | (before < 0)]
+            if len(rows) == 0:
+                break
+            idx[rows] = torch.randint(size, (len(rows),))
+        else:
+            raise Exception('experiences are still being written after maxRetry gathers')
+
+        nonFinalMask = ~batch['done']
+        return TransitionBatch(batch['state'].numpy(),
+                               batch['action'].numpy(),
+                               batch['next_state'][nonFinalMask].numpy(),
+                               batch['reward'].numpy(),
+                               nonFinalMask.numpy())
+
+    def clear(self):
+        with self.cursor.get_lock():
+            self.cursor.value = 0
+            self.stamp.fill_(-1)
+
+    def __len__(self):
+        return min(self.cursor.value, self.capacity)
+
+    def __repr__(self):
+        return 'SharedReplayMemory(capacity={}, size={})'.format(self.capacity, len(self))
@@ -0,0 +1,239 @@
+import multiprocessing
+import numpy as np
+
+
+def observation_spec(observation):
+    '''
+    return {key: (shape, dtype)} of an observation, the key of array observations is None
+    '''
+    if isinstance(observation, dict):
+        return {key: (np.asarray(value).shape, np.asarray(value).dtype) for key, value in observation.items()}
+    observation = np.asarray(observation)
+    return {None: (observation.shape, observation.dtype)}
+
+
+def shared_arrays(spec, numEnvs):
+    '''
+    allocate shared buffers for observations of numEnvs environments, return {key: (buffer, shape, dtype)}
+    '''
+    buffers = {}
+    for key, (shape, dtype) in spec.items():
+        shape = (numEnvs,) + tuple(shape)
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        buffers[key] = (multiprocessing.RawArray('b', max(nbytes, 1)), shape, np.dtype(dtype))
+    return buffers
+
+
+def array_views(buffers):
+    '''
+    numpy views of shared buffers, {key: array with shape (numEnvs, ...)}
+    '''
+    return {key: np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+            for key, (buffer, shape, dtype) in buffers.items()}
+
+
+def write_observation(views, index, observation):
+    if None in views:
+        views[None][index] = observation
+    else:
+        for key, view in views.items():
+            view[index] = observation[key]
+
+
+def read_observations(views, indices=None):
+    '''
+    copy observations out of shared views, an array or a dictionary of arrays with the batch dimension first
+    '''
+    if indices is None:
+        indices = slice(None)
+    if None in views:
+        return views[None][indices].copy()
+    return {key: view[indices].copy() for key, view in views.items()}
+
+
+def unbatch_observations(observations):
+    '''
+    split batched observations into a list of observations of each environment
+    '''
+    if isinstance(observations, dict):
+        numEnvs = len(next(iter(observations.values())))
+        return [{key: value[i] for key, value in observations.items()} for i in range(numEnvs)]
+    return observations.tolist()
+
+
+def worker(remote, parentRemote, envFn, index, observationBuffers, terminalBuffers, rewardBuffer, doneBuffer):
+    parentRemote.close()
+    env = envFn()
+    observations = array_views(observationBuffers)
+    terminals = array_views(terminalBuffers)
+    rewards = np.frombuffer(rewardBuffer, dtype=np.float64)
+    dones = np.frombuffer(doneBuffer, dtype=np.bool_)
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == 'step':
+                observation, reward, done, info = env.step(data)
+                if done:
+                    # the terminal observation is kept, the environment is reset right away
+                    write_observation(terminals, index, observation)
+                    observation = env.reset()
+                write_observation(observations, index, observation)
+                rewards[index] = reward
+                dones[index] = done
+                remote.send(info)
+            elif command == 'reset':
+                write_observation(observations, index, env.reset())
+                remote.send(None)
+            elif command == 'call':
+                name, args = data
+                try:
+                    remote.send((True, getattr(env, name)(*args)))
+                except Exception as e:
+                    # raised by env_method in the main process, the worker keeps running
+                    remote.send((False, e))
+            elif command == 'close':
+                remote.send(None)
+                break
+            else:
+                raise NotImplementedError
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if hasattr(env, 'close'):
+            env.close()
+
+
+class SharedVecEnv(object):
+    """class to run copies of an environment in worker processes and batch their steps.
+        Workers write observations into shared memory arrays instead of sending them through pipes, only actions,
+        infos and method calls are pickled. Observations are arrays or dictionaries of arrays of fixed shapes and
+        dtypes, e.g., {'sensor': voxels, 'target': position}, the spec is taken from one reset of a probe environment
+        created in this process. Environments are reset when their episodes end, the observation returned by step is
+        then the first observation of the next episode and the terminal observation is returned in
+        info['terminal_observation'].
+        The interface follows the vectorized environments of baselines: reset, step (or step_async and step_wait) and
+        close, with batched observations, rewards and dones and a list of infos. reset can also be given the indices of
+        environments to reset, e.g., episodes truncated by the agent.
+        # Argument
+        envFns: list of functions creating the environments, e.g., [lambda: StablizerOneD(config, i) for i in range(4)].
+        They need to be picklable for the spawn start method
+        context: multiprocessing start method, default the platform default
+        """
+    def __init__(self, envFns, context=None):
+        self.numEnvs = len(envFns)
+        probe = envFns[0]()
+        self.spec = observation_spec(probe.reset())
+        if hasattr(probe, 'close'):
+            probe.close()
+
+        self.observationBuffers = shared_arrays(self.spec, self.numEnvs)
+        self.terminalBuffers = shared_arrays(self.spec, self.numEnvs)
+        self.rewardBuffer = multiprocessing.RawArray('d', self.numEnvs)
+        self.doneBuffer = multiprocessing.RawArray('b', self.numEnvs)
+        self.observations = array_views(self.observationBuffers)
+        self.terminals = array_views(self.terminalBuffers)
+        self.rewards = np.frombuffer(self.rewardBuffer, dtype=np.float64)
+        self.dones = np.frombuffer(self.doneBuffer, dtype=np.bool_)
+
+        mp = multiprocessing.get_context(context)
+        self.remotes, workRemotes = zip(*[mp.Pipe() for _ in range(self.numEnvs)])
+        self.processes = []
+        for index, (workRemote, remote, envFn) in enumerate(zip(workRemotes, self.remotes, envFns)):
+            process = mp.Process(target=worker, args=(workRemote, remote, envFn, index, self.observationBuffers,
+                                                      self.terminalBuffers, self.rewardBuffer, self.doneBuffer),
+                                 daemon=True)
+            process.start()
+            self.processes.append(process)
+        for workRemote in workRemotes:
+            workRemote.close()
+        self.waiting = False
+        self.closed = False
+
+    def reset(self, indices=None):
+        '''
+        reset the environments of indices, default all, return observations of all environments
+        '''
+        remotes = self.remotes if indices is None else [self.remotes[index] for index in indices]
+        for remote in remotes:
+            remote.send(('reset', None))
+        for remote in remotes:
+            remote.recv()
+        return read_observations(self.observations)
+
+    def step_async(self, actions):
+        '''
+        send actions to the workers without waiting for their steps
+        '''
+        for remote, action in zip(self.remotes, actions):
+            remote.send(('step', action))
+        self.waiting = True
+
+    def step_wait(self):
+        '''
+        wait for the steps of step_async, return observations, rewards, dones and infos
+        '''
+        infos = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        dones = self.dones.copy()
+        for index in np.where(dones)[0]:
+            infos[index] = dict(infos[index]) if infos[index] is not None else {}
+            infos[index]['terminal_observation'] = read_observations(self.terminals, index)
+        return read_observations(self.observations), self.rewards.copy(), dones, infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def env_method(self, name, *args, indices=None):
+        '''
+        call a method of the environments of indices, default all, return the list of results. Exceptions of the
+        methods are raised after all results are received
+        '''
+        remotes = self.remotes if indices is None else [self.remotes[index] for index in indices]
+        for remote in remotes:
+            remote.send(('call', (name, args)))
+        replies = [remote.recv() for remote in remotes]
+        for success, result in replies:
+            if not success:
+                raise result
+        return [result for _, result in replies]
+
+    def worker_env(self, index):
+        '''
+        return a WorkerEnv calling the methods of the environment of index
+        '''
+        return WorkerEnv(self, index)
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for remote in self.remotes:
+            remote.recv()
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def __len__(self):
+        return self.numEnvs
+
+
+class WorkerEnv(object):
+    """class to call the methods of the environment of one worker of a SharedVecEnv like those of a local environment,
+        e.g., worker_env.getHindSightExperience(state, action, nextState, info) for the experiences of that worker.
+        # Argument
+        vecEnv: the SharedVecEnv
+        index: index of the environment
+        """
+    def __init__(self, vecEnv, index):
+        self.vecEnv = vecEnv
+        self.index = index
+
+    def __getattr__(self, name):
+        def method(*args):
+            return self.vecEnv.env_method(name, *args, indices=[self.index])[0]
+        return method
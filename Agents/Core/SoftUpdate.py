@@ -0,0 +1,50 @@
+import torch
+from Agents.Core.FlatParameters import flat_parameters, flatten_parameters
+
+
+class SoftUpdate(object):
+    """class to soft update (Polyak average) target networks towards their networks,
+        target = (1 - tau) * target + tau * net.
+        The parameters of all target networks and networks are collected once into two lists, and each update is done
+        with two in place multi-tensor kernels (torch._foreach_mul_ and torch._foreach_add_) over all of them, without
+        temporaries or a python loop over parameters. Pairs of networks backed by flat parameters with the same layout
+        (see FlatParameters) are updated through their flat tensors. Networks have to keep their parameter objects,
+        e.g., load checkpoints with load_state_dict.
+        # Argument
+        pairs: list of (targetNet, net), pairs whose target net is None are skipped
+        tau: soft update parameter
+        flatten: back the parameters of all networks with flat tensors first
+        """
+    def __init__(self, pairs, tau, flatten=False):
+        self.tau = tau
+        self.targetParams = []
+        self.params = []
+        for targetNet, net in pairs:
+            if targetNet is None:
+                continue
+            if flatten:
+                flatten_parameters(targetNet)
+                flatten_parameters(net)
+            targetFlat = flat_parameters(targetNet)
+            flat = flat_parameters(net)
+            if targetFlat is not None and flat is not None and targetFlat.flat.shape == flat.flat.shape:
+                self.targetParams.append(targetFlat.flat)
+                self.params.append(flat.flat)
+                continue
+            targetParams = list(targetNet.parameters())
+            params = list(net.parameters())
+            if len(targetParams) != len(params):
+                raise ValueError('target net and net have different parameters')
+            self.targetParams += targetParams
+            self.params += params
+
+    def __call__(self):
+        if not self.targetParams:
+            return
+        with torch.no_grad():
+            if hasattr(torch, '_foreach_mul_'):
+                torch._foreach_mul_(self.targetParams, 1.0 - self.tau)
+                torch._foreach_add_(self.targetParams, self.params, alpha=self.tau)
+            else:
+                for targetParam, param in zip(self.targetParams, self.params):
+                    targetParam.mul_(1.0 - self.tau).add_(param, alpha=self.tau)
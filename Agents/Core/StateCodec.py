@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class RawCodec(object):
+    """codec storing a state field as it is.
+        Every codec is set up with the shape and dtype of one raw (unbatched) field value and tells the storage
+        shape and dtype of its encoded value. encode works on one value, decode works on a batch of stored values.
+        # Argument
+        dtype: dtype to store. If None, the dtype of the first value is used.
+        """
+    def __init__(self, dtype=None):
+        self.dtype = dtype
+
+    def setup(self, shape, dtype):
+        '''
+        set up the codec from the raw shape and dtype, return storage shape and dtype
+        '''
+        self.shape = tuple(shape)
+        if self.dtype is None:
+            self.dtype = np.dtype(dtype)
+        return self.shape, self.dtype
+
+    def encode(self, value):
+        return value
+
+    def decode(self, stored):
+        return stored
+
+
+class BitPackCodec(RawCodec):
+    """codec for binary grids, e.g., obstacle maps from sensors. Any nonzero value is stored as a single bit.
+        # Argument
+        dtype: dtype of decoded values
+        """
+    def __init__(self, dtype=np.uint8):
+        super(BitPackCodec, self).__init__(dtype)
+
+    def setup(self, shape, dtype):
+        self.shape = tuple(shape)
+        self.size = int(np.prod(self.shape))
+        return (int(np.ceil(self.size / 8.0)),), np.uint8
+
+    def encode(self, value):
+        return np.packbits(np.asarray(value).ravel() != 0)
+
+    def decode(self, stored):
+        bits = np.unpackbits(stored, axis=-1, count=self.size)
+        return bits.reshape(stored.shape[:-1] + self.shape).astype(self.dtype, copy=False)
+
+
+class Float16Codec(RawCodec):
+    """codec storing continuous values in half precision and decoding them to single precision
+        """
+    def setup(self, shape, dtype):
+        self.shape = tuple(shape)
+        return self.shape, np.float16
+
+    def encode(self, value):
+        return np.asarray(value, dtype=np.float16)
+
+    def decode(self, stored):
+        return stored.astype(np.float32)
+
+
+class AffineQuantizedCodec(RawCodec):
+    """codec storing continuous values in [low, high] as unsigned integers with affine quantization.
+        Values outside of the range are clipped.
+        # Argument
+        low: lower bound of values
+        high: upper bound of values
+        bits: 8 or 16 bit integers
+        """
+    def __init__(self, low, high, bits=8):
+        super(AffineQuantizedCodec, self).__init__()
+        if bits not in [8, 16]:
+            raise ValueError('bits of AffineQuantizedCodec should be 8 or 16')
+        self.low = low
+        self.high = high
+        self.levels = 2 ** bits - 1
+        self.storeDtype = np.uint8 if bits == 8 else np.uint16
+        self.scale = (high - low) / self.levels
+
+    def setup(self, shape, dtype):
+        self.shape = tuple(shape)
+        return self.shape, self.storeDtype
+
+    def encode(self, value):
+        q = np.rint((np.clip(value, self.low, self.high) - self.low) / self.scale)
+        return q.astype(self.storeDtype)
+
+    def decode(self, stored):
+        return (self.low + stored.astype(np.float32) * self.scale).astype(np.float32)
+
+
+def make_codec(spec):
+    '''
+    make a codec from a config specification, e.g., 'bitpack', 'float16', 'raw' or
+    {'codec': 'affine', 'low': -1.0, 'high': 1.0, 'bits': 8}
+    '''
+    if spec is None or isinstance(spec, RawCodec):
+        return spec
+    if isinstance(spec, str):
+        spec = {'codec': spec}
+    name = spec['codec']
+    if name == 'raw':
+        return RawCodec()
+    if name == 'bitpack':
+        return BitPackCodec()
+    if name == 'float16':
+        return Float16Codec()
+    if name == 'affine':
+        return AffineQuantizedCodec(spec['low'], spec['high'], spec['bits'] if 'bits' in spec else 8)
+    raise ValueError('unknown state codec ' + str(name))
+
+
+def make_codecs(spec):
+    '''
+    make codecs for all state fields. spec is a single codec specification for array states or
+    a dictionary of codec specifications keyed by state field for dictionary states
+    '''
+    if isinstance(spec, dict) and 'codec' not in spec:
+        return {key: make_codec(value) for key, value in spec.items()}
+    return make_codec(spec)
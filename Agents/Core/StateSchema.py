@@ -0,0 +1,73 @@
+import numpy as np
+import torch
+
+from Agents.Core.StateCodec import RawCodec, make_codec
+
+
+class StateSchema(object):
+    """class describing dictionary states, e.g., {'sensor': ..., 'target': ..., 'timeStep': ...} returned by the maze envs.
+        A schema declares the shape, storage dtype and optional codec of each state field. Array based replay memories
+        use it to allocate one column per field, and agents use collate as a generic stateProcessor which stacks a list
+        of states into preallocated arrays and hands them to the networks via torch.from_numpy.
+        Fields not declared in the schema are ignored.
+        # Argument
+        fields: dictionary keyed by state field, e.g.,
+        {'sensor': {'shape': [1, 21, 21], 'dtype': 'uint8', 'codec': 'bitpack'}, 'target': {'shape': [2]}}.
+        dtype is the storage dtype and defaults to float32, codec is a specification accepted by make_codec.
+        tensorDtype: dtype of tensors handed to the networks
+        """
+    def __init__(self, fields, tensorDtype=torch.float32):
+        self.keys = list(fields.keys())
+        self.shapes = {}
+        self.dtypes = {}
+        self.codecSpecs = {}
+        for key, field in fields.items():
+            self.shapes[key] = tuple(field['shape'])
+            self.dtypes[key] = np.dtype(field['dtype']) if 'dtype' in field else np.dtype(np.float32)
+            self.codecSpecs[key] = field['codec'] if 'codec' in field else None
+        self.tensorDtype = tensorDtype
+
+    def make_codecs(self):
+        '''
+        make a new codec for each field, fields without codec are stored raw with the declared dtype
+        '''
+        codecs = {}
+        for key in self.keys:
+            codec = make_codec(self.codecSpecs[key])
+            codecs[key] = codec if codec is not None else RawCodec(self.dtypes[key])
+        return codecs
+
+    def empty(self, batchSize):
+        '''
+        allocate arrays for a batch of states
+        '''
+        return {key: np.empty((batchSize,) + self.shapes[key], dtype=self.dtypes[key]) for key in self.keys}
+
+    def stack(self, states):
+        '''
+        stack a list of dictionary states into a dictionary of arrays with one row per state
+        '''
+        arrays = self.empty(len(states))
+        for i, state in enumerate(states):
+            for key in self.keys:
+                arrays[key][i] = state[key]
+        return arrays
+
+    def to_tensor(self, arrays, device):
+        '''
+        convert a dictionary of batched arrays to a dictionary of tensors without copying when dtype and device allow
+        '''
+        return {key: torch.from_numpy(arrays[key]).to(device, dtype=self.tensorDtype) for key in self.keys}
+
+    def collate(self, state, device='cpu'):
+        '''
+        stateProcessor for dictionary states. given a list of states, where terminal states are None,
+        return a dictionary of tensors of the non-final states and the non-final mask
+        '''
+        nonFinalMask = np.array([s is not None for s in state], dtype=np.bool_)
+        nonFinalState = self.to_tensor(self.stack([s for s in state if s is not None]), device)
+        return nonFinalState, torch.from_numpy(nonFinalMask).to(device)
+
+    def __repr__(self):
+        return 'StateSchema({})'.format(', '.join('{}: {} {}'.format(key, self.shapes[key], self.dtypes[key])
+                                                  for key in self.keys))
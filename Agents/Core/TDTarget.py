@@ -0,0 +1,92 @@
+import torch
+
+
+def cat_states(first, second):
+    # concatenate two batches of states (tensors or dictionaries of tensors) along the batch dimension
+    if isinstance(first, dict):
+        return {key: torch.cat((first[key], second[key])) for key in first}
+    return torch.cat((first, second))
+
+
+def batch_size(state):
+    if isinstance(state, dict):
+        return next(iter(state.values())).shape[0]
+    return state.shape[0]
+
+
+class TDTarget(object):
+    """class to compute Q values of sampled actions and their TD targets for DQN type agents.
+        targetNet: target = reward + gamma * max_a targetNet(s', a)
+        doubleQ: target = reward + gamma * targetNet(s', argmax_a policyNet(s', a)). States and next states are
+        evaluated by the policy net in one forward pass of the concatenated batch.
+        Next states can also be bootstrapped by another value function, e.g., the target net of the next stage of
+        multi-stage agents (finalNextState, finalMask, finalValue). Next states in neither mask are terminal.
+        Q values of next states are scattered into a buffer allocated once per batch size and reused across updates.
+        Q values are returned in fp32 also when the nets are evaluated under autocast (see Precision).
+        # Argument
+        device: device of the buffers
+        fuseForward: evaluate states and next states in one policy net forward for doubleQ. Set it to False for
+        policy nets whose output depends on the composition of the batch, e.g., with batch normalization.
+        """
+    def __init__(self, device='cpu', fuseForward=True):
+        self.device = device
+        self.fuseForward = fuseForward
+        self.buffers = {}
+
+    def next_buffer(self, batchSize):
+        '''
+        return the zeroed buffer of next state Q values for batchSize experiences
+        '''
+        if batchSize not in self.buffers:
+            self.buffers[batchSize] = torch.zeros(batchSize, device=self.device, dtype=torch.float32)
+        return self.buffers[batchSize].zero_()
+
+    def evaluate(self, updateOption, policyNet, targetNet, state, action, nonFinalNextState, nonFinalMask,
+                 finalNextState=None, finalMask=None, finalValue=None):
+        '''
+        return Q values of the actions with shape (batch, 1) and the detached Q values of next states with shape (batch,).
+        The next state Q values live in the reused buffer and are overwritten by the next call
+        '''
+        if updateOption not in ('targetNet', 'doubleQ'):
+            raise NotImplementedError
+
+        batchSize = batch_size(state)
+        nonFinalMask = torch.as_tensor(nonFinalMask, dtype=torch.bool, device=self.device)
+        numNonFinal = int(nonFinalMask.sum())
+
+        nextAction = None
+        if updateOption == 'doubleQ' and numNonFinal and self.fuseForward:
+            # select optimal action of next states from the same policy net forward
+            Q = policyNet(cat_states(state, nonFinalNextState))
+            QValues = Q[:batchSize].gather(1, action).float()
+            nextAction = Q[batchSize:].detach().max(1)[1].unsqueeze(-1)
+        else:
+            QValues = policyNet(state).gather(1, action).float()
+
+        QNext = self.next_buffer(batchSize)
+        with torch.no_grad():
+            if numNonFinal:
+                if updateOption == 'doubleQ':
+                    if nextAction is None:
+                        nextAction = policyNet(nonFinalNextState).max(1)[1].unsqueeze(-1)
+                    QNext[nonFinalMask] = targetNet(nonFinalNextState).gather(1, nextAction).squeeze(-1).float()
+                else:
+                    QNext[nonFinalMask] = targetNet(nonFinalNextState).max(1)[0].float()
+
+            if finalValue is not None and finalMask is not None:
+                finalMask = torch.as_tensor(finalMask, dtype=torch.bool, device=self.device)
+                if finalMask.any():
+                    QNext[finalMask] = finalValue(finalNextState).float()
+
+        return QValues, QNext
+
+    def compute(self, updateOption, policyNet, targetNet, state, action, reward, nonFinalNextState, nonFinalMask, gamma,
+                finalNextState=None, finalMask=None, finalValue=None):
+        '''
+        return Q values of the actions and their TD targets, both with shape (batch, 1).
+        gamma discounts the next state Q values, e.g., gamma ** nStepForward
+        '''
+        QValues, QNext = self.evaluate(updateOption, policyNet, targetNet, state, action, nonFinalNextState,
+                                       nonFinalMask, finalNextState, finalMask, finalValue)
+        targetValues = reward + gamma * QNext.unsqueeze(-1)
+        return QValues, targetValues
@@ -2,6 +2,20 @@ import torch
 import os
 import numpy as np
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory, TransitionBatch, state_to_tensor
+from Agents.Core.StateCodec import make_codecs
+from Agents.Core.StateSchema import StateSchema
+from Agents.Core.MemmapReplayMemory import MemmapReplayMemory
+from Agents.Core.FrameReplayMemory import FrameReplayMemory
+from Agents.Core.MinibatchPrefetcher import MinibatchPrefetcher, PreparedMinibatch
+from Agents.Core.MemoryCheckpoint import MemoryCheckpoint
+from Agents.Core.SoftUpdate import SoftUpdate
+from Agents.Core.Precision import PRECISIONS, autocast_context
+from Agents.Core.CompiledStep import COMPILE_MODES, CompiledLoss, DDPGCriticLoss, DDPGActorLoss, full_next_state
+from Agents.Core.ActorLearner import ActorLearner, overridden_methods
+from copy import deepcopy
+import contextlib
+import threading
 
 import pickle
 class DDPGAgent:
@@ -25,13 +39,20 @@ class DDPGAgent:
         self.env = env
         self.numAction = nbAction
         self.stateProcessor = stateProcessor
+        # dictionary states declared by a schema are collated without a custom stateProcessor
+        if self.stateProcessor is None and self.stateSchema is not None:
+            self.stateProcessor = self.stateSchema.collate
         self.netLossFunc = netLossFunc
         self.experienceProcessor = experienceProcessor
 
 
         self.initialization()
         self.init_memory()
+        self.memoryCheckpoint = MemoryCheckpoint()
+        self.init_prefetcher()
         self.initalizeNets(actorNets, criticNets, optimizers)
+        # environments of actor threads, the first one is env
+        self.actorEnvs = None
 
 
     def initalizeNets(self, actorNets, criticNets, optimizers):
@@ -46,12 +67,56 @@ class DDPGAgent:
         self.critic_optimizer = optimizers['critic']
 
         self.net_to_device()
+        self.softUpdate = SoftUpdate([(self.actorNet_target, self.actorNet), (self.criticNet_target, self.criticNet)],
+                                     self.tau, self.flatParameters)
+        self.init_compiled_loss()
+
+    def init_compiled_loss(self):
+        '''
+        initialize the compiled critic and actor losses of fixed shape minibatches if compileMode is not eager
+        '''
+        self.compiledCriticLoss = None
+        self.compiledActorLoss = None
+        if self.compileMode != 'eager':
+            self.compiledCriticLoss = CompiledLoss(DDPGCriticLoss(self.criticNet, self.actorNet_target,
+                                                                  self.criticNet_target, self.netLossFunc, self.gamma,
+                                                                  self.precision, self.device), self.compileMode)
+            self.compiledActorLoss = CompiledLoss(DDPGActorLoss(self.actorNet, self.criticNet, self.precision,
+                                                                self.device), self.compileMode)
+
+    def init_prefetcher(self):
+        '''
+        initialize the background minibatch prefetcher if prefetchDepth > 0.
+        memoryLock has to be held for every access to the memory during training
+        '''
+        self.prefetcher = None
+        self.memoryLock = contextlib.nullcontext()
+        if self.numActorThreads > 0:
+            # actor threads push experiences while the learner samples
+            self.memoryLock = threading.Lock()
+        if self.prefetchDepth > 0:
+            self.prefetcher = MinibatchPrefetcher(self.sample_minibatch, self.prepare_minibatch, self.prefetchDepth)
+            self.memoryLock = self.prefetcher.lock
 
     def init_memory(self):
         '''
         initialize replay memory
         '''
-        self.memory = ReplayMemory(self.memoryCapacity)
+        if self.memoryOption == 'array':
+            # experiences are stored in preallocated numpy arrays, states need to be numpy arrays
+            self.memory = ArrayReplayMemory(self.memoryCapacity, codecs=make_codecs(self.memoryStateCodecs),
+                                            schema=self.stateSchema)
+        elif self.memoryOption == 'frame':
+            # array based memory storing each observation only once
+            self.memory = FrameReplayMemory(self.memoryCapacity, self.memoryFrameCapacity,
+                                            codecs=make_codecs(self.memoryStateCodecs), schema=self.stateSchema)
+        elif self.memoryOption == 'memmap':
+            # array based memory stored on disk under the data log folder
+            self.memory = MemmapReplayMemory(self.memoryCapacity, self.dirName + 'replayMemory/',
+                                             self.memoryCacheSize, codecs=make_codecs(self.memoryStateCodecs),
+                                             schema=self.stateSchema)
+        else:
+            self.memory = ReplayMemory(self.memoryCapacity)
 
     def read_config(self):
         '''
@@ -63,6 +128,11 @@ class DDPGAgent:
         gamma: discount factor
         tau: soft update parameter
         memoryCapacity: memory capacity for experience storage
+        memoryOption: allowed strings are natural, array, frame, memmap. default natural
+        memoryCacheSize: number of recent experiences kept in RAM for memmap memory, default 1024
+        memoryFrameCapacity: number of observations stored by frame memory, default 1.1 x memoryCapacity
+        memoryStateCodecs: state storage codecs for array and memmap memory, e.g., {'sensor': 'bitpack', 'target': 'float16'}
+        prefetchDepth: number of minibatches sampled and collated ahead in a background thread, default 0 (no prefetching)
         netGradClip: gradient clipping parameter
         netUpdateOption: allowed strings are targetNet, policyNet, doubleQ
         verbose: bool, default false.
@@ -76,6 +146,15 @@ class DDPGAgent:
         hindSightER: bool variable for hindsight experience replay
         hindSightERFreq: frequency to perform hindsight experience replay
         experienceAugmentation: additional experience augmentation function
+        stateSchema: fields of dictionary states, e.g., {'sensor': {'shape': [1, 21, 21], 'dtype': 'uint8'}, 'target': {'shape': [2]}}
+        flatParameters: bool, back the parameters of networks and target networks with flat tensors (see FlatParameters), default False
+        precision: fp32 or bf16, bf16 runs the forward passes of training under bfloat16 autocast, default fp32
+        compileMode: eager, compile (torch.compile) or trace (torch.jit.trace), compiles the critic and actor losses of fixed shape minibatches (see CompiledStep), default eager
+        numActorThreads: number of actor threads stepping environments while this thread learns (see ActorLearner), default 0 (serial training).
+            Actors after the first one step deep copies of env, unless agent.actorEnvs is set to a list of environments
+        updateToDataRatio: gradient updates per environment step in actor learner training, default 1
+        actorSyncStep: number of gradient updates between refreshes of the actor net copy of the actors, default 10
+        maxUpdateLag: number of gradient updates the learner can be behind before actors wait, default 100
         return: None
         '''
         self.trainStep = self.config['trainStep']
@@ -124,6 +203,30 @@ class DDPGAgent:
 
         self.memoryCapacity = self.config['memoryCapacity']
 
+        self.memoryOption = 'natural'
+        if 'memoryOption' in self.config:
+            self.memoryOption = self.config['memoryOption']
+
+        self.memoryCacheSize = 1024
+        if 'memoryCacheSize' in self.config:
+            self.memoryCacheSize = self.config['memoryCacheSize']
+
+        self.memoryStateCodecs = None
+        if 'memoryStateCodecs' in self.config:
+            self.memoryStateCodecs = self.config['memoryStateCodecs']
+
+        self.memoryFrameCapacity = None
+        if 'memoryFrameCapacity' in self.config:
+            self.memoryFrameCapacity = self.config['memoryFrameCapacity']
+
+        self.prefetchDepth = 0
+        if 'prefetchDepth' in self.config:
+            self.prefetchDepth = self.config['prefetchDepth']
+
+        self.stateSchema = None
+        if 'stateSchema' in self.config:
+            self.stateSchema = StateSchema(self.config['stateSchema'])
+
         self.hindSightER = False
         if 'hindSightER' in self.config:
             self.hindSightER = self.config['hindSightER']
@@ -139,6 +242,45 @@ class DDPGAgent:
         if 'policyUpdateFreq' in self.config:
             self.policyUpdateFreq = self.config['policyUpdateFreq']
 
+        self.flatParameters = False
+        if 'flatParameters' in self.config:
+            self.flatParameters = self.config['flatParameters']
+
+        self.precision = 'fp32'
+        if 'precision' in self.config:
+            self.precision = self.config['precision']
+        if self.precision not in PRECISIONS:
+            raise ValueError('precision is invalid')
+
+        self.compileMode = 'eager'
+        if 'compileMode' in self.config:
+            self.compileMode = self.config['compileMode']
+        if self.compileMode not in COMPILE_MODES:
+            raise ValueError('compileMode is invalid')
+
+        self.numActorThreads = 0
+        if 'numActorThreads' in self.config:
+            self.numActorThreads = self.config['numActorThreads']
+        if self.numActorThreads > 0:
+            overridden = overridden_methods(self, DDPGAgent, ['train', 'train_one_episode', 'work_before_step',
+                                                              'update_net', 'store_experience',
+                                                              'process_hindSightExperience',
+                                                              'process_experienceAugmentation'])
+            if overridden:
+                raise Exception('numActorThreads is not supported by agents overriding ' + ', '.join(overridden))
+
+        self.updateToDataRatio = 1
+        if 'updateToDataRatio' in self.config:
+            self.updateToDataRatio = self.config['updateToDataRatio']
+
+        self.actorSyncStep = 10
+        if 'actorSyncStep' in self.config:
+            self.actorSyncStep = self.config['actorSyncStep']
+
+        self.maxUpdateLag = 100
+        if 'maxUpdateLag' in self.config:
+            self.maxUpdateLag = self.config['maxUpdateLag']
+
     def net_to_device(self):
         '''
          move model to the specified devices
@@ -196,24 +338,33 @@ class DDPGAgent:
                 action = net.select_action(stateTorch.to(self.device), noiseFlag)
 
         return action.cpu().data.numpy()[0]
-    def process_hindSightExperience(self, state, action, nextState, reward, info):
+    def process_hindSightExperience(self, state, action, nextState, reward, info, env=None):
+        # env: environment which produced the experience, default self.env
+        if env is None:
+            env = self.env
         if nextState is not None and self.globalStepCount % self.hindSightERFreq == 0:
-            stateNew, actionNew, nextStateNew, rewardNew = self.env.getHindSightExperience(state, action, nextState, info)
+            stateNew, actionNew, nextStateNew, rewardNew = env.getHindSightExperience(state, action, nextState, info)
             if stateNew is not None:
                 transition = Transition(stateNew, actionNew, nextStateNew, rewardNew)
                 self.memory.push(transition)
                 if self.experienceAugmentation:
-                    self.process_experienceAugmentation(state, action, nextState, reward, info)
+                    self.process_experienceAugmentation(state, action, nextState, reward, info, env)
 
-    def process_experienceAugmentation(self, state, action, nextState, reward, info):
+    def process_experienceAugmentation(self, state, action, nextState, reward, info, env=None):
+        if env is None:
+            env = self.env
         if self.globalStepCount % self.experienceAugmentationFreq == 0:
-            state_Augs, action_Augs, nextState_Augs, reward_Augs = self.env.getExperienceAugmentation(state, action, nextState,
+            state_Augs, action_Augs, nextState_Augs, reward_Augs = env.getExperienceAugmentation(state, action, nextState,
                                                                                             reward, info)
             for i in range(len(state_Augs)):
                 transition = Transition(state_Augs[i], action_Augs[i], nextState_Augs[i], reward_Augs[i])
                 self.memory.push(transition)
 
-    def store_experience(self, state, action, nextState, reward, info):
+    def store_experience(self, state, action, nextState, reward, info, env=None):
+        '''
+        store experience tuple (state, action, nextState, reward) and its augmented and hindsight experiences
+        env: environment which produced the experience, e.g., the environment of an actor thread, default self.env
+        '''
         if self.experienceProcessor is not None:
             state, action, nextState, reward = self.experienceProcessor(state, action, nextState, reward, info)
 
@@ -221,11 +372,17 @@ class DDPGAgent:
         self.memory.push(transition)
 
         if self.experienceAugmentation:
-            self.process_experienceAugmentation(state, action, nextState, reward, info)
+            self.process_experienceAugmentation(state, action, nextState, reward, info, env)
 
         if self.hindSightER:
-            self.process_hindSightExperience(state, action, nextState, reward, info)
+            self.process_hindSightExperience(state, action, nextState, reward, info, env)
+
 
+    def sample_minibatch(self):
+        '''
+        sample a minibatch of experiences from memory, return the experiences and an info dictionary
+        '''
+        return self.memory.sample(self.trainBatchSize), {}
 
     def prepare_minibatch(self, transitions_raw):
         '''
@@ -236,6 +393,14 @@ class DDPGAgent:
         https://stackoverflow.com/questions/19339/transpose-unzip-function-inverse-of-zip/19343#19343
         '''
 
+        # minibatches from the prefetcher are already prepared
+        if isinstance(transitions_raw, PreparedMinibatch):
+            return transitions_raw
+
+        # experiences from array based memory are already collated into numpy arrays
+        if isinstance(transitions_raw, TransitionBatch):
+            return self.prepare_minibatch_from_arrays(transitions_raw)
+
         transitions = Transition(*zip(*transitions_raw))
         action = torch.tensor(transitions.action, device=self.device, dtype=torch.float32)  # shape(batch, numActions)
         reward = torch.tensor(transitions.reward, device=self.device, dtype=torch.float32)  # shape(batch)
@@ -253,18 +418,47 @@ class DDPGAgent:
 
         return state, nonFinalMask, nonFinalNextState, action, reward
 
+    def prepare_minibatch_from_arrays(self, batch):
+        '''
+        convert a TransitionBatch of numpy arrays to torch tensors without per-experience python work
+        '''
+        action = torch.from_numpy(batch.action).to(self.device, dtype=torch.float32)  # shape(batch, numActions)
+        reward = torch.from_numpy(batch.reward).to(self.device, dtype=torch.float32)  # shape(batch)
+        state = state_to_tensor(batch.state, self.device)
+        nonFinalMask = torch.from_numpy(batch.nonFinalMask).to(self.device)
+        nonFinalNextState = state_to_tensor(batch.nonFinalNextState, self.device)
+
+        return state, nonFinalMask, nonFinalNextState, action, reward
+
     def update_net(self, state, action, nextState, reward, info):
         '''
         This routine will store, transform, augment experiences and sample experiences for gradient descent.
         '''
 
-        self.store_experience(state, action, nextState, reward, info)
+        with self.memoryLock:
+            self.store_experience(state, action, nextState, reward, info)
 
         # prepare mini-batch
-        if len(self.memory) < self.trainBatchSize:
+        if not self.learning_ready():
             return
 
-        transitions_raw = self.memory.sample(self.trainBatchSize)
+        self.learn_step()
+
+    def learning_ready(self):
+        '''
+        whether the memory holds enough experiences to learn from
+        '''
+        return len(self.memory) >= self.trainBatchSize
+
+    def learn_step(self):
+        '''
+        sample a minibatch, perform one gradient update and soft update target networks
+        '''
+        if self.prefetcher is not None:
+            transitions_raw, _ = self.prefetcher.get()
+        else:
+            with self.memoryLock:
+                transitions_raw, _ = self.sample_minibatch()
 
         self.update_net_on_transitions(transitions_raw)
 
@@ -279,11 +473,7 @@ class DDPGAgent:
         # update networks
         if self.learnStepCounter % self.policyUpdateFreq == 0:
             # update target networks
-            for target_param, param in zip(self.actorNet_target.parameters(), self.actorNet.parameters()):
-                target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
-
-            for target_param, param in zip(self.criticNet_target.parameters(), self.criticNet.parameters()):
-                target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
+            self.softUpdate()
 
     def update_net_on_transitions(self, transitions_raw):
         '''
@@ -291,17 +481,27 @@ class DDPGAgent:
         '''
         state, nonFinalMask, nonFinalNextState, action, reward = self.prepare_minibatch(transitions_raw)
 
+        # the compiled losses see next states of the whole minibatch
+        nextState = None
+        if self.compiledCriticLoss is not None and torch.is_tensor(state):
+            nextState = full_next_state(nonFinalNextState, nonFinalMask)
+
         # Critic loss
-        QValues = self.criticNet.forward(state, action).squeeze()
-        QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
+        if nextState is not None:
+            critic_loss = self.compiledCriticLoss(state, action, reward, nextState, nonFinalMask.float())
+        else:
+            with autocast_context(self.precision, self.device):
+                QValues = self.criticNet.forward(state, action).squeeze().float()
+                QNext = torch.zeros(reward.shape[0], device=self.device, dtype=torch.float32)
 
-        if len(nonFinalNextState):
-            # next action is calculated using target actor network
-            next_actions = self.actorNet_target.forward(nonFinalNextState)
-            QNext[nonFinalMask] = self.criticNet_target.forward(nonFinalNextState, next_actions.detach()).squeeze()
+                if len(nonFinalNextState):
+                    # next action is calculated using target actor network
+                    next_actions = self.actorNet_target.forward(nonFinalNextState)
+                    QNext[nonFinalMask] = self.criticNet_target.forward(nonFinalNextState,
+                                                                        next_actions.detach()).squeeze().float()
 
-        targetValues = reward + self.gamma * QNext
-        critic_loss = self.netLossFunc(QValues, targetValues)
+            targetValues = reward + self.gamma * QNext
+            critic_loss = self.netLossFunc(QValues, targetValues)
 
         self.critic_optimizer.zero_grad()
         critic_loss.backward()
@@ -317,7 +517,11 @@ class DDPGAgent:
 
             # Actor loss
             # we try to maximize criticNet output(which is state value)
-            policy_loss = -self.criticNet.forward(state, self.actorNet.forward(state)).mean()
+            if nextState is not None:
+                policy_loss = self.compiledActorLoss(state)
+            else:
+                with autocast_context(self.precision, self.device):
+                    policy_loss = -self.criticNet.forward(state, self.actorNet.forward(state)).float().mean()
 
             self.actor_optimizer.zero_grad()
             policy_loss.backward()
@@ -376,6 +580,12 @@ class DDPGAgent:
             if done:
                 break
 
+        self.record_episode(stepCount, rewardSum, info)
+
+    def record_episode(self, stepCount, rewardSum, info):
+        '''
+        record the reward of a finished episode and save checkpoints
+        '''
         self.runningAvgEpisodeReward = (self.runningAvgEpisodeReward * self.epIdx + rewardSum) / (self.epIdx + 1)
         print("done in step count: {}".format(stepCount))
         print("reward sum = " + str(rewardSum))
@@ -394,11 +604,58 @@ class DDPGAgent:
         if len(self.rewards) > 0:
             self.runningAvgEpisodeReward = self.rewards[-1][-1]
 
-        for trainStepCount in range(self.trainStep):
-            self.train_one_episode()
+        if self.numActorThreads > 0:
+            self.train_actor_learner()
+        else:
+            for trainStepCount in range(self.trainStep):
+                self.train_one_episode()
             
 
         self.save_all()
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
+    def train_actor_learner(self):
+        '''
+        train trainStep episodes with numActorThreads actor threads stepping environments and gradient updates in
+        this thread
+        '''
+        if self.actorEnvs is None:
+            self.actorEnvs = [self.env] + [deepcopy(self.env) for _ in range(self.numActorThreads - 1)]
+        self.actorLearner = ActorLearner(self.actorNet, self.numActorThreads, self.trainStep, self.updateToDataRatio,
+                                         self.actorSyncStep, self.maxUpdateLag)
+        self.actorLearner.run(self.run_actor, self.learn_step, self.learning_ready)
+
+    def run_actor(self, actorIdx):
+        '''
+        run episodes with the environment of actor thread actorIdx until all episodes are started
+        '''
+        env = self.actorEnvs[actorIdx]
+        while self.actorLearner.start_episode():
+            state = env.reset()
+            rewardSum = 0
+
+            for stepCount in range(self.episodeLength):
+                with self.actorLearner.policy() as net:
+                    action = self.select_action(net, state, noiseFlag=True)
+
+                nextState, reward, done, info = env.step(action)
+                if done:
+                    nextState = None
+
+                with self.memoryLock:
+                    self.store_experience(state, action, nextState, reward, info, env)
+
+                state = nextState
+                rewardSum += reward * pow(self.gamma, stepCount)
+                with self.actorLearner.lock:
+                    self.globalStepCount += 1
+
+                if not self.actorLearner.step() or done:
+                    break
+
+            with self.actorLearner.lock:
+                self.record_episode(stepCount, rewardSum, info)
 
     def saveLosses(self, fileName):
         np.savetxt(fileName, np.array(self.losses), fmt='%.5f', delimiter='\t')
@@ -418,8 +675,8 @@ class DDPGAgent:
         prefix = self.dirName + identifier + 'Finalepoch' + str(self.epIdx)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        with self.memoryLock:
+            self.memoryCheckpoint.save(self.memory, prefix)
 
         torch.save({
             'epoch': self.epIdx,
@@ -437,8 +694,8 @@ class DDPGAgent:
         prefix = self.dirName + identifier + 'Epoch' + str(self.epIdx)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        with self.memoryLock:
+            self.memoryCheckpoint.save(self.memory, prefix)
 
         torch.save({
             'epoch': self.epIdx,
@@ -452,8 +709,11 @@ class DDPGAgent:
     def load_checkpoint(self, prefix):
         self.loadLosses(prefix + '_loss.txt')
         self.loadRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'rb') as file:
-            self.memory = pickle.load(file)
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        # experiences are loaded into a newly initialized memory
+        self.init_memory()
+        self.memory = self.memoryCheckpoint.load(self.memory, prefix)
 
         checkpoint = torch.load(prefix + '_checkpoint.pt')
         self.epIdx = checkpoint['epoch']
@@ -4,6 +4,7 @@ from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.DDPG.DDPG import DDPGAgent
 
 from Agents.Core.ExtendedReplayMemory import ExtendedReplayMemory, ExtendedTransition
+from Agents.Core.Precision import autocast_context
 
 import pickle
 
@@ -68,24 +69,26 @@ class DDPGMultiStageUnit(DDPGAgent):
         # now do net update
 
         # Critic loss
-        QValues = self.criticNet.forward(state, action).squeeze()
-        QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
+        with autocast_context(self.precision, self.device):
+            QValues = self.criticNet.forward(state, action).squeeze().float()
+            QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
 
 
-        numNonFinalNextState = sum(nonFinalMask)
-        numFinalNextState = sum(finalMask)
+            numNonFinalNextState = sum(nonFinalMask)
+            numFinalNextState = sum(finalMask)
 
-        if numNonFinalNextState:
+            if numNonFinalNextState:
 
-            next_actions = self.actorNet_target.forward(nonFinalNextState)
+                next_actions = self.actorNet_target.forward(nonFinalNextState)
 
-            # if we do not have stage done
-            # we use our own target net to bootstrap
-            QNext[nonFinalMask] = self.criticNet_target.forward(nonFinalNextState, next_actions.detach()).squeeze()
+                # if we do not have stage done
+                # we use our own target net to bootstrap
+                QNext[nonFinalMask] = self.criticNet_target.forward(nonFinalNextState,
+                                                                    next_actions.detach()).squeeze().float()
 
-        if numFinalNextState:
-            if targetAgent is not None:
-                QNext[finalMask] = targetAgent.evaluate_state_value(finalNextState)
+            if numFinalNextState:
+                if targetAgent is not None:
+                    QNext[finalMask] = targetAgent.evaluate_state_value(finalNextState).float()
 
         targetValues = reward + self.gamma * QNext
         critic_loss = self.netLossFunc(QValues, targetValues)
@@ -104,7 +107,8 @@ class DDPGMultiStageUnit(DDPGAgent):
 
             # Actor loss
             # we try to maximize criticNet output(which is state value)
-            policy_loss = -self.criticNet.forward(state, self.actorNet.forward(state)).mean()
+            with autocast_context(self.precision, self.device):
+                policy_loss = -self.criticNet.forward(state, self.actorNet.forward(state)).float().mean()
 
             self.actor_optimizer.zero_grad()
             policy_loss.backward()
@@ -120,11 +124,7 @@ class DDPGMultiStageUnit(DDPGAgent):
         # update networks
         if self.learnStepCounter % self.policyUpdateFreq == 0:
             # update target networks
-            for target_param, param in zip(self.actorNet_target.parameters(), self.actorNet.parameters()):
-                target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
-
-            for target_param, param in zip(self.criticNet_target.parameters(), self.criticNet.parameters()):
-                target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
+            self.softUpdate()
 
         self.learnStepCounter += 1
 
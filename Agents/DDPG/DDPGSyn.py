@@ -0,0 +1,211 @@
+import torch
+import numpy as np
+from Agents.DDPG.DDPG import DDPGAgent
+from Agents.Core.ReplayMemory import Transition
+from Agents.Core.SharedVecEnv import unbatch_observations
+from utils.OUNoise import VecOUNoise
+
+
+class DDPGSynAgent(DDPGAgent):
+    """class for DDPG agents training on synchronized environments.
+        env is a vectorized environment of numWorkers environments, e.g., SharedVecEnv, which resets environments whose
+        episodes are done. Actions of all environments are selected in one forward pass of the actor net, exploration
+        noise is drawn independently for each environment, and the numWorkers experiences of a step are stored under one
+        acquisition of the memory lock. Rewards and step counts are tracked for each environment and every finished
+        episode is recorded as in DDPGAgent.
+        Episodes reaching episodeLength are truncated by env.reset(indices), their last experience is not terminal.
+        Episodes ended by the environment with info['endBeforeDone'] are not terminal either, their experience is
+        stored if the vec env returns info['terminal_observation'].
+        Hindsight experience replay and experience augmentation call the methods of the environment which produced an
+        experience, for SharedVecEnv the environment of its worker (see WorkerEnv). Batched environments (see
+        BatchedEnv) providing getHindSightExperienceBatch relabel the experiences of all environments of a step at once.
+        # Arguments
+            same as DDPGAgent, env is a vectorized environment
+        """
+    def __init__(self, config, actorNets, criticNets, env, optimizers, netLossFunc, nbAction, stateProcessor = None, experienceProcessor = None):
+        super(DDPGSynAgent, self).__init__(config, actorNets, criticNets, env, optimizers, netLossFunc, nbAction,
+                                           stateProcessor, experienceProcessor)
+        self.init_action_noise()
+
+    def read_config(self):
+        '''
+        read parameters of synchronized training in addition to those of the base agent
+        numWorkers: number of environments of the vectorized environment
+        trainStep: number of episodes to train, summed over all environments
+        actionNoiseOption: OU (an Ornstein-Ulhenbeck process per environment), gaussian or policy (noise added by the
+            select_action of the actor net, e.g., sampling of a stochastic policy), default OU
+        actionNoiseSigma: scale of OU and gaussian noise, default 0.3
+        actionNoiseTheta: mean reversion of OU noise, default 0.15
+        actionBound: noisy actions are clipped to [-actionBound, actionBound], default 1
+        updateToDataRatio: gradient updates per environment step, default 1
+        '''
+        super(DDPGSynAgent, self).read_config()
+        self.numWorkers = self.config['numWorkers']
+
+        self.actionNoiseOption = 'OU'
+        if 'actionNoiseOption' in self.config:
+            self.actionNoiseOption = self.config['actionNoiseOption']
+        if self.actionNoiseOption not in ['OU', 'gaussian', 'policy']:
+            raise Exception('actionNoiseOption is invalid')
+
+        self.actionNoiseSigma = 0.3
+        if 'actionNoiseSigma' in self.config:
+            self.actionNoiseSigma = self.config['actionNoiseSigma']
+
+        self.actionNoiseTheta = 0.15
+        if 'actionNoiseTheta' in self.config:
+            self.actionNoiseTheta = self.config['actionNoiseTheta']
+
+        self.actionBound = 1
+        if 'actionBound' in self.config:
+            self.actionBound = self.config['actionBound']
+
+    def initialization(self):
+        super(DDPGSynAgent, self).initialization()
+        # batched environments (e.g., StablizerMultiDContinuousBatched) relabel hindsight experiences in batch
+        self.batchHindSightER = hasattr(self.env, 'getHindSightExperienceBatch')
+        # hindsight and augmented experiences of worker i are computed by its environment, batched environments
+        # handle single experiences themselves
+        self.workerEnvs = [self.env] * self.numWorkers
+        if hasattr(self.env, 'worker_env'):
+            self.workerEnvs = [self.env.worker_env(i) for i in range(self.numWorkers)]
+
+    def init_action_noise(self):
+        self.actionNoise = None
+        if self.actionNoiseOption == 'OU':
+            self.actionNoise = VecOUNoise(self.numWorkers, self.numAction, seed=self.randomSeed, mu=0.0,
+                                          theta=self.actionNoiseTheta, max_sigma=self.actionNoiseSigma,
+                                          min_sigma=self.actionNoiseSigma)
+
+    def select_action(self, net=None, states=None, noiseFlag = False):
+        '''
+        select actions of all environments in one forward pass of net
+        # Arguments
+        net: which net used for action selection. default is actorNet
+        states: batched observations of the vectorized environment
+        noiseFlag: if set False, will perform greedy selection. if True, will add noise of actionNoiseOption.
+        return: numpy array of actions, shape (numWorkers, numAction)
+        '''
+        if net is None:
+            net = self.actorNet
+
+        netNoise = noiseFlag and self.actionNoiseOption == 'policy'
+        with torch.no_grad():
+            if self.stateProcessor is not None:
+                states, _ = self.stateProcessor(unbatch_observations(states), self.device)
+                actions = net.select_action(states, netNoise)
+            else:
+                stateTorch = torch.from_numpy(np.array(states, dtype=np.float32))
+                actions = net.select_action(stateTorch.to(self.device), netNoise)
+        actions = actions.cpu().numpy().reshape(self.numWorkers, -1)
+
+        if noiseFlag and self.actionNoiseOption != 'policy':
+            if self.actionNoiseOption == 'OU':
+                noise = self.actionNoise.get_noise()
+            else:
+                noise = self.actionNoiseSigma * np.random.randn(*actions.shape)
+            actions = np.clip(actions + noise, -self.actionBound, self.actionBound).astype(np.float32)
+
+        return actions
+
+    def store_experiences(self, states, actions, nextStates, rewards, infos, storeFlags):
+        '''
+        store the experiences of all environments of a step, skipping those whose storeFlags is False
+        '''
+        with self.memoryLock:
+            for i in np.where(storeFlags)[0]:
+                self.store_experience(states[i], actions[i], nextStates[i], rewards[i], infos[i],
+                                      self.workerEnvs[i])
+
+            if self.hindSightER and self.batchHindSightER and self.globalStepCount % self.hindSightERFreq == 0:
+                self.process_hindSightExperienceBatch(states, actions, nextStates, infos, storeFlags)
+
+    def process_hindSightExperience(self, state, action, nextState, reward, info, env=None):
+        # batched environments relabel the experiences of all environments at once
+        if not self.batchHindSightER:
+            super(DDPGSynAgent, self).process_hindSightExperience(state, action, nextState, reward, info, env)
+
+    def process_hindSightExperienceBatch(self, states, actions, nextStates, infos, storeFlags):
+        '''
+        store hindsight experiences of non-terminal experiences relabeled by env.getHindSightExperienceBatch
+        '''
+        statesNew, actionsNew, nextStatesNew, rewardsNew = self.env.getHindSightExperienceBatch(states, actions,
+                                                                                                nextStates, infos)
+        statesNew = unbatch_observations(statesNew)
+        nextStatesNew = [None] * len(statesNew) if nextStatesNew is None else unbatch_observations(nextStatesNew)
+        for i in np.where(storeFlags)[0]:
+            if nextStates[i] is not None:
+                self.memory.push(Transition(statesNew[i], actionsNew[i], nextStatesNew[i], rewardsNew[i]))
+
+    def train(self):
+
+        # continue on historical training
+        if len(self.rewards) > 0:
+            self.runningAvgEpisodeReward = self.rewards[-1][-1]
+
+        observations = self.env.reset()
+        if self.actionNoise is not None:
+            self.actionNoise.reset()
+        stepCounts = np.zeros(self.numWorkers, dtype=np.int64)
+        rewardSums = np.zeros(self.numWorkers)
+        # gradient updates owed to the environment steps taken since the memory is ready
+        owedUpdates = 0.0
+
+        while self.epIdx < self.trainStep:
+
+            actions = self.select_action(self.actorNet, observations, noiseFlag=True)
+
+            nextObservations, rewards, dones, infos = self.env.step(actions)
+
+            states = unbatch_observations(observations)
+            nextStates = unbatch_observations(nextObservations)
+            storeFlags = np.ones(self.numWorkers, dtype=np.bool_)
+            for i in np.where(dones)[0]:
+                if infos[i].get('endBeforeDone', False):
+                    # episodes ended due to step limit are not terminal, their next state is the terminal observation
+                    if 'terminal_observation' in infos[i]:
+                        terminal = infos[i]['terminal_observation']
+                        nextStates[i] = terminal.tolist() if isinstance(terminal, np.ndarray) else terminal
+                    else:
+                        storeFlags[i] = False
+                else:
+                    nextStates[i] = None
+
+            self.store_experiences(states, actions, nextStates, rewards, infos, storeFlags)
+
+            rewardSums += rewards * np.power(self.gamma, stepCounts)
+            stepCounts += 1
+            self.globalStepCount += self.numWorkers
+
+            if self.verbose:
+                print('actions: ' + str(actions))
+                print('rewards: ' + str(rewards))
+                print(infos)
+
+            # truncate episodes reaching episodeLength
+            truncated = np.where(~dones & (stepCounts >= self.episodeLength))[0]
+            if len(truncated):
+                nextObservations = self.env.reset(truncated)
+
+            finished = np.where(dones | (stepCounts >= self.episodeLength))[0]
+            for i in finished:
+                print("episode index:" + str(self.epIdx))
+                self.record_episode(stepCounts[i] - 1, rewardSums[i], infos[i])
+            if len(finished):
+                stepCounts[finished] = 0
+                rewardSums[finished] = 0.0
+                if self.actionNoise is not None:
+                    self.actionNoise.reset(finished)
+
+            observations = nextObservations
+
+            # learn from the experiences of the step
+            if self.learning_ready():
+                owedUpdates += self.updateToDataRatio * self.numWorkers
+                while owedUpdates >= 1:
+                    self.learn_step()
+                    owedUpdates -= 1
+
+        self.save_all()
+        if self.prefetcher is not None:
+            self.prefetcher.close()
@@ -4,6 +4,10 @@ import json
 import random
 import numpy as np
 import math
+from Agents.Core.StateSchema import StateSchema
+from Agents.Core.FlatParameters import flatten_parameters
+from Agents.Core.Precision import PRECISIONS
+from Agents.Core.CompiledStep import COMPILE_MODES
 
 class BaseDQNAgent(object):
     """Abstract base class for DQN based agents.
@@ -28,6 +32,9 @@ class BaseDQNAgent(object):
         self.optimizer = optimizer
         self.numAction = nbAction
         self.stateProcessor = stateProcessor
+        # dictionary states declared by a schema are collated without a custom stateProcessor
+        if self.stateProcessor is None and self.stateSchema is not None:
+            self.stateProcessor = self.stateSchema.collate
         self.experienceProcessor = experienceProcessor
         self.netLossFunc = netLossFunc
         self.initialization()
@@ -40,6 +47,12 @@ class BaseDQNAgent(object):
         if self.targetNet is not None:
             self.targetNet = self.targetNet.to(self.device)
 
+        # target net syncs become one contiguous copy
+        if self.flatParameters:
+            flatten_parameters(self.policyNet)
+            if self.targetNet is not None:
+                flatten_parameters(self.targetNet)
+
         self.dirName = 'Log/'
         if 'dataLogFolder' in self.config:
             self.dirName = self.config['dataLogFolder']
@@ -79,12 +92,21 @@ class BaseDQNAgent(object):
         randomSeed
         hindSightER: bool variable for hindsight experience replay
         hindSightERFreq: frequency to perform hindsight experience replay
+        stateSchema: fields of dictionary states, e.g., {'sensor': {'shape': [1, 21, 21], 'dtype': 'uint8'}, 'target': {'shape': [2]}}
+        fuseTDForward: bool, evaluate states and next states in one policy net forward for doubleQ, default True
+        flatParameters: bool, back the parameters of policy and target nets with flat tensors (see FlatParameters), default False
+        precision: fp32 or bf16, bf16 runs the forward passes of training under bfloat16 autocast, default fp32
+        compileMode: eager, compile (torch.compile) or trace (torch.jit.trace), compiles the loss of fixed shape minibatches (see CompiledStep), default eager
         return: None
         '''
 
 
         self.trainStep = self.config['trainStep']
 
+        self.stateSchema = None
+        if 'stateSchema' in self.config:
+            self.stateSchema = StateSchema(self.config['stateSchema'])
+
         self.targetNetUpdateStep = 10000
         if 'targetNetUpdateStep' in self.config:
             self.targetNetUpdateStep = self.config['targetNetUpdateStep']
@@ -159,6 +181,26 @@ class BaseDQNAgent(object):
         if 'netUpdateStep' in self.config:
             self.netUpdateStep = self.config['netUpdateStep']
 
+        self.fuseTDForward = True
+        if 'fuseTDForward' in self.config:
+            self.fuseTDForward = self.config['fuseTDForward']
+
+        self.flatParameters = False
+        if 'flatParameters' in self.config:
+            self.flatParameters = self.config['flatParameters']
+
+        self.precision = 'fp32'
+        if 'precision' in self.config:
+            self.precision = self.config['precision']
+        if self.precision not in PRECISIONS:
+            raise ValueError('precision is invalid')
+
+        self.compileMode = 'eager'
+        if 'compileMode' in self.config:
+            self.compileMode = self.config['compileMode']
+        if self.compileMode not in COMPILE_MODES:
+            raise ValueError('compileMode is invalid')
+
     def select_action(self, net=None, state=None, epsThreshold=None, noiseFlag = True):
         '''
         select action based on epsilon rule
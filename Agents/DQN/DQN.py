@@ -2,7 +2,24 @@
 from Agents.DQN.BaseDQN import BaseDQNAgent
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.Core.ReplayMemoryReward import ReplayMemoryReward
+from Agents.Core.ReplayMemoryLambda import ReplayMemoryLambda
 from Agents.Core.PrioritizedReplayMemory import PrioritizedReplayMemory
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory, TransitionBatch, state_to_tensor
+from Agents.Core.StateCodec import make_codecs
+from Agents.Core.MemmapReplayMemory import MemmapReplayMemory
+from Agents.Core.FrameReplayMemory import FrameReplayMemory
+from Agents.Core.SharedReplayMemory import SharedReplayMemory
+from Agents.Core.MinibatchPrefetcher import MinibatchPrefetcher, PreparedMinibatch
+from Agents.Core.MemoryCheckpoint import MemoryCheckpoint
+from Agents.Core.NStepReturn import NStepReturn
+from Agents.Core.TDTarget import TDTarget
+from Agents.Core.FlatParameters import sync_net
+from Agents.Core.Precision import autocast_context
+from Agents.Core.CompiledStep import CompiledLoss, DQNLoss, full_next_state
+from Agents.Core.ActorLearner import ActorLearner, overridden_methods
+from copy import deepcopy
+import contextlib
+import threading
 import random
 import torch
 import torch.optim
@@ -28,8 +45,18 @@ class DQNAgent(BaseDQNAgent):
         """
     def __init__(self, config, policyNet, targetNet, env, optimizer, netLossFunc, nbAction, stateProcessor = None, experienceProcessor=None):
         super(DQNAgent, self).__init__(config, policyNet, targetNet, env, optimizer, netLossFunc, nbAction, stateProcessor, experienceProcessor)
+        # pending experiences of multiple step forward returns
+        self.nStepBuffer = NStepReturn(self.nStepForward, self.gamma)
+        # Q values and their TD targets of minibatches
+        self.tdTarget = TDTarget(self.device, self.fuseTDForward)
+        # compiled loss of the learner step
+        self.init_compiled_loss()
         # initialize memory units
         self.init_memory()
+        self.memoryCheckpoint = MemoryCheckpoint()
+        self.init_prefetcher()
+        # environments of actor threads, the first one is env
+        self.actorEnvs = None
 
 
     def init_memory(self):
@@ -40,14 +67,76 @@ class DQNAgent(BaseDQNAgent):
             # most commonly experience replay memory
             if self.memoryOption == 'natural':
                 self.memory = ReplayMemory(self.memoryCapacity)
+            elif self.memoryOption == 'array':
+                # experiences are stored in preallocated numpy arrays, states need to be numpy arrays
+                self.memory = ArrayReplayMemory(self.memoryCapacity, codecs=make_codecs(self.memoryStateCodecs),
+                                                schema=self.stateSchema)
+            elif self.memoryOption == 'frame':
+                # array based memory storing each observation only once
+                self.memory = FrameReplayMemory(self.memoryCapacity, self.memoryFrameCapacity,
+                                                codecs=make_codecs(self.memoryStateCodecs), schema=self.stateSchema)
+            elif self.memoryOption == 'memmap':
+                # array based memory stored on disk under the data log folder
+                self.memory = MemmapReplayMemory(self.memoryCapacity, self.dirName + 'replayMemory/',
+                                                 self.memoryCacheSize, codecs=make_codecs(self.memoryStateCodecs),
+                                                 schema=self.stateSchema)
             elif self.memoryOption == 'reward':
+                # non-terminal and terminal experiences are stored in two array ring buffers
                 self.memory = ReplayMemoryReward(self.memoryCapacity, self.config['rewardMemoryBackupStep'],
-                                                 self.gamma, self.config['rewardMemoryTerminalRatio'] )
+                                                 self.gamma, self.config['rewardMemoryTerminalRatio'],
+                                                 codecs=make_codecs(self.memoryStateCodecs), schema=self.stateSchema)
+            elif self.memoryOption == 'lambda':
+                # rewards of sampled experiences are lambda returns computed with the target net
+                self.memory = ReplayMemoryLambda(self.config, self.memoryCapacity, self.lambda_values,
+                                                 codecs=make_codecs(self.memoryStateCodecs), schema=self.stateSchema)
+            elif self.memoryOption == 'shared':
+                # experiences are stored in shared memory tensors, processes started afterwards push and sample
+                stateShape = self.env.stateDim if self.memoryStateShape is None else self.memoryStateShape
+                self.memory = SharedReplayMemory(self.memoryCapacity, stateShape)
+
+    def init_compiled_loss(self):
+        '''
+        initialize the compiled loss of fixed shape minibatches if compileMode is not eager.
+        Lambda memory and the policyNet update option run eagerly
+        '''
+        self.compiledLoss = None
+        if self.compileMode != 'eager' and self.memoryOption != 'lambda' \
+                and self.netUpdateOption in ('targetNet', 'doubleQ'):
+            self.compiledLoss = CompiledLoss(DQNLoss(self.policyNet, self.targetNet, self.netUpdateOption,
+                                                     self.netLossFunc, self.gamma**self.nStepForward,
+                                                     self.fuseTDForward, self.precision, self.device),
+                                             self.compileMode)
+
+    def init_prefetcher(self):
+        '''
+        initialize the background minibatch prefetcher if prefetchDepth > 0.
+        memoryLock has to be held for every access to the memory during training
+        '''
+        self.prefetcher = None
+        self.memoryLock = contextlib.nullcontext()
+        if self.numActorThreads > 0:
+            # actor threads push experiences while the learner samples
+            self.memoryLock = threading.Lock()
+        if self.prefetchDepth > 0:
+            self.prefetcher = MinibatchPrefetcher(self.sample_minibatch, self.prepare_minibatch, self.prefetchDepth)
+            self.memoryLock = self.prefetcher.lock
 
     def read_config(self):
         '''
         reading additional configurations
         memoryCapacity, memoryOption
+        memoryOption: allowed strings are natural, array, frame, memmap, priority, reward, lambda, shared
+        memoryStateShape: shape of the array states stored by shared memory, default env.stateDim
+        memoryCacheSize: number of recent experiences kept in RAM for memmap memory, default 1024
+        memoryFrameCapacity: number of observations stored by frame memory, default 1.1 x memoryCapacity
+        memoryStateCodecs: state storage codecs for array and memmap memory, e.g., {'sensor': 'bitpack', 'target': 'float16'}
+        prefetchDepth: number of minibatches sampled and collated ahead in a background thread, default 0 (no prefetching).
+            Not supported by lambda memory
+        numActorThreads: number of actor threads stepping environments while this thread learns (see ActorLearner), default 0 (serial training).
+            Actors after the first one step deep copies of env, unless agent.actorEnvs is set to a list of environments
+        updateToDataRatio: gradient updates per environment step in actor learner training, default netUpdateStep / netUpdateFrequency
+        actorSyncStep: number of gradient updates between refreshes of the policy copy of the actors, default 10
+        maxUpdateLag: number of gradient updates the learner can be behind before actors wait, default 100
         priorityMemoryOption
 
         '''
@@ -57,6 +146,26 @@ class DQNAgent(BaseDQNAgent):
         # read additional parameters
         self.memoryCapacity = self.config['memoryCapacity']
 
+        self.memoryCacheSize = 1024
+        if 'memoryCacheSize' in self.config:
+            self.memoryCacheSize = self.config['memoryCacheSize']
+
+        self.memoryStateCodecs = None
+        if 'memoryStateCodecs' in self.config:
+            self.memoryStateCodecs = self.config['memoryStateCodecs']
+
+        self.memoryFrameCapacity = None
+        if 'memoryFrameCapacity' in self.config:
+            self.memoryFrameCapacity = self.config['memoryFrameCapacity']
+
+        self.memoryStateShape = None
+        if 'memoryStateShape' in self.config:
+            self.memoryStateShape = self.config['memoryStateShape']
+
+        self.prefetchDepth = 0
+        if 'prefetchDepth' in self.config:
+            self.prefetchDepth = self.config['prefetchDepth']
+
         self.memoryOption = 'natural'
         self.priorityMemoryOption = False
         if 'memoryOption' in self.config:
@@ -66,6 +175,37 @@ class DQNAgent(BaseDQNAgent):
                 # reward memory requires nstep forward to be 1
             if self.memoryOption == 'reward':
                 self.nStepForward = 1
+            # lambda returns replace multiple step forward returns
+            if self.memoryOption == 'lambda':
+                self.nStepForward = 1
+
+        self.numActorThreads = 0
+        if 'numActorThreads' in self.config:
+            self.numActorThreads = self.config['numActorThreads']
+        # reward and lambda memory track one episode at a time
+        if self.numActorThreads > 1 and self.memoryOption in ('reward', 'lambda'):
+            raise Exception('memoryOption does not support multiple actor threads')
+        # lambda memory evaluates the target net when sampling, which the prefetch thread would do while the learner
+        # syncs the target net
+        if self.prefetchDepth > 0 and self.memoryOption == 'lambda':
+            raise Exception('memoryOption does not support prefetchDepth')
+        if self.numActorThreads > 0:
+            overridden = overridden_methods(self, DQNAgent, ['train', 'train_one_episode', 'work_At_Episode_Begin',
+                                                             'work_before_step', 'update_net', 'store_experience'])
+            if overridden:
+                raise Exception('numActorThreads is not supported by agents overriding ' + ', '.join(overridden))
+
+        self.updateToDataRatio = self.netUpdateStep / self.netUpdateFrequency
+        if 'updateToDataRatio' in self.config:
+            self.updateToDataRatio = self.config['updateToDataRatio']
+
+        self.actorSyncStep = 10
+        if 'actorSyncStep' in self.config:
+            self.actorSyncStep = self.config['actorSyncStep']
+
+        self.maxUpdateLag = 100
+        if 'maxUpdateLag' in self.config:
+            self.maxUpdateLag = self.config['maxUpdateLag']
 
     def work_At_Episode_Begin(self):
         '''
@@ -75,6 +215,9 @@ class DQNAgent(BaseDQNAgent):
         '''
         # clear the nstep buffer
         self.nStepBuffer.clear()
+        # memories tracking episodes, e.g., reward memory, start a new episode also after truncated episodes
+        if hasattr(self.memory, 'start_episode'):
+            self.memory.start_episode()
 
     def work_before_step(self, state=None):
         '''
@@ -129,6 +272,14 @@ class DQNAgent(BaseDQNAgent):
             if done:
                 break
 
+        self.record_episode(stepCount, rewardSum, info)
+
+        return stepCount, rewardSum
+
+    def record_episode(self, stepCount, rewardSum, info):
+        '''
+        record the reward of a finished episode and save checkpoints
+        '''
         self.runningAvgEpisodeReward = (self.runningAvgEpisodeReward * self.epIdx + rewardSum) / (self.epIdx + 1)
         print("done in step count: {}".format(stepCount))
         print("reward sum = " + str(rewardSum))
@@ -141,115 +292,169 @@ class DQNAgent(BaseDQNAgent):
 
         self.epIdx += 1
 
-        return stepCount, rewardSum
-
     def train(self):
 
         if len(self.rewards) > 0:
             self.runningAvgEpisodeReward = self.rewards[-1][-1]
 
-        for trainStepCount in range(self.trainStep):
-            self.train_one_episode()
+        if self.numActorThreads > 0:
+            self.train_actor_learner()
+        else:
+            for trainStepCount in range(self.trainStep):
+                self.train_one_episode()
         self.save_all()
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
+    def train_actor_learner(self):
+        '''
+        train trainStep episodes with numActorThreads actor threads stepping environments and gradient updates in
+        this thread
+        '''
+        if self.actorEnvs is None:
+            self.actorEnvs = [self.env] + [deepcopy(self.env) for _ in range(self.numActorThreads - 1)]
+        self.actorLearner = ActorLearner(self.policyNet, self.numActorThreads, self.trainStep, self.updateToDataRatio,
+                                         self.actorSyncStep, self.maxUpdateLag)
+        self.actorLearner.run(self.run_actor, self.learn_step, self.learning_ready)
 
-    def store_experience(self, state, action, nextState, reward, info):
+    def run_actor(self, actorIdx):
+        '''
+        run episodes with the environment of actor thread actorIdx until all episodes are started
+        '''
+        env = self.actorEnvs[actorIdx]
+        nStepBuffer = NStepReturn(self.nStepForward, self.gamma)
+        while self.actorLearner.start_episode():
+            state = env.reset()
+            rewardSum = 0
+            nStepBuffer.clear()
+            if hasattr(self.memory, 'start_episode'):
+                with self.memoryLock:
+                    self.memory.start_episode()
+
+            for stepCount in range(self.episodeLength):
+                epsThreshold = self.epsilon_by_step(self.globalStepCount)
+                with self.actorLearner.policy() as net:
+                    action = self.select_action(net, state, epsThreshold)
+
+                nextState, reward, done, info = env.step(action)
+                if done:
+                    nextState = None
+
+                with self.memoryLock:
+                    self.store_experience(state, action, nextState, reward, info, nStepBuffer)
+                    if self.hindSightER and nextState is not None and self.globalStepCount % self.hindSightERFreq == 0:
+                        stateNew, actionNew, nextStateNew, rewardNew = env.getHindSightExperience(state, action,
+                                                                                                 nextState, info)
+                        if stateNew is not None:
+                            self.store_experience(stateNew, actionNew, nextStateNew, rewardNew, info, nStepBuffer)
+
+                state = nextState
+                rewardSum += reward * pow(self.gamma, stepCount)
+                with self.actorLearner.lock:
+                    self.globalStepCount += 1
+
+                if not self.actorLearner.step() or done:
+                    break
+
+            with self.actorLearner.lock:
+                self.record_episode(stepCount, rewardSum, info)
+
+    def store_experience(self, state, action, nextState, reward, info, nStepBuffer=None):
         '''
         store experience tuple (state, action, nextState, reward)
+        nStepBuffer: pending experiences of multiple step forward returns, default the buffer of the agent
         '''
+        if nStepBuffer is None:
+            nStepBuffer = self.nStepBuffer
         if self.experienceProcessor is not None:
             state, action, nextState, reward = self.experienceProcessor(state, action, nextState, reward, info)
         # caution: using multiple step forward return can increase variance
         if self.nStepForward > 1:
-
-            # if this is final state, we want to do additional backup to increase useful learning experience
-            if nextState is None:
-                transitions = []
-                transitions.append(Transition(state, action, nextState, reward))
-                R = reward
-                while len(self.nStepBuffer) > 0:
-                    state, action, next_state, reward_old = self.nStepBuffer.pop(0)
-                    R = reward_old + self.gamma * R
-                    transNew = Transition(state, action, None, R)
-                    transitions.append(transNew)
-                for tran in transitions:
-                    if self.priorityMemoryOption:
-                        self.memory.store(tran)
-                    else:
-                        self.memory.push(tran)
-
-            else:
-                # otherwise we calculate normal n step return
-                self.nStepBuffer.append((state, action, nextState, reward))
-
-                if len(self.nStepBuffer) < self.nStepForward:
-                    return
-
-                R = sum([self.nStepBuffer[i][3]*(self.gamma**i) for i in range(self.nStepForward)])
-
-                state, action, _, _ = self.nStepBuffer.pop(0)
-
-                transition = Transition(state, action, nextState, R)
-
-                if self.priorityMemoryOption:
-                    self.memory.store(transition)
-                else:
-                    self.memory.push(transition)
-
+            # n step returns, at the final state the reward is backed up to all pending experiences
+            transitions = nStepBuffer.append(state, action, nextState, reward)
         else:
             # if it is one step
-            transition = Transition(state, action, nextState, reward)
+            transitions = [Transition(state, action, nextState, reward)]
 
+        for transition in transitions:
             if self.priorityMemoryOption:
                 self.memory.store(transition)
             else:
                 self.memory.push(transition)
 
-
-
-
     def update_net(self, state, action, nextState, reward, info):
         '''
         This routine will store, transform, augment experiences and sample experiences for gradient descent.
         '''
 
 
-        self.store_experience(state, action, nextState, reward, info)
+        with self.memoryLock:
+            self.store_experience(state, action, nextState, reward, info)
 
-        if self.hindSightER and nextState is not None and self.globalStepCount % self.hindSightERFreq == 0:
-            stateNew, actionNew, nextStateNew, rewardNew = self.env.getHindSightExperience(state, action, nextState, info)
-            if stateNew is not None:
-                self.store_experience(stateNew, actionNew, nextStateNew, rewardNew, info)
+            if self.hindSightER and nextState is not None and self.globalStepCount % self.hindSightERFreq == 0:
+                stateNew, actionNew, nextStateNew, rewardNew = self.env.getHindSightExperience(state, action, nextState, info)
+                if stateNew is not None:
+                    self.store_experience(stateNew, actionNew, nextStateNew, rewardNew, info)
 
 
-        if self.priorityMemoryOption:
-            if len(self.memory) < self.config['memoryCapacity']:
-                return
-        else:
-            if len(self.memory) < self.trainBatchSize:
-                return
-
+        if not self.learning_ready():
+            return
 
         # update net with specified frequency
         if self.globalStepCount % self.netUpdateFrequency == 0:
-            # sample experience
             for nStep in range(self.netUpdateStep):
-                info = {}
-                if self.priorityMemoryOption:
-                    transitions_raw, b_idx, ISWeights = self.memory.sample(self.trainBatchSize)
-                    info['batchIdx'] = b_idx
-                    info['ISWeights'] = torch.from_numpy(ISWeights.astype(np.float32)).to(self.device)
-                else:
-                    transitions_raw= self.memory.sample(self.trainBatchSize)
+                self.learn_step()
 
-                loss = self.update_net_on_transitions(transitions_raw, self.netLossFunc, 1, updateOption=self.netUpdateOption, netGradClip=self.netGradClip, info=info)
+    def learning_ready(self):
+        '''
+        whether the memory holds enough experiences to learn from
+        '''
+        if self.priorityMemoryOption:
+            return len(self.memory) >= self.config['memoryCapacity']
+        return len(self.memory) >= self.trainBatchSize
 
-                if self.globalStepCount % self.lossRecordStep == 0:
-                    self.losses.append([self.globalStepCount, self.epIdx, loss])
+    def learn_step(self):
+        '''
+        sample a minibatch, perform one gradient update and sync the target net with specified frequency
+        '''
+        # sample experience
+        if self.prefetcher is not None:
+            transitions_raw, info = self.prefetcher.get()
+        else:
+            with self.memoryLock:
+                transitions_raw, info = self.sample_minibatch()
+
+        loss = self.update_net_on_transitions(transitions_raw, self.netLossFunc, 1, updateOption=self.netUpdateOption, netGradClip=self.netGradClip, info=info)
 
-                if self.learnStepCounter % self.targetNetUpdateStep == 0:
-                    self.targetNet.load_state_dict(self.policyNet.state_dict())
+        if self.globalStepCount % self.lossRecordStep == 0:
+            self.losses.append([self.globalStepCount, self.epIdx, loss])
 
-                self.learnStepCounter += 1
+        if self.learnStepCounter % self.targetNetUpdateStep == 0:
+            sync_net(self.targetNet, self.policyNet)
+
+        self.learnStepCounter += 1
+
+    def lambda_values(self, nonFinalNextState):
+        '''
+        state values of a batch of next states from lambda memory, evaluated by the target net in one forward pass
+        '''
+        with torch.no_grad():
+            return self.targetNet(state_to_tensor(nonFinalNextState, self.device)).max(1)[0].cpu().numpy()
+
+    def sample_minibatch(self):
+        '''
+        sample a minibatch of experiences from memory, return the experiences and an info dictionary
+        containing indices and importance sampling weights for prioritized memory
+        '''
+        info = {}
+        if self.priorityMemoryOption:
+            transitions_raw, b_idx, ISWeights = self.memory.sample(self.trainBatchSize)
+            info['batchIdx'] = b_idx
+            info['batchStoreStep'] = self.memory.store_step(b_idx)
+            info['ISWeights'] = torch.from_numpy(ISWeights.astype(np.float32)).to(self.device)
+        else:
+            transitions_raw = self.memory.sample(self.trainBatchSize)
+        return transitions_raw, info
 
     def prepare_minibatch(self, transitions_raw):
         '''
@@ -260,6 +465,14 @@ class DQNAgent(BaseDQNAgent):
         https://stackoverflow.com/questions/19339/transpose-unzip-function-inverse-of-zip/19343#19343
         '''
 
+        # minibatches from the prefetcher are already prepared
+        if isinstance(transitions_raw, PreparedMinibatch):
+            return transitions_raw
+
+        # experiences from array based memory are already collated into numpy arrays
+        if isinstance(transitions_raw, TransitionBatch):
+            return self.prepare_minibatch_from_arrays(transitions_raw)
+
         transitions = Transition(*zip(*transitions_raw))
         action = torch.tensor(transitions.action, device=self.device, dtype=torch.long).unsqueeze(-1)  # shape(batch, 1)
         reward = torch.tensor(transitions.reward, device=self.device, dtype=torch.float32).unsqueeze(-1)  # shape(batch, 1)
@@ -277,6 +490,18 @@ class DQNAgent(BaseDQNAgent):
 
         return state, nonFinalMask, nonFinalNextState, action, reward
 
+    def prepare_minibatch_from_arrays(self, batch):
+        '''
+        convert a TransitionBatch of numpy arrays to torch tensors without per-experience python work
+        '''
+        action = torch.from_numpy(batch.action).to(self.device, dtype=torch.long).unsqueeze(-1)  # shape(batch, 1)
+        reward = torch.from_numpy(batch.reward).to(self.device, dtype=torch.float32).unsqueeze(-1)  # shape(batch, 1)
+        state = state_to_tensor(batch.state, self.device)
+        nonFinalMask = torch.from_numpy(batch.nonFinalMask).to(self.device)
+        nonFinalNextState = state_to_tensor(batch.nonFinalNextState, self.device)
+
+        return state, nonFinalMask, nonFinalNextState, action, reward
+
     def update_net_on_transitions(self, transitions_raw, loss_fun, gradientStep = 1, updateOption='policyNet', netGradClip=None, info=None):
         '''
         This function performs gradient gradient on the network
@@ -284,33 +509,36 @@ class DQNAgent(BaseDQNAgent):
 
         state, nonFinalMask, nonFinalNextState, action, reward = self.prepare_minibatch(transitions_raw)
 
+        # the compiled loss sees next states of the whole minibatch
+        nextState = None
+        if self.compiledLoss is not None and updateOption == self.netUpdateOption and torch.is_tensor(state):
+            nextState = full_next_state(nonFinalNextState, nonFinalMask)
+
         for step in range(gradientStep):
-            # calculate Qvalues based on selected action batch
-            QValues = self.policyNet(state).gather(1, action)
-
-            if updateOption == 'targetNet':
-                 # Here we detach because we do not want gradient flow from target values to net parameters
-                 QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-                 QNext[nonFinalMask] = self.targetNet(nonFinalNextState).max(1)[0].detach()
-                 targetValues = reward + (self.gamma**self.nStepForward) * QNext.unsqueeze(-1)
-            if updateOption == 'policyNet':
-                raise NotImplementedError
-                targetValues = reward + self.gamma * torch.max(self.policyNet(nextState).detach(), dim=1)[0].unsqueeze(-1)
-            if updateOption == 'doubleQ':
-                 # select optimal action from policy net
-                 with torch.no_grad():
-                    batchAction = self.policyNet(nonFinalNextState).max(dim=1)[1].unsqueeze(-1)
-                    QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32).unsqueeze(-1)
-                    QNext[nonFinalMask] = self.targetNet(nonFinalNextState).gather(1, batchAction)
-                    targetValues = reward + (self.gamma**self.nStepForward) * QNext
-
-            # Compute loss
-            loss_single = loss_fun(QValues, targetValues)
+            if nextState is not None:
+                loss_single, TDError = self.compiledLoss(state, action, reward, nextState, nonFinalMask.float())
+            else:
+                with autocast_context(self.precision, self.device):
+                    if self.memoryOption == 'lambda':
+                        # rewards from lambda memory are lambda returns including the bootstrapped values
+                        QValues = self.policyNet(state).gather(1, action).float()
+                        targetValues = reward
+                    else:
+                        # target values are detached, there is no gradient flow from them to net parameters
+                        QValues, targetValues = self.tdTarget.compute(updateOption, self.policyNet, self.targetNet,
+                                                                      state, action, reward, nonFinalNextState,
+                                                                      nonFinalMask, self.gamma**self.nStepForward)
+
+                # Compute loss
+                loss_single = loss_fun(QValues, targetValues)
+                TDError = QValues - targetValues
             if self.priorityMemoryOption:
                 loss = torch.mean(info['ISWeights'] * loss_single)
                 # update priority
-                abs_error = np.abs((QValues - targetValues).data.numpy())
-                self.memory.batch_update(info['batchIdx'], abs_error)
+                abs_error = np.abs(TDError.data.numpy())
+                with self.memoryLock:
+                    self.memory.batch_update(info['batchIdx'], abs_error,
+                                             info['batchStoreStep'] if 'batchStoreStep' in info else None)
             else:
                 loss = torch.mean(loss_single)
 
@@ -336,8 +564,8 @@ class DQNAgent(BaseDQNAgent):
             'model_state_dict': self.policyNet.state_dict(),
             'optimizer_state_dict': self.optimizer.state_dict(),
         }, prefix + '_checkpoint.pt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        with self.memoryLock:
+            self.memoryCheckpoint.save(self.memory, prefix)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
 
@@ -347,8 +575,8 @@ class DQNAgent(BaseDQNAgent):
         prefix = self.dirName + identifier + 'Epoch' + str(self.epIdx)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        with self.memoryLock:
+            self.memoryCheckpoint.save(self.memory, prefix)
 
         torch.save({
             'epoch': self.epIdx,
@@ -360,8 +588,11 @@ class DQNAgent(BaseDQNAgent):
     def load_checkpoint(self, prefix):
         #self.loadLosses(prefix + '_loss.txt')
         #self.loadRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'rb') as file:
-            self.memory = pickle.load(file)
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        # experiences are loaded into a newly initialized memory
+        self.init_memory()
+        self.memory = self.memoryCheckpoint.load(self.memory, prefix)
 
         checkpoint = torch.load(prefix + '_checkpoint.pt')
         self.epIdx = checkpoint['epoch']
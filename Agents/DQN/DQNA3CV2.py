@@ -3,6 +3,7 @@ from copy import deepcopy
 from Agents.Core.Agent import Agent
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.Core.PrioritizedReplayMemory import PrioritizedReplayMemory
+from Agents.Core.FlatParameters import sync_net
 from utils.utils import torchvector
 import random
 import torch
@@ -161,7 +162,7 @@ class DQNA3CWorkerV2(mp.Process):
             if self.config['logFlag'] and self.globalEpisodeCount.value % self.config['logFrequency'] == 0:
                 self.save_checkpoint()
             if self.globalEpisodeCount.value % self.targetNetUpdateEpisode == 0:
-                self.globalTargetNet.load_state_dict(self.globalPolicyNet.state_dict())
+                sync_net(self.globalTargetNet, self.globalPolicyNet)
 
         # resultQueue.put(globalEpisodeReward.value)
         self.resultQueue.put(
@@ -216,7 +217,7 @@ class DQNA3CWorkerV2(mp.Process):
         self.globalOptimizer.step()
         #
         # # update local net
-        self.localNet.load_state_dict(self.globalPolicyNet.state_dict())
+        sync_net(self.localNet, self.globalPolicyNet)
 
 
     def test_multiProcess(self):
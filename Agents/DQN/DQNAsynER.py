@@ -1,6 +1,9 @@
 from Agents.DQN.DQN import DQNAgent
 from copy import deepcopy
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
+from Agents.Core.NStepReturn import NStepReturn
+from Agents.Core.FlatParameters import sync_net
+from Agents.Core.Precision import autocast_context
 import torch
 import torch.optim
 import math
@@ -13,7 +16,7 @@ from torch.multiprocessing import current_process
 class DQNAsynERWorker(DQNAgent, mp.Process):
     def __init__(self, config, localNet, env, globalNets, globalOptimizer, netLossFunc, nbAction, rank,
                  globalEpisodeCount, globalEpisodeReward, globalRunningAvgReward, resultQueue, logFolder,
-                stateProcessor = None, lock = None):
+                stateProcessor = None, lock = None, memory = None):
 
         self.globalPolicyNet = globalNets[0]
         self.globalTargetNet = globalNets[1]
@@ -22,7 +25,7 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
         self.localNet = localNet
 
         mp.Process.__init__(self)
-        DQNAgent.__init__(self. config, localNet, None, None, netLossFunc, nbAction, stateProcessor, )
+        DQNAgent.__init__(self, config, localNet, None, env, globalOptimizer, netLossFunc, nbAction, stateProcessor)
 
 
         self.totalStep = 0
@@ -49,10 +52,13 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
         if 'targetNetUpdateEpisode' in self.config:
             self.targetNetUpdateEpisode = self.config['targetNetUpdateEpisode']
 
-        self.nStepBuffer = []
+        self.nStepBuffer = NStepReturn(self.nStepForward, self.gamma)
 
-        # only use vanilla replay memory
-        self.memory = ReplayMemory(self.memoryCapacity)
+        # replay memory shared by all workers, otherwise a vanilla replay memory per worker
+        if memory is not None:
+            self.memory = memory
+        else:
+            self.memory = ReplayMemory(self.memoryCapacity)
 
         self.priorityMemoryOption = False
 
@@ -69,6 +75,11 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
             torch.cuda.manual_seed(self.randomSeed)
             self.localNet = self.localNet.cuda()
 
+    def init_memory(self):
+        # the shared memory is created by the master and passed to the workers
+        if self.memoryOption != 'shared':
+            super(DQNAsynERWorker, self).init_memory()
+
     def epsilon_by_episode(self, step):
         return self.epsilon_final + (
                 self.epsilon_start - self.epsilon_final) * math.exp(-1. * step / self.epsilon_decay)
@@ -101,7 +112,7 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
                 if done:
                     nextState = None
 
-                self.update_net_and_sync(state, action, nextState, reward)
+                self.update_net_and_sync(state, action, nextState, reward, info)
 
                 state = nextState
                 rewardSum += reward * pow(self.gamma, stepCount)
@@ -131,7 +142,7 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
                 self.save_checkpoint()
                 # sync global target to global policy net
             if self.globalEpisodeCount.value % self.targetNetUpdateEpisode == 0:
-                self.globalTargetNet.load_state_dict(self.globalPolicyNet.state_dict())
+                sync_net(self.globalTargetNet, self.globalPolicyNet)
 
         # resultQueue.put(globalEpisodeReward.value)
         self.resultQueue.put(
@@ -150,9 +161,9 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
             'optimizer_state_dict': self.globalOptimizer.state_dict(),
         }, prefix + '_checkpoint.pt')
 
-    def update_net_and_sync(self, state, action, nextState, reward):
+    def update_net_and_sync(self, state, action, nextState, reward, info):
 
-        self.store_experience(state, action, nextState, reward)
+        self.store_experience(state, action, nextState, reward, info)
 
         if self.priorityMemoryOption:
             if len(self.memory) < self.config['memoryCapacity']:
@@ -163,44 +174,16 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
 
         if self.totalStep % self.updateGlobalFrequency == 0:
             transitions_raw = self.memory.sample(self.trainBatchSize)
-            transitions = Transition(*zip(*transitions_raw))
-            action = torch.tensor(transitions.action, device=self.device, dtype=torch.long).unsqueeze(
-                -1)  # shape(batch, 1)
-            reward = torch.tensor(transitions.reward, device=self.device, dtype=torch.float32).unsqueeze(
-                -1)  # shape(batch, 1)
-            batchSize = reward.shape[0]
-
-
-            # for some env, the output state requires further processing before feeding to neural network
-            if self.stateProcessor is not None:
-                state, _ = self.stateProcessor(transitions.state, self.device)
-                nonFinalNextState, nonFinalMask = self.stateProcessor(transitions.next_state, self.device)
-            else:
-                state = torch.tensor(transitions.state, device=self.device, dtype=torch.float32)
-                nonFinalMask = torch.tensor([s is not None for s in transitions.next_state],
-                                            device=self.device, dtype=torch.uint8)
-                nonFinalNextState = torch.tensor([s for s in transitions.next_state if s is not None],
-                                                 device=self.device, dtype=torch.float32)
+            state, nonFinalMask, nonFinalNextState, action, reward = self.prepare_minibatch(transitions_raw)
+
             if self.synchLock:
 
                 self.lock.acquire()
-                QValues = self.globalPolicyNet(state).gather(1, action)
-
-                if self.netUpdateOption == 'targetNet':
-                    # Here we detach because we do not want gradient flow from target values to net parameters
-                    QNext = torch.zeros(batchSize, device=self.device, dtype=torch.float32)
-                    QNext[nonFinalMask] = self.globalTargetNet(nonFinalNextState).max(1)[0].detach()
-                    targetValues = reward + self.gamma * QNext.unsqueeze(-1)
-                if self.netUpdateOption == 'policyNet':
-                    raise NotImplementedError
-                    targetValues = reward + self.gamma * torch.max(self.globalPolicyNet(nextState).detach(), dim=1)[0].unsqueeze(-1)
-                if self.netUpdateOption == 'doubleQ':
-                     # select optimal action from policy net
-                     with torch.no_grad():
-                        batchAction = self.globalPolicyNet(nonFinalNextState).max(dim=1)[1].unsqueeze(-1)
-                        QNext = torch.zeros(batchSize, device=self.device, dtype=torch.float32).unsqueeze(-1)
-                        QNext[nonFinalMask] = self.globalTargetNet(nonFinalNextState).gather(1, batchAction)
-                        targetValues = reward + self.gamma * QNext
+                # target values are detached, there is no gradient flow from them to net parameters
+                with autocast_context(self.precision, self.device):
+                    QValues, targetValues = self.tdTarget.compute(self.netUpdateOption, self.globalPolicyNet,
+                                                                  self.globalTargetNet, state, action, reward,
+                                                                  nonFinalNextState, nonFinalMask, self.gamma)
 
                 loss = self.netLossFunc(QValues, targetValues)
 
@@ -215,32 +198,18 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
                 self.globalOptimizer.step()
                 #
                 # # update local net
-                self.localNet.load_state_dict(self.globalPolicyNet.state_dict())
+                sync_net(self.localNet, self.globalPolicyNet)
 
                 self.lock.release()
             else:
 
                 # update local net
-                self.localNet.load_state_dict(self.globalPolicyNet.state_dict())
-
-                QValues = self.localNet(state).gather(1, action)
-
-                if self.netUpdateOption == 'targetNet':
-                    # Here we detach because we do not want gradient flow from target values to net parameters
-                    QNext = torch.zeros(batchSize, device=self.device, dtype=torch.float32)
-                    QNext[nonFinalMask] = self.globalTargetNet(nonFinalNextState).max(1)[0].detach()
-                    targetValues = reward + self.gamma * QNext.unsqueeze(-1)
-                if self.netUpdateOption == 'policyNet':
-                    raise NotImplementedError
-                    targetValues = reward + self.gamma * torch.max(self.globalPolicyNet(nextState).detach(), dim=1)[
-                        0].unsqueeze(-1)
-                if self.netUpdateOption == 'doubleQ':
-                    # select optimal action from policy net
-                    with torch.no_grad():
-                        batchAction = self.localNet(nonFinalNextState).max(dim=1)[1].unsqueeze(-1)
-                        QNext = torch.zeros(batchSize, device=self.device, dtype=torch.float32).unsqueeze(-1)
-                        QNext[nonFinalMask] = self.globalTargetNet(nonFinalNextState).gather(1, batchAction)
-                        targetValues = reward + self.gamma * QNext
+                sync_net(self.localNet, self.globalPolicyNet)
+
+                with autocast_context(self.precision, self.device):
+                    QValues, targetValues = self.tdTarget.compute(self.netUpdateOption, self.localNet,
+                                                                  self.globalTargetNet, state, action, reward,
+                                                                  nonFinalNextState, nonFinalMask, self.gamma)
 
                 loss = self.netLossFunc(QValues, targetValues)
 
@@ -265,7 +234,7 @@ class DQNAsynERWorker(DQNAgent, mp.Process):
                 self.lock.release()
                 #
                 # # update local net
-                self.localNet.load_state_dict(self.globalPolicyNet.state_dict())
+                sync_net(self.localNet, self.globalPolicyNet)
 
     def test_multiProcess(self):
         print("Hello, World! from " + current_process().name + "\n")
@@ -292,11 +261,12 @@ class SharedAdam(torch.optim.Adam):
         for group in self.param_groups:
             for p in group['params']:
                 state = self.state[p]
-                state['step'] = 0
+                state['step'] = torch.zeros(())
                 state['exp_avg'] = torch.zeros_like(p.data)
                 state['exp_avg_sq'] = torch.zeros_like(p.data)
 
                 # share in memory
+                state['step'].share_memory_()
                 state['exp_avg'].share_memory_()
                 state['exp_avg_sq'].share_memory_()
 
@@ -323,6 +293,12 @@ class DQNAsynERMaster(DQNAgent):
         if 'synchLock' in self.config:
             self.synchLock = self.config['synchLock']
 
+        # workers push to and sample from one replay memory in shared memory
+        self.sharedMemory = None
+        if self.memoryOption == 'shared':
+            super(DQNAsynERMaster, self).init_memory()
+            self.sharedMemory = self.memory
+
         # if device is GPU, then move to GPU
         if self.device == 'cuda':
             self.globalPolicyNet.cuda()
@@ -332,6 +308,12 @@ class DQNAsynERMaster(DQNAgent):
         self.construct_workers()
 
 
+    def init_memory(self):
+        # env is the list of worker environments during the base initialization, the shared memory is created in
+        # __init__ with the first one
+        if self.memoryOption != 'shared':
+            super(DQNAsynERMaster, self).init_memory()
+
     def construct_workers(self):
         self.workers = []
         lock = mp.Lock()
@@ -341,7 +323,8 @@ class DQNAsynERMaster(DQNAgent):
             localNet = deepcopy(self.globalPolicyNet)
             worker = DQNAsynERWorker(self.config, localNet, localEnv, [self.globalPolicyNet, self.globalTargetNet], self.optimizer, self.netLossFunc,
                                     self.numAction, i, self.globalEpisodeCount, self.globalEpisodeReward,
-                                    self.globalRunningAvgReward, self.resultQueue, self.dirName, stateProcessor=self.stateProcessor, lock=lock)
+                                    self.globalRunningAvgReward, self.resultQueue, self.dirName, stateProcessor=self.stateProcessor, lock=lock,
+                                    memory=self.sharedMemory)
             self.workers.append(worker)
 
     def test_multiProcess(self):
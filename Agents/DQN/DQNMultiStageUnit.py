@@ -4,6 +4,8 @@ from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.Core.ExtendedReplayMemory import ExtendedReplayMemory, ExtendedTransition
 from Agents.Core.ReplayMemoryReward import ReplayMemoryReward
 from Agents.Core.PrioritizedReplayMemory import PrioritizedReplayMemory
+from Agents.Core.FlatParameters import sync_net
+from Agents.Core.Precision import autocast_context
 import random
 import torch
 import torch.optim
@@ -72,29 +74,18 @@ class DQNMultiStageUnit(DQNAgent):
 
         state, nonFinalMask, nonFinalNextState, finalMask, finalNextState, action, reward = self.prepare_minibatch(transitions_raw)
 
-        # calculate Qvalues based on selected action batch
-        QValues = self.policyNet(state).gather(1, action)
-
-        # Here we detach because we do not want gradient flow from target values to net parameters
-        QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-
-
-        numNonFinalNextState = sum(nonFinalMask)
-        numFinalNextState = sum(finalMask)
-
-        if numNonFinalNextState:
-        # if we do not have stage done
-        # we use our own target net to bootstrap
-            QNext[nonFinalMask] = self.targetNet(nonFinalNextState).max(1)[0].detach()
-
-        if numFinalNextState:
+        # if we do not have stage done, we use our own target net to bootstrap
         # if we have stage done,
         # 1) if it is not the last stage, we use external target agent to bootstrap
         # 2) if it is the last stage, we do not bootstrap
-            if targetAgent is not None:
-                QNext[finalMask] = targetAgent.evaluate_state_value(finalNextState)
+        finalValue = None
+        if targetAgent is not None:
+            finalValue = targetAgent.evaluate_state_value
 
-        targetValues = reward + (self.gamma) * QNext.unsqueeze(-1)
+        with autocast_context(self.precision, self.device):
+            QValues, targetValues = self.tdTarget.compute('targetNet', self.policyNet, self.targetNet, state, action,
+                                                          reward, nonFinalNextState, nonFinalMask, self.gamma,
+                                                          finalNextState, finalMask, finalValue)
 
         # Compute loss
         loss_single = self.netLossFunc(QValues, targetValues)
@@ -113,7 +104,7 @@ class DQNMultiStageUnit(DQNAgent):
             self.losses.append([self.globalStepCount, self.epIdx, loss])
 
         if self.learnStepCounter % self.targetNetUpdateStep == 0:
-            self.targetNet.load_state_dict(self.policyNet.state_dict())
+            sync_net(self.targetNet, self.policyNet)
 
         self.learnStepCounter += 1
 
@@ -13,6 +13,7 @@ import os
 import math
 import pickle
 from copy import deepcopy
+from Agents.Core.SharedVecEnv import unbatch_observations
 
 # DQN agent uses synchronized environment for training
 
@@ -32,6 +33,14 @@ class DQNSynAgent(DQNAgent):
         self.successRepeatTime = 1
         if 'successRepeatTime' in self.config:
             self.successRepeatTime = self.config['successRepeatTime']
+        # policyLag: 0 steps env and learns in turn. 1 pipelines them, the actions of the next step are selected and
+        # sent to the workers (env.step_async) before learning from the current step, so the workers simulate while
+        # the nets are updated and actions trail the policy by the updates of one step. default 0
+        self.policyLag = 0
+        if 'policyLag' in self.config:
+            self.policyLag = self.config['policyLag']
+        if self.policyLag not in [0, 1]:
+            raise Exception('policyLag is invalid')
 
     def select_action(self, net, states, epsThreshold):
         # return a list of actions
@@ -51,43 +60,56 @@ class DQNSynAgent(DQNAgent):
 
         return actions
 
+    def act(self, states, globalStepCount):
+        # actions of the step taken at globalStepCount
+        self.epsThreshold = self.epsilon_by_step(globalStepCount)
+        return self.select_action(self.policyNet, states, self.epsThreshold)
 
     def train(self):
 
         runningAvgEpisodeReward = 0.0
 
         # get a list of reset states
-        states = self.env.reset()
-        states = states.tolist()
-        dummyStates = deepcopy(states)
+        states = unbatch_observations(self.env.reset())
         rewardSum = 0
         stepCountList = np.zeros(self.numWorkers)
+        if self.policyLag > 0:
+            actions = self.act(states, self.globalStepCount)
+            self.env.step_async(actions)
         for trainStepCount in range(self.trainStep):
 
-            self.epsThreshold = self.epsilon_by_step(self.globalStepCount)
-
-            actions = self.select_action(self.policyNet, states, self.epsThreshold)
-
-            nextStates, rewards, dones, infos = self.env.step(actions)
+            if self.policyLag > 0:
+                nextStates, rewards, dones, infos = self.env.step_wait()
+            else:
+                actions = self.act(states, self.globalStepCount)
+                nextStates, rewards, dones, infos = self.env.step(actions)
 
             if self.verbose:
                 print('step: ', trainStepCount)
                 print(infos)
 
-            nextStates = nextStates.tolist()
-            if np.any(dones):
-                idx = np.where(dones==True)
-#                nextStatesCopy = deepcopy(nextStates)
-                for i in np.nditer(idx):
-                    # if not ended due to step limit
-                    # in baseline vec_env, if done, nextState = reset state
-                    if not infos[i]['endBeforeDone']:
-                        nextStates[i] = None
+            # vec envs reset finished environments, observations of done workers are reset states
+            observations = unbatch_observations(nextStates)
+            nextStates = list(observations)
+            for i in np.where(dones)[0]:
+                if 'terminal_observation' in infos[i] and infos[i].get('endBeforeDone', False):
+                    # episodes ended due to step limit are not terminal, their next state is the terminal observation
+                    terminal = infos[i]['terminal_observation']
+                    nextStates[i] = terminal.tolist() if isinstance(terminal, np.ndarray) else terminal
+                else:
+                    nextStates[i] = None
+
+            if self.policyLag > 0 and trainStepCount < self.trainStep - 1:
+                # workers simulate the next step while learning from this one
+                nextActions = self.act(observations, self.globalStepCount + self.numWorkers)
+                self.env.step_async(nextActions)
 
             # learn the transition
             self.update_net(states, actions, nextStates, rewards, infos)
 
-            states = nextStates
+            states = observations
+            if self.policyLag > 0:
+                actions = nextActions
 
 
             self.globalStepCount += self.numWorkers
@@ -97,9 +119,6 @@ class DQNSynAgent(DQNAgent):
 
             if np.any(dones):
                 idx = np.where(dones == True)
-                # adjust for states to avoid None in states
-                for i in np.nditer(idx):
-                    states[i] = dummyStates[i]
                 stepCountDone = stepCountList[idx]
                 stepCountList[idx] = 0.0
                 self.epIdx += len(idx[0])
@@ -117,12 +136,15 @@ class DQNSynAgent(DQNAgent):
                 self.save_checkpoint()
 
         self.save_all()
+        if self.prefetcher is not None:
+            self.prefetcher.close()
 
     def store_experience(self, states, actions, nextStates, rewards, infos):
 
         for i in range(len(states)):
-            # if it is ended due to stepLimit, we should not store the experience due to the vec env setup
-            if not infos[i]['endBeforeDone']:
+            # if it is ended due to stepLimit, the experience is stored only if the vec env keeps the terminal
+            # observation (e.g., SharedVecEnv), otherwise its next state is the reset state
+            if not infos[i].get('endBeforeDone', False) or 'terminal_observation' in infos[i]:
                 transition = Transition(states[i], actions[i], nextStates[i], rewards[i])
                 self.memory.push(transition)
                 if self.successRepeat and nextStates[i] is None:
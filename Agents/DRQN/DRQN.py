@@ -1,8 +1,11 @@
 from Agents.DQN.DQN import DQNAgent
 from copy import deepcopy
 
-from Agents.Core.RecurrentReplayMemory import RecurrentReplayMemory
+from Agents.Core.SequenceReplayMemory import SequenceReplayMemory
+from Agents.Core.ArrayReplayMemory import state_to_tensor
 from Agents.Core.ReplayMemory import Transition
+from Agents.Core.FlatParameters import sync_net
+from Agents.Core.Precision import autocast_context
 import random
 import torch
 import torch.optim
@@ -18,6 +21,25 @@ class NumpyEncoder(json.JSONEncoder):
             return obj.tolist()
         return json.JSONEncoder.default(self, obj)
 
+def sequence_forward(net, state, padMask):
+    '''
+    evaluate net on sequences of shape (batch, sequenceLength, ...) padded at the beginning, each sequence is
+    evaluated without its padded steps, so that padding does not change the recurrent state.
+    Sequences of the same length are evaluated in one forward pass
+    '''
+    lengths = padMask.sum(1)
+    outputs, order = [], []
+    for length in torch.unique(lengths).tolist():
+        idx = torch.nonzero(lengths == length).squeeze(1)
+        if isinstance(state, dict):
+            suffix = {key: value[idx, -length:] for key, value in state.items()}
+        else:
+            suffix = state[idx, -length:]
+        outputs.append(net(suffix).view(len(idx), -1))
+        order.append(idx)
+    return torch.cat(outputs)[torch.argsort(torch.cat(order))]
+
+
 class DRQNAgent(DQNAgent):
     def __init__(self, config, policyNet, targetNet, env, optimizer, netLossFunc, nbAction, stateProcessor = None):
         super(DRQNAgent, self).__init__(config, policyNet, targetNet, env, optimizer, netLossFunc, nbAction, stateProcessor)
@@ -25,39 +47,31 @@ class DRQNAgent(DQNAgent):
         self.resetNetState()
 
     def init_memory(self):
-        self.memory = RecurrentReplayMemory(self.memoryCapacity, self.sequenceLength)
+        self.memory = SequenceReplayMemory(self.memoryCapacity, self.sequenceLength)
 
     def read_config(self):
-        super(DQNAgent, self).read_config()
+        super(DRQNAgent, self).read_config()
         # read additional parameters
-        self.memoryCapacity = self.config['memoryCapacity']
-
-        self.memoryOption = 'natural'
-        self.priorityMemoryOption = False
-        if 'memoryOption' in self.config:
-            self.memoryOption = self.config['memoryOption']
-            if self.memoryOption == 'priority':
-                self.priorityMemoryOption = True
-                # reward memory requires nstep forward to be 1
-            if self.memoryOption == 'reward':
-                self.nStepForward = 1
-
         self.sequenceLength = self.config['sequenceLength']
 
         self.netMemory = self.config['netMemory']
  #       unittest.assertIn(a, b，[msg = '测试失败时打印的信息'])
 
     def resetNetState(self):
-        self.stateSequence = [self.policyNet.get_zero_input() for j in range(self.sequenceLength)]
+        # states of the current episode, at most sequenceLength
+        self.stateSequence = []
 
     def select_action(self, net, state, epsThreshold):
 
         # get a random number so that we can do epsilon exploration
+        # the episode starts the sequence, as for sequences sampled from memory
+        self.stateSequence.append(state)
+        if len(self.stateSequence) > self.sequenceLength:
+            self.stateSequence.pop(0)
+
         randNum = random.random()
         if randNum > epsThreshold:
             with torch.no_grad():
-                self.stateSequence.pop(0)
-                self.stateSequence.append(state)
 
                 # self.policyNet(torch.from_numpy(state.astype(np.float32)).unsqueeze(0))
                 # here state[np.newaxis,:] is to add a batch dimension
@@ -89,63 +103,14 @@ class DRQNAgent(DQNAgent):
         self.nStepBuffer.clear()
         # reset net states
         self.resetNetState()
+        # sampled sequences do not cross episodes, also for episodes ended by the maximum episode length
+        self.memory.start_episode()
 
-    def store_experience(self, state, action, nextState, reward):
-
-        # caution: using multiple step forward return can increase variance
-        if self.nStepForward > 1:
-
-            # if this is final state, we want to do additional backup to increase useful learning experience
-            if nextState is None:
-                transitions = []
-                transitions.append(Transition(state, action, nextState, reward))
-                R = reward
-                while len(self.nStepBuffer) > 0:
-                    state, action, next_state, reward_old = self.nStepBuffer.pop(0)
-                    R = reward_old + self.gamma * R
-                    transNew = Transition(state, action, None, R)
-                    transitions.append(transNew)
-                for tran in transitions:
-                    if self.priorityMemoryOption:
-                        self.memory.store(tran)
-                    else:
-                        self.memory.push(tran)
-
-            else:
-                # otherwise we calculate normal n step return
-                self.nStepBuffer.append((state, action, nextState, reward))
-
-                if len(self.nStepBuffer) < self.nStepForward:
-                    return
-
-                R = sum([self.nStepBuffer[i][3]*(self.gamma**i) for i in range(self.nStepForward)])
-
-                state, action, _, _ = self.nStepBuffer.pop(0)
-
-                transition = Transition(state, action, nextState, R)
-
-                if self.priorityMemoryOption:
-                    self.memory.store(transition)
-                else:
-                    self.memory.push(transition)
-
-        else:
-            # if it is one step
-            transition = Transition(state, action, nextState, reward)
-
-            if self.priorityMemoryOption:
-                self.memory.store(transition)
-            else:
-                self.memory.push(transition)
-
-
-
-
-    def update_net(self, state, action, nextState, reward):
+    def update_net(self, state, action, nextState, reward, info=None):
 
         # first store memory
 
-        self.store_experience(state, action, nextState, reward)
+        self.store_experience(state, action, nextState, reward, info)
 
         if self.priorityMemoryOption:
             if len(self.memory) < self.config['memoryCapacity']:
@@ -172,72 +137,69 @@ class DRQNAgent(DQNAgent):
                 self.losses.append([self.globalStepCount, self.epIdx, loss])
 
             if self.learnStepCounter % self.targetNetUpdateStep == 0:
-                self.targetNet.load_state_dict(self.policyNet.state_dict())
+                sync_net(self.targetNet, self.policyNet)
 
             self.learnStepCounter += 1
 
     def prepare_miniBatch(self, transitions_raw):
-
-        # order the data
-        # convert transition list to torch tensors
-        # use trick from https://pytorch.org/tutorials/intermediate/reinforcement_q_learning.html
-        # https://stackoverflow.com/questions/19339/transpose-unzip-function-inverse-of-zip/19343#19343
-
-        transitions = self.memory.sample(self.trainBatchSize)
-
-        batch_state, batch_action, batch_next_state, batch_reward = zip(*transitions)
-
-        action = torch.tensor(batch_action, device=self.device, dtype=torch.long).view(self.trainBatchSize,self.sequenceLength)
-        reward = torch.tensor(batch_reward, device=self.device, dtype=torch.float).view(self.trainBatchSize,self.sequenceLength)
-
-        state = torch.tensor(batch_state, device=self.device, dtype=torch.float).view(self.trainBatchSize,self.sequenceLength, -1)
-
-        # get set of next states for end of each sequence
-        batch_next_state = tuple(
-            [batch_next_state[i] for i in range(len(batch_next_state)) if (i + 1) % (self.sequenceLength) == 0])
-
-        nonFinalMask = torch.tensor(tuple(map(lambda s: s is not None, batch_next_state)), device=self.device,
-                                      dtype=torch.uint8)
-        nonFinalNextState = torch.tensor([s for s in batch_next_state if s is not None], device=self.device,
-                                             dtype=torch.float).unsqueeze(dim=1)
-        nonFinalNextState = torch.cat([state[nonFinalMask, 1:, :], nonFinalNextState], dim=1)
-
-
-        # for some env, the output state requires further processing before feeding to neural network
-        if self.stateProcessor is not None:
-            state, _ = self.stateProcessor(transitions.state, self.device)
-            nonFinalNextState, nonFinalMask = self.stateProcessor(transitions.next_state, self.device)
-
-        return state, action, reward, nonFinalNextState, nonFinalMask
+        '''
+        convert a SequenceBatch sampled from memory to torch tensors.
+        state has shape (batchSize, sequenceLength, n_feature), padded steps are zero
+        nonFinalNextState is the state sequence shifted by one step for non-terminal sequences
+        padMask and nextPadMask are False for the padded steps of the sequences and the next sequences
+        '''
+        action = torch.from_numpy(transitions_raw.action).to(self.device, dtype=torch.long)
+        reward = torch.from_numpy(transitions_raw.reward).to(self.device, dtype=torch.float)
+        nonFinalMask = torch.from_numpy(transitions_raw.nonFinalMask).to(self.device)
+        padMask = torch.from_numpy(transitions_raw.padMask).to(self.device)
+        nextPadMask = torch.from_numpy(transitions_raw.nextPadMask).to(self.device)
+
+        state = state_to_tensor(transitions_raw.state, self.device)
+        nonFinalNextState = state_to_tensor(transitions_raw.nonFinalNextState, self.device)
+        if not isinstance(state, dict):
+            state = state.view(self.trainBatchSize, self.sequenceLength, -1)
+            nonFinalNextState = nonFinalNextState.view(nonFinalNextState.shape[0], self.sequenceLength, -1)
+
+        return state, action, reward, nonFinalNextState, nonFinalMask, padMask, nextPadMask
+
+    def compute_targets(self, updateOption, state, lastAction, lastReward, nonFinalNextState, nonFinalMask, padMask,
+                        nextPadMask):
+        '''
+        return Q values of the last actions and their TD targets with shape (batch, 1), as TDTarget does for
+        unpadded states. Sequences are evaluated without their padded steps (see sequence_forward)
+        '''
+        if updateOption not in ('targetNet', 'doubleQ'):
+            raise NotImplementedError
+
+        QValues = sequence_forward(self.policyNet, state, padMask).gather(1, lastAction).float()
+        QNext = torch.zeros(len(lastAction), device=self.device, dtype=torch.float32)
+        with torch.no_grad():
+            if nonFinalMask.any():
+                targetQ = sequence_forward(self.targetNet, nonFinalNextState, nextPadMask)
+                if updateOption == 'doubleQ':
+                    nextAction = sequence_forward(self.policyNet, nonFinalNextState, nextPadMask).max(1)[1]
+                    QNext[nonFinalMask] = targetQ.gather(1, nextAction.unsqueeze(-1)).squeeze(-1).float()
+                else:
+                    QNext[nonFinalMask] = targetQ.max(1)[0].float()
+        targetValues = lastReward + self.gamma**self.nStepForward * QNext.unsqueeze(-1)
+        return QValues, targetValues
 
     def update_net_on_transitions(self, transitions_raw, loss_fun, gradientStep = 1, updateOption='policyNet', netGradClip=None, info=None):
 
         # prepare samples
-        state, action, reward, nonFinalNextState, nonFinalMask = self.prepare_miniBatch(transitions_raw)
+        state, action, reward, nonFinalNextState, nonFinalMask, padMask, nextPadMask = \
+            self.prepare_miniBatch(transitions_raw)
 
 
         for step in range(gradientStep):
             # calculate Qvalues based on selected action batch
             # action has shape (batchSize, sequenceLength)
             lastAction = action[:,-1].view(self.trainBatchSize, 1)
-            QValues = self.policyNet(state).gather(1, lastAction)
-
-            if updateOption == 'targetNet':
-                 # Here we detach because we do not want gradient flow from target values to net parameters
-                 QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-                 QNext[nonFinalMask] = self.targetNet(nonFinalNextState).max(1)[0].detach()
-                 # reward has shape (batchSize, sequenceLength)
-                 targetValues = reward[:, -1] + (self.gamma**self.nStepForward) * QNext
-            if updateOption == 'policyNet':
-                raise NotImplementedError
-                targetValues = reward + self.gamma * torch.max(self.policyNet(nextState).detach(), dim=1)[0].unsqueeze(-1)
-            if updateOption == 'doubleQ':
-                 # select optimal action from policy net
-                 with torch.no_grad():
-                    batchAction = self.policyNet(nonFinalNextState).max(dim=1)[1].unsqueeze(-1)
-                    QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32).unsqueeze(-1)
-                    QNext[nonFinalMask] = self.targetNet(nonFinalNextState).gather(1, batchAction)
-                    targetValues = reward + (self.gamma**self.nStepForward) * QNext
+            # reward has shape (batchSize, sequenceLength)
+            with autocast_context(self.precision, self.device):
+                QValues, targetValues = self.compute_targets(updateOption, state, lastAction,
+                                                             reward[:, -1].unsqueeze(-1), nonFinalNextState,
+                                                             nonFinalMask, padMask, nextPadMask)
 
             # Compute loss
             loss_single = loss_fun(QValues, targetValues)
@@ -1,7 +1,13 @@
 from Agents.DQN.DQN import DQNAgent
 from Agents.Core.ReplayMemory import Transition
 from Agents.Core.GroupReplayMemory import GroupReplayMemory
+from Agents.Core.JointReplayMemory import JointReplayMemory
+from Agents.Core.ArrayReplayMemory import TransitionBatch, state_to_tensor
+from Agents.Core.MemoryCheckpoint import MemoryCheckpoint
+from Agents.Core.TDTarget import TDTarget
 from Agents.MADQN.Mixers import VDNMixer
+from Agents.Core.FlatParameters import flatten_parameters, sync_net
+from Agents.Core.Precision import PRECISIONS, autocast_context
 import random
 import torch
 import torch.optim
@@ -35,6 +41,9 @@ class MADQNAgent:
 
         self.read_config()
         self.init_memory()
+        self.memoryCheckpoint = MemoryCheckpoint()
+        # Q values of each agent and of its next states
+        self.tdTarget = TDTarget(self.device, self.fuseTDForward)
         self.initialization()
         self.init_nets()
 
@@ -46,6 +55,12 @@ class MADQNAgent:
 
         self.mixNet = self.mixNet.to(self.device)
 
+        # target net syncs become one contiguous copy
+        if self.flatParameters:
+            for n in range(self.numAgents):
+                flatten_parameters(self.policyNets[n])
+                flatten_parameters(self.targetNets[n])
+
     def initialization(self):
         # move model to correct device
         self.dirName = 'Log/'
@@ -65,7 +80,11 @@ class MADQNAgent:
 
     def init_memory(self):
 
-        self.memory=GroupReplayMemory(self.memoryCapacity, self.numAgents)
+        if self.memoryOption == 'array':
+            # joint experiences of all agents are stored in numpy arrays with an agent axis
+            self.memory = JointReplayMemory(self.memoryCapacity, self.numAgents)
+        else:
+            self.memory=GroupReplayMemory(self.memoryCapacity, self.numAgents)
 
 
     def read_config(self):
@@ -126,10 +145,28 @@ class MADQNAgent:
         if 'randomSeed' in self.config:
             self.randomSeed = self.config['randomSeed']
         self.memoryCapacity = self.config['memoryCapacity']
+        # natural: one list of transitions per agent, array: joint arrays, states of all agents need the same shape
+        self.memoryOption = 'natural'
+        if 'memoryOption' in self.config:
+            self.memoryOption = self.config['memoryOption']
         random.seed(self.randomSeed)
 
         self.numAgents = self.config['numAgents']
 
+        self.fuseTDForward = True
+        if 'fuseTDForward' in self.config:
+            self.fuseTDForward = self.config['fuseTDForward']
+
+        self.flatParameters = False
+        if 'flatParameters' in self.config:
+            self.flatParameters = self.config['flatParameters']
+
+        self.precision = 'fp32'
+        if 'precision' in self.config:
+            self.precision = self.config['precision']
+        if self.precision not in PRECISIONS:
+            raise ValueError('precision is invalid')
+
     def select_action(self, nets, states, epsThreshold):
         # we need to select multiple actions
         actions = []
@@ -231,74 +268,77 @@ class MADQNAgent:
         if self.globalStepCount % self.netUpdateFrequency == 0:
             # sample experience
             info = {}
-            transitions_raw_list = self.memory.sample(self.trainBatchSize)
+            transitions_raw = self.memory.sample(self.trainBatchSize)
 
-            loss = self.update_net_on_transitions(transitions_raw_list, self.netLossFunc, 1, updateOption=self.netUpdateOption, netGradClip=self.netGradClip, info=info)
+            loss = self.update_net_on_transitions(transitions_raw, self.netLossFunc, 1, updateOption=self.netUpdateOption, netGradClip=self.netGradClip, info=info)
 
             if self.globalStepCount % self.lossRecordStep == 0:
                 self.losses.append([self.globalStepCount, self.epIdx, loss])
 
             if self.learnStepCounter % self.targetNetUpdateStep == 0:
                 for n in range(self.numAgents):
-                    self.targetNets[n].load_state_dict(self.policyNets[n].state_dict())
+                    sync_net(self.targetNets[n], self.policyNets[n])
 
             self.learnStepCounter += 1
 
-    def prepare_minibatch(self, transitions_raw, n):
-        # first store memory
+    def prepare_minibatch(self, transitions_raw):
+        '''
+        convert sampled experiences of all agents to torch tensors.
+        state, action and nonFinalNextState are indexed by agent first, nonFinalMask and the shared reward by batch
+        '''
+        # joint experiences from array memory are gathered with the agent axis first
+        if isinstance(transitions_raw, TransitionBatch):
+            action = torch.from_numpy(transitions_raw.action).to(self.device, dtype=torch.long).unsqueeze(-1)  # shape(numAgents, batch, 1)
+            reward = torch.from_numpy(transitions_raw.reward).to(self.device, dtype=torch.float32).unsqueeze(-1)  # shape(batch, 1)
+            state = state_to_tensor(transitions_raw.state, self.device)
+            nonFinalMask = torch.from_numpy(transitions_raw.nonFinalMask).to(self.device)
+            nonFinalNextState = state_to_tensor(transitions_raw.nonFinalNextState, self.device)
+            return state, nonFinalMask, nonFinalNextState, action, reward
+
+        state, nonFinalNextState, action = [], [], []
+        for n in range(self.numAgents):
+            transitions = Transition(*zip(*transitions_raw[n]))
+            action.append(torch.tensor(transitions.action, device=self.device, dtype=torch.long).unsqueeze(-1))  # shape(batch, 1)
 
-        transitions = Transition(*zip(*transitions_raw))
-        action = torch.tensor(transitions.action, device=self.device, dtype=torch.long).unsqueeze(-1)  # shape(batch, 1)
-        reward = torch.tensor(transitions.reward, device=self.device, dtype=torch.float32).unsqueeze(
-            -1)  # shape(batch, 1)
+            # for some env, the output state requires further processing before feeding to neural network
+            if self.stateProcessors is not None:
+                agentState, _ = self.stateProcessors[n](transitions.state, self.device)
+                agentNextState, nonFinalMask = self.stateProcessors[n](transitions.next_state, self.device)
+            else:
+                agentState = torch.tensor(transitions.state, device=self.device, dtype=torch.float32)
+                nonFinalMask = torch.tensor(tuple(map(lambda s: s is not None, transitions.next_state)), device=self.device,
+                                            dtype=torch.bool)
+                agentNextState = torch.tensor([s for s in transitions.next_state if s is not None], device=self.device,
+                                              dtype=torch.float32)
+            state.append(agentState)
+            nonFinalNextState.append(agentNextState)
 
-        # for some env, the output state requires further processing before feeding to neural network
-        if self.stateProcessors is not None:
-            state, _ = self.stateProcessors[n](transitions.state, self.device)
-            nonFinalNextState, nonFinalMask = self.stateProcessors[n](transitions.next_state, self.device)
-        else:
-            state = torch.tensor(transitions.state, device=self.device, dtype=torch.float32)
-            nonFinalMask = torch.tensor(tuple(map(lambda s: s is not None, transitions.next_state)), device=self.device,
-                                        dtype=torch.uint8)
-            nonFinalNextState = torch.tensor([s for s in transitions.next_state if s is not None], device=self.device,
-                                             dtype=torch.float32)
+        # the reward is shared by all agents
+        reward = torch.tensor(transitions.reward, device=self.device, dtype=torch.float32).unsqueeze(-1)  # shape(batch, 1)
 
         return state, nonFinalMask, nonFinalNextState, action, reward
 
+    def agent_state(self, state, n):
+        # state of agent n from prepared states, dictionary states of array memory hold all agents in each field
+        if isinstance(state, dict):
+            return {key: value[n] for key, value in state.items()}
+        return state[n]
 
-    def update_net_on_transitions(self, transitions_raw_list, loss_fun, gradientStep = 1, updateOption='policyNet', netGradClip=None, info=None):
+    def update_net_on_transitions(self, transitions_raw, loss_fun, gradientStep = 1, updateOption='policyNet', netGradClip=None, info=None):
+
+        state, nonFinalMask, nonFinalNextState, action, reward = self.prepare_minibatch(transitions_raw)
 
-        # order the data
-        # convert transition list to torch tensors
-        # use trick from https://pytorch.org/tutorials/intermediate/reinforcement_q_learning.html
-        # https://stackoverflow.com/questions/19339/transpose-unzip-function-inverse-of-zip/19343#19343
         QValuesList = []
         nextStateValuesList = []
-        stateList = []
         for n in range(self.numAgents):
-            transitions_raw = transitions_raw_list[n]
-            state, nonFinalMask, nonFinalNextState, action, reward = self.prepare_minibatch(transitions_raw, n)
-            stateList.append(state)
-
-                # calculate Qvalues based on selected action batch
-            QValues = self.policyNets[n](state).gather(1, action)
-
-            if updateOption == 'targetNet':
-
-                 # Here we detach because we do not want gradient flow from target values to net parameters
-                 QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-                 QNext[nonFinalMask] = self.targetNets[n](nonFinalNextState).max(1)[0].detach()
-                 nextStateValues = (self.gamma) * QNext.unsqueeze(-1)
-            if updateOption == 'policyNet':
-                raise NotImplementedError
-                targetValues = reward + self.gamma * torch.max(self.policyNet(nextState).detach(), dim=1)[0].unsqueeze(-1)
-            if updateOption == 'doubleQ':
-                 # select optimal action from policy net
-                 with torch.no_grad():
-                    batchAction = self.policyNets[n](nonFinalNextState).max(dim=1)[1].unsqueeze(-1)
-                    QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-                    QNext[nonFinalMask] = self.targetNets[n](nonFinalNextState).gather(1, batchAction).squeeze()
-                    nextStateValues = (self.gamma) * QNext.unsqueeze(-1)
+            agentState = self.agent_state(state, n)
+            agentNextState = self.agent_state(nonFinalNextState, n)
+
+            # calculate Qvalues based on selected action batch and the detached Q values of next states
+            with autocast_context(self.precision, self.device):
+                QValues, QNext = self.tdTarget.evaluate(updateOption, self.policyNets[n], self.targetNets[n],
+                                                        agentState, action[n], agentNextState, nonFinalMask)
+            nextStateValues = (self.gamma) * QNext.unsqueeze(-1)
 
             QValuesList.append(QValues)
             nextStateValuesList.append(nextStateValues)
@@ -349,8 +389,7 @@ class MADQNAgent:
             'model_state_dict': [net.state_dict() for net in self.policyNets],
             'optimizer_state_dict': [opt.state_dict() for opt in self.optimizers]
         }, prefix + '_checkpoint.pt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        self.memoryCheckpoint.save(self.memory, prefix)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
 
@@ -358,8 +397,7 @@ class MADQNAgent:
         prefix = self.dirName + self.identifier + 'Epoch' + str(self.epIdx)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        self.memoryCheckpoint.save(self.memory, prefix)
 
         torch.save({
             'epoch': self.epIdx,
@@ -371,8 +409,9 @@ class MADQNAgent:
     def load_checkpoint(self, prefix):
         #self.loadLosses(prefix + '_loss.txt')
         #self.loadRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'rb') as file:
-            self.memory = pickle.load(file)
+        # experiences are loaded into a newly initialized memory
+        self.init_memory()
+        self.memory = self.memoryCheckpoint.load(self.memory, prefix)
 
         checkpoint = torch.load(prefix + '_checkpoint.pt')
         self.epIdx = checkpoint['epoch']
@@ -4,6 +4,8 @@ from Agents.DQN.BaseDQN import BaseDQNAgent
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.Core.ReplayMemoryReward import ReplayMemoryReward
 from Agents.Core.PrioritizedReplayMemory import PrioritizedReplayMemory
+from Agents.Core.FlatParameters import sync_net
+from Agents.Core.Precision import autocast_context
 import random
 import torch
 import torch.optim
@@ -155,7 +157,7 @@ class NAFAgent(DQNAgent):
                     self.losses.append([self.globalStepCount, self.epIdx, loss])
 
                 if self.learnStepCounter % self.targetNetUpdateStep == 0:
-                    self.targetNet.load_state_dict(self.policyNet.state_dict())
+                    sync_net(self.targetNet, self.policyNet)
 
                 self.learnStepCounter += 1
 
@@ -207,12 +209,13 @@ class NAFAgent(DQNAgent):
         state, nonFinalMask, nonFinalNextState, action, reward = self.prepare_minibatch(transitions_raw)
 
         for step in range(gradientStep):
-            # calculate Qvalues based on selected action batch
-            QValues = self.policyNet.eval_Q_value(state, action).squeeze()
+            with autocast_context(self.precision, self.device):
+                # calculate Qvalues based on selected action batch
+                QValues = self.policyNet.eval_Q_value(state, action).squeeze().float()
 
-            # Here we detach because we do not want gradient flow from target values to net parameters
-            QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-            QNext[nonFinalMask] = self.targetNet.eval_state_value(nonFinalNextState).squeeze().detach()
+                # Here we detach because we do not want gradient flow from target values to net parameters
+                QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
+                QNext[nonFinalMask] = self.targetNet.eval_state_value(nonFinalNextState).squeeze().detach().float()
             targetValues = reward + self.gamma * QNext
 
             # Compute loss
@@ -2,6 +2,8 @@ import torch
 import numpy as np
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.DDPG.DDPG import DDPGAgent
+from Agents.Core.SoftUpdate import SoftUpdate
+from Agents.Core.Precision import autocast_context
 
 import pickle
 
@@ -44,9 +46,7 @@ class SACAgent(DDPGAgent):
         self.value_optimizer = optimizers['value']
 
         self.net_to_device()
-
-    def init_memory(self):
-        self.memory = ReplayMemory(self.memoryCapacity)
+        self.softUpdate = SoftUpdate([(self.valueTargetNet, self.valueNet)], self.tau, self.flatParameters)
 
     def read_config(self):
         super(SACAgent, self).read_config()
@@ -71,18 +71,20 @@ class SACAgent(DDPGAgent):
         # now do net update
         # Q and value nets evaluation
 
-        predicted_q_value1 = self.softQNetOne(state, action).squeeze()
-        predicted_q_value2 = self.softQNetTwo(state, action).squeeze()
+        with autocast_context(self.precision, self.device):
+            predicted_q_value1 = self.softQNetOne(state, action).squeeze().float()
+            predicted_q_value2 = self.softQNetTwo(state, action).squeeze().float()
 
-        predicted_value = self.valueNet(state).squeeze()
+            predicted_value = self.valueNet(state).squeeze().float()
 
-        # action for CURRENT state
-        next_action, log_prob = self.actorNet.select_action(state, probFlag=True)
+            # action for CURRENT state
+            next_action, log_prob = self.actorNet.select_action(state, probFlag=True)
+            log_prob = log_prob.float()
 
-        # Training Q Function, using target value function as target
-        target_value = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-        if len(nonFinalNextState):
-            target_value[nonFinalMask] = self.valueTargetNet(nonFinalNextState).squeeze()
+            # Training Q Function, using target value function as target
+            target_value = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
+            if len(nonFinalNextState):
+                target_value[nonFinalMask] = self.valueTargetNet(nonFinalNextState).squeeze().float()
         target_q_value = reward + self.gamma * target_value
 
         q_value_loss1 = self.netLossFunc(predicted_q_value1, target_q_value.detach())
@@ -101,7 +103,9 @@ class SACAgent(DDPGAgent):
         self.softQTwo_optimizer.step()
 
         # Training Value Function, using min value of Q functions as the target
-        predicted_new_q_value = torch.min(self.softQNetOne(state, next_action), self.softQNetTwo(state, next_action))
+        with autocast_context(self.precision, self.device):
+            predicted_new_q_value = torch.min(self.softQNetOne(state, next_action),
+                                              self.softQNetTwo(state, next_action)).float()
         ## the log_prob is the entropy term
         target_value_func = (predicted_new_q_value - self.SACAlpha * log_prob).squeeze()
         value_loss = self.netLossFunc(predicted_value, target_value_func.detach())
@@ -125,15 +129,14 @@ class SACAgent(DDPGAgent):
             self.losses.append([self.globalStepCount, self.epIdx, value_loss.item(), policy_loss.item()])
 
     def copy_nets(self):
-        for target_param, param in zip(self.valueTargetNet.parameters(), self.valueNet.parameters()):
-            target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
+        self.softUpdate()
 
     def save_all(self):
         prefix = self.dirName + self.identifier + 'Finalepoch' + str(self.epIdx)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        with self.memoryLock:
+            self.memoryCheckpoint.save(self.memory, prefix)
 
         torch.save({
             'epoch': self.epIdx,
@@ -153,8 +156,8 @@ class SACAgent(DDPGAgent):
         prefix = self.dirName + self.identifier + 'Epoch' + str(self.epIdx)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        with self.memoryLock:
+            self.memoryCheckpoint.save(self.memory, prefix)
 
         torch.save({
             'epoch': self.epIdx,
@@ -173,8 +176,11 @@ class SACAgent(DDPGAgent):
     def load_checkpoint(self, prefix):
         self.loadLosses(prefix + '_loss.txt')
         self.loadRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'rb') as file:
-            self.memory = pickle.load(file)
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        # experiences are loaded into a newly initialized memory
+        self.init_memory()
+        self.memory = self.memoryCheckpoint.load(self.memory, prefix)
 
         checkpoint = torch.load(prefix + '_checkpoint.pt')
         self.epIdx = checkpoint['epoch']
@@ -0,0 +1,20 @@
+from Agents.DDPG.DDPGSyn import DDPGSynAgent
+from Agents.SAC.SAC import SACAgent
+
+
+class SACSynAgent(DDPGSynAgent, SACAgent):
+    """class for SAC agents training on synchronized environments.
+        Environment stepping follows DDPGSynAgent, learning follows SACAgent. Exploration samples the stochastic policy
+        of the actor net for each environment unless actionNoiseOption is given.
+        # Arguments
+            same as SACAgent, env is a vectorized environment
+        """
+    def __init__(self, config, actorNets, criticNets, env, optimizers, netLossFunc, nbAction, stateProcessor=None,
+                 experienceProcessor=None):
+        super(SACSynAgent, self).__init__(config, actorNets, criticNets, env, optimizers, netLossFunc, nbAction,
+                                          stateProcessor, experienceProcessor)
+
+    def read_config(self):
+        super(SACSynAgent, self).read_config()
+        if 'actionNoiseOption' not in self.config:
+            self.actionNoiseOption = 'policy'
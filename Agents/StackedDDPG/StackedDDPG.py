@@ -3,6 +3,7 @@ import os
 import numpy as np
 from Agents.Core.ExtendedReplayMemory import ExtendedReplayMemory, ExtendedTransition
 from Agents.DDPG.DDPG import DDPGAgent
+from Agents.Core.SoftUpdate import SoftUpdate
 import pickle
 
 
@@ -30,6 +31,11 @@ class StackedDDPGAgent(DDPGAgent):
         self.criticNet_target = None
 
         self.net_to_device()
+        self.softUpdates = [SoftUpdate([(self.actorNet_targets[i] if self.actorNet_targets is not None else None,
+                                         self.actorNets[i]),
+                                        (self.criticNet_targets[i] if self.criticNet_targets is not None else None,
+                                         self.criticNets[i])], self.tau, self.flatParameters)
+                            for i in range(len(self.actorNets))]
 
     def init_memory(self):
         self.memories = [ReplayMemory(self.memoryCapacity) for _ in range(self.episodeLength)]
@@ -110,11 +116,7 @@ class StackedDDPGAgent(DDPGAgent):
 
             # do soft update
             if self.learnStepCounter % self.policyUpdateFreq == 0:
-                for target_param, param in zip(self.actorNet_targets[n].parameters(), self.actorNets[n].parameters()):
-                    target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
-
-                for target_param, param in zip(self.criticNet_targets[n].parameters(), self.criticNets[n].parameters()):
-                    target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
+                self.softUpdates[n]()
 
             self.learnStepCounter += 1
 
@@ -2,6 +2,8 @@ from Agents.DQN.BaseDQN import BaseDQNAgent
 from Agents.DQN.DQN import DQNAgent
 
 from Agents.Core.ExtendedReplayMemory import ExtendedReplayMemory, ExtendedTransition
+from Agents.Core.FlatParameters import flatten_parameters, sync_net
+from Agents.Core.Precision import autocast_context
 import random
 import torch
 import torch.optim
@@ -58,6 +60,13 @@ class StackedDQNAgent(DQNAgent):
             if self.targetNets[i] is not None:
                 self.targetNets[i] = self.targetNets[i].to(self.device)
 
+        # target net syncs become one contiguous copy
+        if self.flatParameters:
+            for i in range(len(self.policyNets)):
+                flatten_parameters(self.policyNets[i])
+                if self.targetNets[i] is not None:
+                    flatten_parameters(self.targetNets[i])
+
         self.dirName = 'Log/'
         if 'dataLogFolder' in self.config:
             self.dirName = self.config['dataLogFolder']
@@ -196,7 +205,7 @@ class StackedDQNAgent(DQNAgent):
                     self.losses.append([self.globalStepCount, self.epIdx, loss])
 
                 if self.learnStepCounter % self.targetNetUpdateStep == 0:
-                    self.targetNets[i].load_state_dict(self.policyNets[i].state_dict())
+                    sync_net(self.targetNets[i], self.policyNets[i])
 
             self.learnStepCounter += 1
 
@@ -231,43 +240,16 @@ class StackedDQNAgent(DQNAgent):
 
 
         for step in range(gradientStep):
-            # calculate Qvalues based on selected action batch
-            QValues = self.policyNet(state).gather(1, action)
-
-            if updateOption == 'targetNet':
-                 # Here we detach because we do not want gradient flow from target values to net parameters
-
-                 QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-                 if self.nextStageTargetNet is not None and len(finalNextState):
-                     # Q values for current stage done but not next stage done (or not global done)
-                     # if nextStageTargetNet is None, means it is in the final stage, and we will not bootstrap for finite-horizon MDP
-                    QNext[finalMask] = self.nextStageTargetNet(finalNextState).max(1)[0].detach()
-
-                # Q values for states not stage done
-                 if len(nonFinalNextState):
-                     QNext[nonFinalMask] = self.targetNet(nonFinalNextState).max(1)[0].detach()
-                 # reward has shape (batchSize, sequenceLength)
-                 targetValues = reward + (self.gamma) * QNext.unsqueeze(-1)
-            if updateOption == 'policyNet':
-                raise NotImplementedError
-                targetValues = reward + self.gamma * torch.max(self.policyNet(nextState).detach(), dim=1)[0].unsqueeze(-1)
-            if updateOption == 'doubleQ':
-
-                 # select optimal action from policy net
-                 with torch.no_grad():
-                    batchAction = self.policyNet(nonFinalNextState).max(dim=1)[1]
-                    QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-
-                    if self.nextStageTargetNet is not None and len(finalNextState):
-                        # Q values for current stage done but not next stage done (or not global done)
-                        # if nextStageTargetNet is None, means it is in the final stage, and we will not bootstrap for finite-horizon MDP
-                        QNext[finalMask] = self.nextStageTargetNet(finalNextState).max(1)[0].detach()
-
-                    # Q values for states not stage done
-                    if len(nonFinalNextState):
-                        QNext[nonFinalMask] = self.targetNet(nonFinalNextState).max(1)[0].detach()
-
-                    targetValues = reward + (self.gamma) * QNext.unsqueeze(-1)
+            # Q values for current stage done but not next stage done (or not global done) bootstrap from the next stage
+            # if nextStageTargetNet is None, means it is in the final stage, and we will not bootstrap for finite-horizon MDP
+            finalValue = None
+            if self.nextStageTargetNet is not None:
+                finalValue = lambda s: self.nextStageTargetNet(s).max(1)[0]
+
+            with autocast_context(self.precision, self.device):
+                QValues, targetValues = self.tdTarget.compute(updateOption, self.policyNet, self.targetNet, state, action,
+                                                              reward, nonFinalNextState, nonFinalMask, self.gamma,
+                                                              finalNextState, finalMask, finalValue)
 
             # Compute loss
             loss_single = loss_fun(QValues, targetValues)
@@ -3,6 +3,7 @@ import os
 import numpy as np
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.SAC.SAC import SACAgent
+from Agents.Core.SoftUpdate import SoftUpdate
 import pickle
 
 
@@ -42,6 +43,8 @@ class StackedSACAgent(SACAgent):
         self.value_optimizer = None
 
         self.net_to_device()
+        self.softUpdates = [SoftUpdate([(self.valueTargetNets[i], self.valueNets[i])], self.tau, self.flatParameters)
+                            for i in range(len(self.valueNets))]
 
     def init_memory(self):
         self.memories = [ReplayMemory(self.memoryCapacity) for _ in range(self.episodeLength)]
@@ -107,8 +110,7 @@ class StackedSACAgent(SACAgent):
 
             # do soft update
             if self.learnStepCounter % self.policyUpdateFreq == 0:
-                for target_param, param in zip(self.valueTargetNets[n].parameters(), self.valueNets[n].parameters()):
-                    target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
+                self.softUpdates[n]()
 
 
     def train(self):
@@ -4,6 +4,7 @@ from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.DDPG.DDPG import DDPGAgent
 from Agents.TDDDPG.TDDDPG import TDDDPGAgent
 from Agents.Core.ExtendedReplayMemory import ExtendedReplayMemory, ExtendedTransition
+from Agents.Core.Precision import autocast_context
 
 import pickle
 
@@ -78,31 +79,32 @@ class TD3MultiStageUnit(TDDDPGAgent):
 
 
         # Critic loss
-        QValuesOne = self.criticNetOne.forward(state, action).squeeze()
-        QValuesTwo = self.criticNetTwo.forward(state, action).squeeze()
+        with autocast_context(self.precision, self.device):
+            QValuesOne = self.criticNetOne.forward(state, action).squeeze().float()
+            QValuesTwo = self.criticNetTwo.forward(state, action).squeeze().float()
 
 
-        # next_actions = self.actorNet_target.forward(nonFinalNextState)
+            # next_actions = self.actorNet_target.forward(nonFinalNextState)
 
-        QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-        numNonFinalNextState = sum(nonFinalMask)
-        numFinalNextState = sum(finalMask)
+            QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
+            numNonFinalNextState = sum(nonFinalMask)
+            numFinalNextState = sum(finalMask)
 
-        if numNonFinalNextState:
+            if numNonFinalNextState:
 
-            actionNoise = torch.randn((numNonFinalNextState, self.numAction), dtype=torch.float32,
-                                      device=self.device)
-            next_actions = self.actorNet_target.forward(nonFinalNextState) + actionNoise * self.policySmoothNoise
+                actionNoise = torch.randn((numNonFinalNextState, self.numAction), dtype=torch.float32,
+                                          device=self.device)
+                next_actions = self.actorNet_target.forward(nonFinalNextState) + actionNoise * self.policySmoothNoise
 
-            # if we do not have stage done
-            # we use our own target net to bootstrap
-            QNextCriticOne = self.criticNet_targetOne.forward(nonFinalNextState, next_actions.detach()).squeeze()
-            QNextCriticTwo = self.criticNet_targetTwo.forward(nonFinalNextState, next_actions.detach()).squeeze()
-            QNext[nonFinalMask] = torch.min(QNextCriticOne, QNextCriticTwo)
+                # if we do not have stage done
+                # we use our own target net to bootstrap
+                QNextCriticOne = self.criticNet_targetOne.forward(nonFinalNextState, next_actions.detach()).squeeze()
+                QNextCriticTwo = self.criticNet_targetTwo.forward(nonFinalNextState, next_actions.detach()).squeeze()
+                QNext[nonFinalMask] = torch.min(QNextCriticOne, QNextCriticTwo).float()
 
-        if numFinalNextState:
-            if targetAgent is not None:
-                QNext[finalMask] = targetAgent.evaluate_state_value(finalNextState)
+            if numFinalNextState:
+                if targetAgent is not None:
+                    QNext[finalMask] = targetAgent.evaluate_state_value(finalNextState).float()
 
 
         targetValues = reward + self.gamma * QNext
@@ -127,7 +129,8 @@ class TD3MultiStageUnit(TDDDPGAgent):
         if self.learnStepCounter % self.policyUpdateFreq:
             # Actor loss
             # we try to maximize criticNet output(which is state value)
-            policy_loss = -self.criticNetOne.forward(state, self.actorNet.forward(state)).mean()
+            with autocast_context(self.precision, self.device):
+                policy_loss = -self.criticNetOne.forward(state, self.actorNet.forward(state)).float().mean()
 
             # update networks
             self.actor_optimizer.zero_grad()
@@ -142,14 +145,7 @@ class TD3MultiStageUnit(TDDDPGAgent):
                                     policy_loss.item()])
 
                 # update target networks
-                for target_param, param in zip(self.actorNet_target.parameters(), self.actorNet.parameters()):
-                    target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
-
-                for target_param, param in zip(self.criticNet_targetOne.parameters(), self.criticNetOne.parameters()):
-                    target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
-
-                for target_param, param in zip(self.criticNet_targetTwo.parameters(), self.criticNetTwo.parameters()):
-                    target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
+                self.softUpdate()
 
         self.learnStepCounter += 1
 
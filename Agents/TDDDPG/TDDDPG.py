@@ -2,6 +2,8 @@ import torch
 import numpy as np
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
 from Agents.DDPG.DDPG import DDPGAgent
+from Agents.Core.SoftUpdate import SoftUpdate
+from Agents.Core.Precision import autocast_context
 
 import pickle
 
@@ -42,10 +44,9 @@ class TDDDPGAgent(DDPGAgent):
         self.criticTwo_optimizer = optimizers['criticTwo']
 
         self.net_to_device()
-
-    def init_memory(self):
-        self.memory = ReplayMemory(self.memoryCapacity)
-
+        self.softUpdate = SoftUpdate([(self.actorNet_target, self.actorNet),
+                                      (self.criticNet_targetOne, self.criticNetOne),
+                                      (self.criticNet_targetTwo, self.criticNetTwo)], self.tau, self.flatParameters)
 
     def read_config(self):
         super(TDDDPGAgent, self).read_config()
@@ -82,14 +83,7 @@ class TDDDPGAgent(DDPGAgent):
         '''
         if self.learnStepCounter % self.policyUpdateFreq == 0:
             # update target networks
-            for target_param, param in zip(self.actorNet_target.parameters(), self.actorNet.parameters()):
-                target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
-
-            for target_param, param in zip(self.criticNet_targetOne.parameters(), self.criticNetOne.parameters()):
-                target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
-
-            for target_param, param in zip(self.criticNet_targetTwo.parameters(), self.criticNetTwo.parameters()):
-                target_param.data.copy_(param.data * self.tau + target_param.data * (1.0 - self.tau))
+            self.softUpdate()
 
     def update_net_on_transitions(self, transitions_raw):
         '''
@@ -98,19 +92,21 @@ class TDDDPGAgent(DDPGAgent):
         state, nonFinalMask, nonFinalNextState, action, reward = self.prepare_minibatch(transitions_raw)
 
         # Critic loss
-        QValuesOne = self.criticNetOne.forward(state, action).squeeze()
-        QValuesTwo = self.criticNetTwo.forward(state, action).squeeze()
+        with autocast_context(self.precision, self.device):
+            QValuesOne = self.criticNetOne.forward(state, action).squeeze().float()
+            QValuesTwo = self.criticNetTwo.forward(state, action).squeeze().float()
 
-        actionNoise = torch.randn((nonFinalNextState.shape[0], self.numAction), dtype=torch.float32, device=self.device)
-        next_actions = self.actorNet_target.forward(nonFinalNextState) + actionNoise * self.policySmoothNoise
+            actionNoise = torch.randn((nonFinalNextState.shape[0], self.numAction), dtype=torch.float32,
+                                      device=self.device)
+            next_actions = self.actorNet_target.forward(nonFinalNextState) + actionNoise * self.policySmoothNoise
 
-        # next_actions = self.actorNet_target.forward(nonFinalNextState)
+            # next_actions = self.actorNet_target.forward(nonFinalNextState)
 
-        QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
-        QNextCriticOne = self.criticNet_targetOne.forward(nonFinalNextState, next_actions.detach()).squeeze()
-        QNextCriticTwo = self.criticNet_targetTwo.forward(nonFinalNextState, next_actions.detach()).squeeze()
+            QNext = torch.zeros(self.trainBatchSize, device=self.device, dtype=torch.float32)
+            QNextCriticOne = self.criticNet_targetOne.forward(nonFinalNextState, next_actions.detach()).squeeze()
+            QNextCriticTwo = self.criticNet_targetTwo.forward(nonFinalNextState, next_actions.detach()).squeeze()
 
-        QNext[nonFinalMask] = torch.min(QNextCriticOne, QNextCriticTwo)
+            QNext[nonFinalMask] = torch.min(QNextCriticOne, QNextCriticTwo).float()
 
         targetValues = reward + self.gamma * QNext
 
@@ -134,7 +130,8 @@ class TDDDPGAgent(DDPGAgent):
         if self.learnStepCounter % self.policyUpdateFreq:
             # Actor loss
             # we try to maximize criticNet output(which is state value)
-            policy_loss = -self.criticNetOne.forward(state, self.actorNet.forward(state)).mean()
+            with autocast_context(self.precision, self.device):
+                policy_loss = -self.criticNetOne.forward(state, self.actorNet.forward(state)).float().mean()
 
             # update networks
             self.actor_optimizer.zero_grad()
@@ -155,8 +152,8 @@ class TDDDPGAgent(DDPGAgent):
         prefix = self.dirName + identifier + 'Finalepoch' + str(self.epIdx)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        with self.memoryLock:
+            self.memoryCheckpoint.save(self.memory, prefix)
 
         torch.save({
             'epoch': self.epIdx,
@@ -175,8 +172,8 @@ class TDDDPGAgent(DDPGAgent):
         prefix = self.dirName + identifier + 'Epoch' + str(self.epIdx)
         self.saveLosses(prefix + '_loss.txt')
         self.saveRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'wb') as file:
-            pickle.dump(self.memory, file)
+        with self.memoryLock:
+            self.memoryCheckpoint.save(self.memory, prefix)
 
         torch.save({
             'epoch': self.epIdx,
@@ -192,8 +189,11 @@ class TDDDPGAgent(DDPGAgent):
     def load_checkpoint(self, prefix):
         self.loadLosses(prefix + '_loss.txt')
         self.loadRewards(prefix + '_reward.txt')
-        with open(prefix + '_memory.pickle', 'rb') as file:
-            self.memory = pickle.load(file)
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        # experiences are loaded into a newly initialized memory
+        self.init_memory()
+        self.memory = self.memoryCheckpoint.load(self.memory, prefix)
 
         checkpoint = torch.load(prefix + '_checkpoint.pt')
         self.epIdx = checkpoint['epoch']
@@ -0,0 +1,13 @@
+from Agents.DDPG.DDPGSyn import DDPGSynAgent
+from Agents.TDDDPG.TDDDPG import TDDDPGAgent
+
+
+class TDDDPGSynAgent(DDPGSynAgent, TDDDPGAgent):
+    """class for TD3 agents training on synchronized environments.
+        Environment stepping and exploration follow DDPGSynAgent, learning follows TDDDPGAgent.
+        # Arguments
+            same as TDDDPGAgent, env is a vectorized environment
+        """
+    def __init__(self, config, actorNets, criticNets, env, optimizers, netLossFunc, nbAction, stateProcessor=None, experienceProcessor = None):
+        super(TDDDPGSynAgent, self).__init__(config, actorNets, criticNets, env, optimizers, netLossFunc, nbAction,
+                                             stateProcessor, experienceProcessor)
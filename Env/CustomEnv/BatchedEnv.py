@@ -0,0 +1,133 @@
+import numpy as np
+
+
+def take_rows(observations, indices):
+    # rows of batched observations, an array or a dictionary of arrays
+    if isinstance(observations, dict):
+        return {key: value[indices].copy() for key, value in observations.items()}
+    return observations[indices].copy()
+
+
+def put_rows(observations, indices, rows):
+    if isinstance(observations, dict):
+        for key, value in observations.items():
+            value[indices] = rows[key]
+    else:
+        observations[indices] = rows
+
+
+class BatchedInfo(object):
+    """class of the infos of one step of a batched environment.
+        It behaves like the list of infos of a vectorized environment, the info dictionary of environment i is built
+        when infos[i] is accessed, so stepping thousands of environments does not build thousands of dictionaries.
+        # Argument
+        fields: dictionary of arrays with the batch dimension first, e.g., {'stepCount': array of shape (numEnvs,)}
+        terminalIndices: environments whose episodes ended in this step
+        terminalObservations: batched terminal observations of terminalIndices
+        """
+    def __init__(self, numEnvs, fields, terminalIndices=None, terminalObservations=None):
+        self.numEnvs = numEnvs
+        self.fields = fields
+        self.terminals = {}
+        if terminalIndices is not None:
+            self.terminals = {index: k for k, index in enumerate(terminalIndices.tolist())}
+        self.terminalObservations = terminalObservations
+
+    def __getitem__(self, index):
+        info = {key: value[index] for key, value in self.fields.items()}
+        if index in self.terminals:
+            info['terminal_observation'] = take_rows(self.terminalObservations, self.terminals[index])
+        return info
+
+    def __len__(self):
+        return self.numEnvs
+
+    def __iter__(self):
+        for index in range(self.numEnvs):
+            yield self[index]
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class BatchedEnv(object):
+    """base class of environments simulating numEnvs instances of an environment with numpy arrays.
+        The interface is the one of vectorized environments (see SharedVecEnv): reset, step (or step_async and
+        step_wait) and close, with batched observations, rewards and dones. Instances whose episodes are done are reset
+        right away, the observation returned by step is then the first observation of the next episode and the terminal
+        observation is returned in info['terminal_observation']. infos is a BatchedInfo.
+        Subclasses hold the state of all instances in arrays with the batch dimension first and implement
+        reset_state(indices), observe(indices) and transition(actions).
+        # Argument
+        numEnvs: number of instances
+        seed: seed of the random state of the instances
+        """
+    def __init__(self, numEnvs, seed=1):
+        self.numEnvs = numEnvs
+        self.randomSeed = seed
+        self.random = np.random.RandomState(seed)
+        self.stepCount = np.zeros(numEnvs, dtype=np.int64)
+        self.actions = None
+
+    def reset_state(self, indices):
+        '''
+        set the initial states of the instances of indices
+        '''
+        raise NotImplementedError
+
+    def observe(self, indices=slice(None)):
+        '''
+        return the batched observations of the instances of indices
+        '''
+        raise NotImplementedError
+
+    def transition(self, actions):
+        '''
+        advance all instances by batched actions, stepCount is already increased.
+        return rewards, dones and a dictionary of arrays for the infos
+        '''
+        raise NotImplementedError
+
+    def reset(self, indices=None):
+        '''
+        reset the instances of indices, default all, return observations of all instances
+        '''
+        indices = np.arange(self.numEnvs) if indices is None else np.asarray(indices, dtype=np.int64)
+        self.stepCount[indices] = 0
+        self.reset_state(indices)
+        return self.observe()
+
+    def step(self, actions):
+        self.stepCount += 1
+        rewards, dones, fields = self.transition(np.asarray(actions))
+        fields['stepCount'] = self.stepCount.copy()
+        observations = self.observe()
+
+        doneIndices = np.where(dones)[0]
+        terminals = None
+        if len(doneIndices):
+            # the terminal observations are kept, finished instances are reset right away
+            terminals = take_rows(observations, doneIndices)
+            self.stepCount[doneIndices] = 0
+            self.reset_state(doneIndices)
+            put_rows(observations, doneIndices, self.observe(doneIndices))
+
+        return observations, rewards, dones, BatchedInfo(self.numEnvs, fields, doneIndices, terminals)
+
+    def step_async(self, actions):
+        self.actions = actions
+
+    def step_wait(self):
+        return self.step(self.actions)
+
+    def close(self):
+        pass
+
+    def seed(self):
+        pass
+
+    def render(self, mode='human'):
+        pass
+
+    def __len__(self):
+        return self.numEnvs
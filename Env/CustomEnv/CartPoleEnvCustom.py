@@ -1,4 +1,7 @@
 from gym.envs.classic_control.cartpole import CartPoleEnv
+from Env.CustomEnv.BatchedEnv import BatchedEnv
+import math
+import numpy as np
 
 
 class CartPoleEnvCustom(CartPoleEnv):
@@ -20,4 +23,54 @@ class CartPoleEnvCustom(CartPoleEnv):
     def reset(self):
         state = super(CartPoleEnvCustom, self).reset()
         self.stepCount = 0
-        return state
\ No newline at end of file
+        return state
+
+
+class CartPoleEnvCustomBatched(BatchedEnv):
+    """class simulating numEnvs instances of CartPoleEnvCustom with numpy arrays, see BatchedEnv.
+        The dynamics are those of the classic control CartPoleEnv of gym with euler integration.
+        actions: integer array of shape (numEnvs,)
+        """
+    def __init__(self, numEnvs, seed=1):
+        super(CartPoleEnvCustomBatched, self).__init__(numEnvs, seed)
+        self.gravity = 9.8
+        self.masscart = 1.0
+        self.masspole = 0.1
+        self.total_mass = self.masspole + self.masscart
+        self.length = 0.5  # actually half the pole's length
+        self.polemass_length = self.masspole * self.length
+        self.force_mag = 10.0
+        self.tau = 0.02  # seconds between state updates
+        self.theta_threshold_radians = 12 * 2 * math.pi / 360
+        self.x_threshold = 2.4
+
+        # x, x_dot, theta, theta_dot of each instance
+        self.state = np.zeros((numEnvs, 4))
+        self.endStep = 200
+
+    def reset_state(self, indices):
+        self.state[indices] = self.random.uniform(low=-0.05, high=0.05, size=(len(indices), 4))
+
+    def observe(self, indices=slice(None)):
+        return self.state[indices].astype(np.float32)
+
+    def transition(self, actions):
+        x, x_dot, theta, theta_dot = self.state.T
+        force = np.where(actions == 1, self.force_mag, -self.force_mag)
+        costheta = np.cos(theta)
+        sintheta = np.sin(theta)
+
+        temp = (force + self.polemass_length * theta_dot ** 2 * sintheta) / self.total_mass
+        thetaacc = (self.gravity * sintheta - costheta * temp) / (
+            self.length * (4.0 / 3.0 - self.masspole * costheta ** 2 / self.total_mass))
+        xacc = temp - self.polemass_length * thetaacc * costheta / self.total_mass
+
+        self.state = np.stack((x + self.tau * x_dot, x_dot + self.tau * xacc,
+                               theta + self.tau * theta_dot, theta_dot + self.tau * thetaacc), axis=1)
+
+        failed = (np.abs(self.state[:, 0]) > self.x_threshold) | \
+                 (np.abs(self.state[:, 2]) > self.theta_threshold_radians)
+        rewards = np.where(failed, -1.0, 1.0)
+        dones = failed | (self.stepCount > self.endStep)
+        return rewards, dones, {}
+
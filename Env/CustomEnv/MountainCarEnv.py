@@ -1,4 +1,6 @@
 from gym.envs.classic_control.mountain_car import MountainCarEnv
+from Env.CustomEnv.BatchedEnv import BatchedEnv
+import numpy as np
 
 
 class MountainCarEnvCustom(MountainCarEnv):
@@ -22,3 +24,44 @@ class MountainCarEnvCustom(MountainCarEnv):
         state = super(MountainCarEnvCustom, self).reset()
         self.stepCount = 0
         return state
+
+
+class MountainCarEnvCustomBatched(BatchedEnv):
+    """class simulating numEnvs instances of MountainCarEnvCustom with numpy arrays, see BatchedEnv.
+        The dynamics are those of the classic control MountainCarEnv of gym.
+        actions: integer array of shape (numEnvs,)
+        """
+    def __init__(self, numEnvs, seed=1):
+        super(MountainCarEnvCustomBatched, self).__init__(numEnvs, seed)
+        self.min_position = -1.2
+        self.max_position = 0.6
+        self.max_speed = 0.07
+        self.goal_position = 0.5
+        self.goal_velocity = 0
+
+        self.force = 0.001
+        self.gravity = 0.0025
+
+        self.position = np.zeros(numEnvs)
+        self.velocity = np.zeros(numEnvs)
+        self.endStep = 500
+
+    def reset_state(self, indices):
+        self.position[indices] = self.random.uniform(low=-0.6, high=-0.4, size=len(indices))
+        self.velocity[indices] = 0.0
+
+    def observe(self, indices=slice(None)):
+        return np.stack((self.position[indices], self.velocity[indices]), axis=-1).astype(np.float32)
+
+    def transition(self, actions):
+        self.velocity += (actions - 1) * self.force + np.cos(3 * self.position) * (-self.gravity)
+        self.velocity = np.clip(self.velocity, -self.max_speed, self.max_speed)
+        self.position += self.velocity
+        self.position = np.clip(self.position, self.min_position, self.max_position)
+        self.velocity[(self.position == self.min_position) & (self.velocity < 0)] = 0
+
+        reached = (self.position >= self.goal_position) & (self.velocity >= self.goal_velocity)
+        rewards = -1.0 + self.position + 0.5 + 10 * reached
+        dones = reached | (self.stepCount > self.endStep)
+        return rewards, dones, {}
+
@@ -5,6 +5,7 @@ import numpy as np
 import random
 from copy import deepcopy
 import matplotlib.pyplot as plt
+from Env.CustomEnv.BatchedEnv import BatchedEnv
 
 class SpeedStablizerOneD(gym.Env):
 
@@ -83,4 +84,34 @@ class SpeedStablizerOneD(gym.Env):
         return result
 
 
+class SpeedStablizerOneDBatched(BatchedEnv):
+    """class simulating numEnvs instances of SpeedStablizerOneD with numpy arrays, see BatchedEnv.
+        actions: integer array of shape (numEnvs,)
+        """
+    def __init__(self, numEnvs, seed = 1):
+        super(SpeedStablizerOneDBatched, self).__init__(numEnvs, seed)
+
+        self.currentSpeed = np.zeros(numEnvs)
+        self.currentPosition = np.zeros(numEnvs)
+        self.targetSpeed = 2.0
+        self.nbActions = 3
+        self.stateDim = 1
+        self.endStep = 200
+
+    def reset_state(self, indices):
+        self.currentSpeed[indices] = self.random.rand(len(indices)) - 0.5
+        self.currentPosition[indices] = 0.0
+
+    def observe(self, indices=slice(None)):
+        return self.currentPosition[indices, np.newaxis].copy()
+
+    def transition(self, actions):
+        # move to positive or negative
+        self.currentSpeed += 0.1 * (actions == 1) - 0.1 * (actions == 2)
+
+        dones = np.abs(self.currentSpeed - self.targetSpeed) < 0.1
+        rewards = dones.astype(np.float64)
+
+        self.currentPosition += self.currentSpeed
+        return rewards, dones, {}
 
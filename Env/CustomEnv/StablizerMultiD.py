@@ -1,5 +1,6 @@
 import gym
 import numpy as np
+from Env.CustomEnv.BatchedEnv import BatchedEnv
 
 
 class StablizerMultiDContinuous(gym.Env):
@@ -131,3 +132,87 @@ class StablizerMultiDContinuous(gym.Env):
     def render(self, mode='human'):
         pass
 
+
+class StablizerMultiDContinuousBatched(BatchedEnv):
+    """class simulating numEnvs instances of StablizerMultiDContinuous with numpy arrays, see BatchedEnv.
+        Hindsight experiences of all instances are relabeled at once by getHindSightExperienceBatch.
+        actions: array of shape (numEnvs, Dim)
+        """
+    def __init__(self, numEnvs, config = None, seed = 1):
+        super(StablizerMultiDContinuousBatched, self).__init__(numEnvs, seed)
+
+        self.config = config
+        self.Dim = self.config['Dim']
+        self.nbActions = self.Dim
+        self.stateDim = self.Dim
+        self.currentState = np.zeros((numEnvs, self.Dim))
+        self.endStep = 200
+        if 'episodeLength' in self.config:
+            self.endStep = self.config['episodeLength']
+
+        self.finiteHorizon = False
+        if 'finiteHorizon' in self.config:
+            self.finiteHorizon = self.config['finiteHorizon']
+
+        self.accerlationFlag = False
+        if 'accerlationFlag' in self.config:
+            self.accerlationFlag = self.config['accerlationFlag']
+            self.accerlationTimeWindow = self.config['accerlationTimeWindow']
+            self.accerlationFactor = 5
+
+        self.actionPenalty = 0.0
+        if 'actionPenalty' in self.config:
+            self.actionPenalty = self.config['actionPenalty']
+
+    def calActionPenalty(self, currentState):
+        return -self.actionPenalty * np.linalg.norm(currentState, ord=2, axis=-1)
+
+    def reset_state(self, indices):
+        self.currentState[indices] = (self.random.rand(len(indices), self.Dim) - 0.5) * 3
+
+    def observe(self, indices=slice(None)):
+        # return state is target - current state (we set target to zero)
+        if not self.finiteHorizon:
+            return -self.currentState[indices]
+        return {'state': -self.currentState[indices], 'timeStep': self.stepCount[indices].copy()}
+
+    def transition(self, actions):
+        previousState = self.currentState.copy()
+        self.currentState += self.random.randn(self.numEnvs, self.Dim) * 0.05
+
+        # action is the movement amount
+        if self.accerlationFlag:
+            accerlation = np.isin(self.stepCount, self.accerlationTimeWindow)
+            self.currentState += self.accerlationFactor * actions * accerlation[:, np.newaxis]
+        else:
+            self.currentState += actions
+
+        distance = np.linalg.norm(self.currentState, ord=np.inf, axis=1)
+        dones = distance < 0.5
+        rewards = np.where(dones, 1.0, self.calActionPenalty(self.currentState))
+        rewards[distance > 5] = -1.0
+        if self.finiteHorizon:
+            dones |= self.stepCount == self.endStep
+
+        return rewards, dones, {'timeStep': self.stepCount.copy(), 'previousState': previousState,
+                                'currentState': self.currentState.copy()}
+
+    def getHindSightExperience(self, state, action, nextState, info):
+        # the reached state is the new target of one experience
+        distance = info['currentState'] - info['previousState']
+        rewardNew = 1 + self.calActionPenalty(info['currentState'])
+        if not self.finiteHorizon:
+            return distance, action, None, rewardNew
+        return {'state': distance, 'timeStep': state['timeStep']}, action, None, rewardNew
+
+    def getHindSightExperienceBatch(self, states, actions, nextStates, infos):
+        '''
+        relabel the experiences of all instances of the last step, infos is the BatchedInfo returned by step.
+        return batched states, actions, rewards and None for next states, the new experiences are terminal
+        '''
+        distance = infos.fields['currentState'] - infos.fields['previousState']
+        rewardsNew = 1 + self.calActionPenalty(infos.fields['currentState'])
+        if not self.finiteHorizon:
+            return distance, actions, None, rewardsNew
+        return {'state': distance, 'timeStep': infos.fields['timeStep'] - 1}, actions, None, rewardsNew
+
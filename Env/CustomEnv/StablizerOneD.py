@@ -3,6 +3,7 @@ import numpy as np
 import random
 from copy import deepcopy
 import matplotlib.pyplot as plt
+from Env.CustomEnv.BatchedEnv import BatchedEnv
 
 class StablizerOneD(gym.Env):
 
@@ -141,7 +142,7 @@ class StablizerOneDContinuous(gym.Env):
         self.infoDict = {}
         self.infoDict['stepCount'] = 0
         self.stepCount = 0
-        self.currentState = np.array([(random.random() - 0.5)*10], dtype=np.float)
+        self.currentState = np.array([(random.random() - 0.5)*10], dtype=np.float64)
         self.infoDict['initial state'] = self.currentState.copy()
         return self.currentState
 
@@ -209,8 +210,70 @@ class StablizerOneDContinuousFiniteHorizon(gym.Env):
         self.infoDict = {}
         self.infoDict['timeStep'] = 0
         self.stepCount = 0
-        self.currentState = np.array([(random.random() - 0.5)*10], dtype=np.float)
+        self.currentState = np.array([(random.random() - 0.5)*10], dtype=np.float64)
         self.infoDict['initial state'] = self.currentState.copy()
         combinedState = {'state': self.currentState.copy(), 'timeStep': self.stepCount}
 
-        return combinedState
\ No newline at end of file
+        return combinedState
+
+
+class StablizerOneDBatched(BatchedEnv):
+    """class simulating numEnvs instances of StablizerOneD with numpy arrays, see BatchedEnv.
+        actions: integer array of shape (numEnvs,)
+        """
+    def __init__(self, numEnvs, config = None, seed = 1):
+        super(StablizerOneDBatched, self).__init__(numEnvs, seed)
+
+        self.config = config
+        self.currentState = np.zeros(numEnvs)
+        self.nbActions = 3
+        self.stateDim = 1
+        self.endStep = 100
+
+    def reset_state(self, indices):
+        self.currentState[indices] = 0.514
+
+    def observe(self, indices=slice(None)):
+        return self.currentState[indices, np.newaxis].copy()
+
+    def transition(self, actions):
+        self.currentState += (self.random.rand(self.numEnvs) - 0.5) * 0.04
+        # move to positive or negative
+        self.currentState += 0.1 * (actions == 1) - 0.1 * (actions == 2)
+
+        success = np.abs(self.currentState) < 0.1
+        rewards = success.astype(np.float64)
+        endBeforeDone = self.stepCount > self.endStep
+        dones = success | endBeforeDone
+        return rewards, dones, {'reset': self.stepCount == 1, 'endBeforeDone': endBeforeDone}
+
+
+class StablizerOneDContinuousBatched(BatchedEnv):
+    """class simulating numEnvs instances of StablizerOneDContinuous with numpy arrays, see BatchedEnv.
+        actions: array of shape (numEnvs, 1)
+        """
+    def __init__(self, numEnvs, config = None, seed = 1):
+        super(StablizerOneDContinuousBatched, self).__init__(numEnvs, seed)
+
+        self.config = config
+        self.currentState = np.zeros((numEnvs, 1))
+        self.nbActions = 1
+        self.stateDim = 1
+        self.endStep = 200
+
+    def reset_state(self, indices):
+        self.currentState[indices] = (self.random.rand(len(indices), 1) - 0.5) * 10
+
+    def observe(self, indices=slice(None)):
+        return self.currentState[indices].copy()
+
+    def transition(self, actions):
+        self.currentState += (self.random.rand(self.numEnvs, 1) - 0.5) * 0.1
+
+        # action is the movement amount
+        self.currentState += actions.reshape(self.numEnvs, 1)
+        distance = np.abs(self.currentState[:, 0])
+        dones = distance < 0.5
+        rewards = np.where(distance > 5, -1.0, dones.astype(np.float64))
+        return rewards, dones, {}
+
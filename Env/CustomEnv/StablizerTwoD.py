@@ -5,6 +5,7 @@ import numpy as np
 import random
 import matplotlib.pyplot as plt
 import math
+from Env.CustomEnv.BatchedEnv import BatchedEnv
 
 class StablizerTwoD(gym.Env):
 
@@ -244,3 +245,35 @@ class StablizerTwoDContinuousSP(gym.Env):
 
     def render(self, mode='human'):
         pass
+
+
+class StablizerTwoDBatched(BatchedEnv):
+    """class simulating numEnvs instances of StablizerTwoD with numpy arrays, see BatchedEnv.
+        actions: integer array of shape (numEnvs,)
+        """
+    def __init__(self, numEnvs, seed = 1):
+        super(StablizerTwoDBatched, self).__init__(numEnvs, seed)
+
+        self.currentState = np.zeros((numEnvs, 2))
+        self.nbActions = 5
+        self.stateDim = 2
+        self.endStep = 200
+        # movement of each action: stay, positive, negative, up, down
+        self.moves = np.array([[0.0, 0.0], [0.1, 0.0], [-0.1, 0.0], [0.0, 0.1], [0.0, -0.1]])
+
+    def reset_state(self, indices):
+        self.currentState[indices] = (self.random.rand(len(indices), 2) - 0.5) - 0.1
+
+    def observe(self, indices=slice(None)):
+        return self.currentState[indices].copy()
+
+    def transition(self, actions):
+        self.currentState += (self.random.rand(self.numEnvs, 2) - 0.5) * 0.4
+        self.currentState += self.moves[actions]
+
+        distance = np.linalg.norm(self.currentState, ord=np.inf, axis=1)
+        inside = distance < 1
+        rewards = np.where(inside, -distance, -distance * (self.endStep - self.stepCount))
+        dones = ~inside | (self.stepCount > self.endStep)
+        return rewards, dones, {}
+
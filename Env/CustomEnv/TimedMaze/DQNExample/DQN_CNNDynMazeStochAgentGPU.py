@@ -84,17 +84,6 @@ def plotPolicy(policy, nbActions):
 #     os.makedirs(directory)
 
 
-def stateProcessor(state, device = 'cpu'):
-    # given a list a dictions like { 'sensor': np.array, 'target': np.array}
-    # we want to get a diction like {'sensor': list of torch tensor, 'target': list of torch tensor}
-    nonFinalMask = torch.tensor(tuple(map(lambda s: s is not None, state)), device=device, dtype=torch.uint8)
-
-    senorList = [item['sensor'] for item in state if item is not None]
-    targetList = [item['target'] for item in state if item is not None]
-    nonFinalState = {'sensor': torch.tensor(senorList, dtype=torch.float32, device=device),
-              'target': torch.tensor(targetList, dtype=torch.float32, device=device)}
-    return nonFinalState, nonFinalMask
-
 def experienceProcessor(state, action, nextState, reward, info):
     if nextState is not None:
         target = info['previousTarget']
@@ -111,6 +100,9 @@ env = DynamicMazeMultiMap(config)
 N_S = env.stateDim[0]
 N_A = env.nbActions
 
+# dictionary states are collated by the agent from the declared fields
+config['stateSchema'] = {'sensor': {'shape': [1, N_S, N_S]}, 'target': {'shape': [2]}}
+
 
 policyNet = MulChanConvNet(N_S, 128, N_A)
 targetNet = deepcopy(policyNet)
@@ -118,7 +110,7 @@ optimizer = optim.Adam(policyNet.parameters(), lr=config['learningRate'])
 
 
 agent = DQNAgent(config, policyNet, targetNet, env, optimizer, torch.nn.MSELoss(reduction='none'), N_A,
-                 stateProcessor=stateProcessor, experienceProcessor=experienceProcessor)
+                 experienceProcessor=experienceProcessor)
 
 
 
@@ -160,7 +152,7 @@ if trainFlag:
                           #dy = agent.env.agent.targetClipMap(dy) if dy > 0 else -agent.env.agent.targetClipMap(-dy)
                           state = {'sensor': sensorInfo, 'target': np.array([dx, dy])}
                           policy[i, j] = agent.getPolicy(state)
-                          Qvalue = agent.policyNet(stateProcessor([state], config['device'])[0])
+                          Qvalue = agent.policyNet(agent.stateProcessor([state], config['device'])[0])
                           value[i, j] = Qvalue[0, policy[i,j]].cpu().item()
             np.savetxt('DynamicMazePolicyBeforeTrain' + config['mapName'] +'phiIdx'+ str(phiIdx) + '.txt', policy, fmt='%d', delimiter='\t')
             np.savetxt('DynamicMazeValueBeforeTrain' + config['mapName'] + 'phiIdx' + str(phiIdx) + '.txt', value, fmt='%.3f',delimiter='\t')
@@ -194,7 +186,7 @@ if trainFlag:
                         #dy = agent.env.agent.targetClipMap(dy) if dy > 0 else -agent.env.agent.targetClipMap(-dy)
                         state = {'sensor': sensorInfo, 'target': np.array([dx, dy])}
                         policy[i, j] = agent.getPolicy(state)
-                        Qvalue = agent.policyNet(stateProcessor([state], config['device'])[0])
+                        Qvalue = agent.policyNet(agent.stateProcessor([state], config['device'])[0])
                         value[i, j] = Qvalue[0, policy[i,j]].cpu().item()
             np.savetxt('DynamicMazePolicyAfterTrain' + config['mapName'] + 'phiIdx' + str(phiIdx) + '.txt', policy, fmt='%d',
                        delimiter='\t')
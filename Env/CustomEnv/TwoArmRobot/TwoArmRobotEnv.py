@@ -3,6 +3,7 @@ import random
 import matplotlib.pyplot as plt
 import math
 import copy
+from Env.CustomEnv.BatchedEnv import BatchedEnv
 
 class TwoArmEnvironmentContinuous:
 
@@ -397,3 +398,119 @@ class TwoArmEnvironmentContinuousTwoStage(TwoArmEnvironmentContinuous):
         observation = np.concatenate(
             (firstArmEndPosition, secondArmEndPosition, secondArmDistToTarget))
         return observation
+
+
+class TwoArmEnvironmentContinuousBatched(BatchedEnv):
+    """class simulating numEnvs instances of TwoArmEnvironmentContinuous with numpy arrays, see BatchedEnv.
+        Forward kinematics of the observations, initial states from inverse kinematics and hindsight relabeling
+        (getHindSightExperienceBatch) are computed for all instances at once. Each instance counts its own episodes
+        for the target threshold schedule.
+        actions: array of shape (numEnvs, 2)
+        """
+    def __init__(self, numEnvs, config=None, seed=1):
+        super(TwoArmEnvironmentContinuousBatched, self).__init__(numEnvs, seed)
+
+        self.config = config
+        self.read_config()
+
+        # current state is the two link angle
+        self.currentState = np.zeros((numEnvs, 2))
+        self.targetState = np.tile(np.array([1.2, 1.2]), (numEnvs, 1))
+        self.effectorPosition = np.zeros((numEnvs, 2))
+
+        self.nbActions = 2
+        self.stateDim = 6
+        self.epiCount = np.full(numEnvs, -1, dtype=np.int64)
+        self.armLength = np.array([1.0, 1.0])
+
+    def read_config(self):
+        TwoArmEnvironmentContinuous.read_config(self)
+
+    def thresh_by_episode(self, step):
+        return self.endThresh + (
+                self.startThresh - self.endThresh) * np.exp(-1. * step / self.distanceThreshDecay)
+
+    def forwardKM(self, theta1, theta2):
+        '''
+        end positions of the first and the second arm of batched link angles, each of shape (batch, 2)
+        '''
+        firstArmEndPosition = np.stack((np.cos(theta1), np.sin(theta1)), axis=-1) * self.armLength[0]
+        secondArmEndPosition = firstArmEndPosition + \
+                               np.stack((np.cos(theta1 + theta2), np.sin(theta1 + theta2)), axis=-1) * \
+                               self.armLength[1]
+        return firstArmEndPosition, secondArmEndPosition
+
+    def inverseKM(self, x, y):
+        cosTheta2 = (x ** 2 + y ** 2 - np.sum(np.square(self.armLength))) / 2.0 / np.prod(self.armLength)
+
+        # randomly choose the elbow up and elbow down configuration
+        elbow = np.where(self.random.rand(len(x)) < 0.5, 1.0, -1.0)
+        theta2 = np.arctan2(elbow * np.sqrt(1.0 - cosTheta2 ** 2), cosTheta2)
+        k1 = self.armLength[0] + self.armLength[1] * np.cos(theta2)
+        k2 = self.armLength[1] * np.sin(theta2)
+
+        theta1 = np.arctan2(y, x) - np.arctan2(k2, k1)
+        return theta1, theta2
+
+    def reset_state(self, indices):
+        self.epiCount[indices] += 1
+        self.targetState[indices] = self.config['targetState']
+        self.currentState[indices] = self.config['currentState']
+
+        if self.config['dynamicTargetFlag']:
+            length = self.random.rand(len(indices)) * np.sqrt(np.sum(np.square(self.armLength)))
+            angle = self.random.rand(len(indices)) * 2 * np.pi
+            self.targetState[indices] = np.stack((length * np.cos(angle), length * np.sin(angle)), axis=-1)
+
+        targetThresh = np.full(len(indices), float('inf'))
+        if self.targetThreshFlag:
+            targetThresh = self.thresh_by_episode(self.epiCount[indices]) * np.sum(self.armLength)
+
+        if self.config['dynamicInitialStateFlag']:
+            # initial effector positions around the target are sampled until they are reachable
+            position = np.zeros((len(indices), 2))
+            pending = np.arange(len(indices))
+            while len(pending):
+                sample = self.targetState[indices[pending]] + \
+                         (self.random.rand(len(pending), 2) - 0.5) * targetThresh[pending, np.newaxis]
+                reachable = np.sum(np.square(sample), axis=1) < np.sum(np.square(self.armLength))
+                position[pending[reachable]] = sample[reachable]
+                pending = pending[~reachable]
+            theta1, theta2 = self.inverseKM(position[:, 0], position[:, 1])
+            self.currentState[indices] = np.stack((theta1, theta2), axis=-1)
+
+    def observe(self, indices=slice(None)):
+        firstArmEndPosition, secondArmEndPosition = self.forwardKM(self.currentState[indices, 0],
+                                                                   self.currentState[indices, 1])
+        self.effectorPosition[indices] = secondArmEndPosition
+        secondArmDistToTarget = self.targetState[indices] - secondArmEndPosition
+        return np.concatenate((firstArmEndPosition, secondArmEndPosition, secondArmDistToTarget/self.distanceScale),
+                              axis=1)
+
+    def transition(self, actions):
+        self.currentState += actions * self.actionScale
+        self.currentState %= 2 * np.pi
+        _, effectorPosition = self.forwardKM(self.currentState[:, 0], self.currentState[:, 1])
+
+        dones = np.linalg.norm(effectorPosition - self.targetState, ord=2, axis=1) < self.finishThresh
+        rewards = dones.astype(np.float64)
+        return rewards, dones, {'currentState': self.currentState.copy(), 'targetState': self.targetState.copy(),
+                                'effectorPosition': effectorPosition}
+
+    def getHindSightExperience(self, state, action, nextState, info):
+        # the reached effector position is the new target of one experience
+        state = np.asarray(state)
+        secondArmDistToTarget = info['effectorPosition'] - state[2:4]
+        observation = np.concatenate((state[0:4], secondArmDistToTarget/self.distanceScale))
+        return observation, np.array(action), None, 1
+
+    def getHindSightExperienceBatch(self, states, actions, nextStates, infos):
+        '''
+        relabel the experiences of all instances of the last step, infos is the BatchedInfo returned by step.
+        return batched states, actions, rewards and None for next states, the new experiences are terminal
+        '''
+        states = np.asarray(states)
+        secondArmDistToTarget = infos.fields['effectorPosition'] - states[:, 2:4]
+        observations = np.concatenate((states[:, 0:4], secondArmDistToTarget/self.distanceScale), axis=1)
+        return observations, np.array(actions), None, np.ones(len(states))
+
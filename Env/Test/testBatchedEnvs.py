@@ -0,0 +1,118 @@
+from Env.CustomEnv.StablizerOneD import StablizerOneD, StablizerOneDBatched, StablizerOneDContinuousBatched
+from Env.CustomEnv.StablizerTwoD import StablizerTwoDBatched
+from Env.CustomEnv.StablizerMultiD import StablizerMultiDContinuousBatched
+from Env.CustomEnv.SpeedStablizerOneD import SpeedStablizerOneDBatched
+from Env.CustomEnv.CartPoleEnvCustom import CartPoleEnvCustomBatched
+from Env.CustomEnv.MountainCarEnv import MountainCarEnvCustomBatched
+from Env.CustomEnv.TwoArmRobot.TwoArmRobotEnv import TwoArmEnvironmentContinuous, TwoArmEnvironmentContinuousBatched
+from gym.envs.classic_control.cartpole import CartPoleEnv
+from gym.envs.classic_control.mountain_car import MountainCarEnv
+import contextlib
+import io
+import numpy as np
+import time
+
+numEnvs = 64
+twoArmConfig = {'targetState': [1.2, 1.2], 'currentState': [0.0, 0.0], 'dynamicTargetFlag': True,
+                'dynamicInitialStateFlag': True, 'targetThreshFlag': True, 'target_start_thresh': 0.1,
+                'target_end_thresh': 1}
+
+envs = {'StablizerOneD': (StablizerOneDBatched(numEnvs), lambda: np.random.randint(0, 3, numEnvs)),
+        'StablizerOneDContinuous': (StablizerOneDContinuousBatched(numEnvs),
+                                    lambda: np.random.uniform(-1, 1, (numEnvs, 1))),
+        'StablizerTwoD': (StablizerTwoDBatched(numEnvs), lambda: np.random.randint(0, 5, numEnvs)),
+        'StablizerMultiDContinuous': (StablizerMultiDContinuousBatched(numEnvs, {'Dim': 5, 'finiteHorizon': True}),
+                                      lambda: np.random.uniform(-1, 1, (numEnvs, 5))),
+        'SpeedStablizerOneD': (SpeedStablizerOneDBatched(numEnvs), lambda: np.random.randint(0, 3, numEnvs)),
+        'CartPole': (CartPoleEnvCustomBatched(numEnvs), lambda: np.random.randint(0, 2, numEnvs)),
+        'MountainCar': (MountainCarEnvCustomBatched(numEnvs), lambda: np.random.randint(0, 3, numEnvs)),
+        'TwoArm': (TwoArmEnvironmentContinuousBatched(numEnvs, twoArmConfig),
+                   lambda: np.random.uniform(-0.1, 0.1, (numEnvs, 2)))}
+
+# finished instances are reset, their terminal observations are kept in the infos
+for name, (env, sample_action) in envs.items():
+    observations = env.reset()
+    for step in range(300):
+        stepCount = env.stepCount.copy()
+        observations, rewards, dones, infos = env.step(sample_action())
+        assert len(infos) == numEnvs and rewards.shape == (numEnvs,) and dones.shape == (numEnvs,)
+        assert np.all(env.stepCount[dones] == 0) and np.all(env.stepCount[~dones] == stepCount[~dones] + 1)
+        for i in np.where(dones)[0]:
+            assert 'terminal_observation' in infos[i]
+        for i in np.where(~dones)[0][:1]:
+            assert 'terminal_observation' not in infos[i]
+    print('{}: observations {}'.format(name, {key: value.shape for key, value in observations.items()}
+                                       if isinstance(observations, dict) else observations.shape))
+
+# StablizerOneD: the same moves without noise as the single environment
+env = StablizerOneDBatched(3)
+env.reset()
+single = StablizerOneD()
+single.reset()
+for action in [1, 2, 2]:
+    observations, _, _, infos = env.step(np.array([action] * 3))
+    state, _, _, info = single.step(action)
+    assert np.allclose(observations, state, atol=0.04 * env.stepCount[0]) and infos[0]['stepCount'] == info['stepCount']
+
+# classic control dynamics against gym
+cartPole = CartPoleEnvCustomBatched(1)
+cartPole.reset()
+gymCartPole = CartPoleEnv()
+gymCartPole.reset()
+gymCartPole.state = cartPole.state[0].copy()
+for action in [1, 0, 1, 1]:
+    observation, _, _, _ = cartPole.step(np.array([action]))
+    gymObservation = gymCartPole.step(action)[0]
+    assert np.allclose(observation[0], gymObservation, atol=1e-6)
+
+mountainCar = MountainCarEnvCustomBatched(1)
+mountainCar.reset()
+gymMountainCar = MountainCarEnv()
+gymMountainCar.reset()
+gymMountainCar.state = np.array([mountainCar.position[0], mountainCar.velocity[0]])
+for action in [2, 2, 0, 1]:
+    observation, _, _, _ = mountainCar.step(np.array([action]))
+    gymObservation = gymMountainCar.step(action)[0]
+    assert np.allclose(observation[0], gymObservation, atol=1e-6)
+
+# two arm robot: forward and inverse kinematics and hindsight relabeling against the single environment
+env = envs['TwoArm'][0]
+with contextlib.redirect_stdout(io.StringIO()):
+    single = TwoArmEnvironmentContinuous(twoArmConfig)
+    single.reset()
+observations = env.reset()
+# initial effector positions from inverse kinematics are reachable positions around the targets
+assert np.all(np.linalg.norm(env.effectorPosition, axis=1) <= 2.0)
+actions = np.random.uniform(-0.1, 0.1, (numEnvs, 2))
+nextObservations, rewards, dones, infos = env.step(actions)
+statesNew, actionsNew, nextStatesNew, rewardsNew = env.getHindSightExperienceBatch(list(observations), actions,
+                                                                                   list(nextObservations), infos)
+for i in range(numEnvs):
+    single.currentState = infos[i]['currentState'].copy()
+    single.targetState = infos[i]['targetState'].copy()
+    assert np.allclose(single.constructObservation(), nextObservations[i] if not dones[i]
+                       else infos[i]['terminal_observation'])
+    stateNew, actionNew, nextStateNew, rewardNew = single.getHindSightExperience(observations[i], actions[i],
+                                                                                 nextObservations[i], infos[i])
+    assert np.allclose(statesNew[i], stateNew) and nextStateNew is None and rewardsNew[i] == rewardNew
+    assert np.allclose(env.getHindSightExperience(observations[i], actions[i], None, infos[i])[0], stateNew)
+
+# steps per second of one batched environment against stepping single environments
+numEnvs = 4096
+env = StablizerOneDBatched(numEnvs)
+env.reset()
+actions = np.random.randint(0, 3, numEnvs)
+start = time.time()
+for _ in range(100):
+    env.step(actions)
+batchedTime = time.time() - start
+single = StablizerOneD()
+single.reset()
+start = time.time()
+for _ in range(100 * numEnvs // 64):
+    _, _, done, _ = single.step(1)
+    if done:
+        single.reset()
+singleTime = (time.time() - start) * 64
+print('StablizerOneD, batched {:.0f} steps/s, single {:.0f} steps/s'.format(100 * numEnvs / batchedTime,
+                                                                            100 * numEnvs / singleTime))
@@ -4,8 +4,7 @@ from Agents.DQN.DQN import DQNAgent
 from Agents.DQN.DQNSyn import DQNSynAgent
 from Agents.Core.MLPNet import MultiLayerNetRegression
 from Agents.Core.ReplayMemory import ReplayMemory, Transition
-from baselines.common.vec_env.subproc_vec_env import SubprocVecEnv
-from baselines.common.vec_env.dummy_vec_env import DummyVecEnv
+from Agents.Core.SharedVecEnv import SharedVecEnv
 import json
 from torch import optim
 from copy import deepcopy
@@ -68,14 +67,12 @@ numWorkers = config['numWorkers']
 if __name__=='__main__':
 
     envs = [make_env(config,  i) for i in range(numWorkers)]
-    if numWorkers > 1:
-        envs = SubprocVecEnv(envs)
-    else:
-        envs = SubprocVecEnv(envs)
+    envs = SharedVecEnv(envs)
 
     agent = DQNSynAgent(config, policyNet, targetNet, envs, optimizer, torch.nn.MSELoss(reduction='none'), N_A)
 
 
     agent.train()
 
+    envs.close()
     print('done Training')
@@ -0,0 +1,43 @@
+from Agents.Core.PrioritizedReplayMemory import PrioritizedReplayMemory
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+import time
+
+# microbenchmark of push and sample cost of prioritized replay memory at different capacities
+# the full scan columns show the cost of the np.min/np.max over all leaves that the min/max trees replace
+
+batchSize = 256
+nPush = 2000
+nSample = 50
+
+print('capacity\tpush(us)\tsample+update(ms)\tfull scan(ms)')
+for capacity in [1000, 10000, 100000, 1000000]:
+    memory = PrioritizedReplayMemory(capacity, {})
+    transition = Transition(np.random.rand(4), 0, np.random.rand(4), 0.0)
+
+    # fill all the leaves with random priorities first
+    memory.batch_update(np.arange(capacity) + capacity - 1, np.random.rand(capacity))
+    memory.tree.data_count = capacity
+
+    start = time.time()
+    for i in range(nPush):
+        memory.store(transition)
+    pushTime = (time.time() - start) / nPush
+
+    start = time.time()
+    for i in range(nSample):
+        _, b_idx, ISWeights = memory.sample(batchSize)
+        memory.batch_update(b_idx, np.random.rand(batchSize, 1))
+    sampleTime = (time.time() - start) / nSample
+
+    start = time.time()
+    for i in range(nSample):
+        np.min(memory.tree.tree[-capacity:])
+        np.max(memory.tree.tree[-capacity:])
+    scanTime = (time.time() - start) / nSample
+
+    # the companion trees agree with a full scan over the leaves
+    assert memory.minTree.root == np.min(memory.tree.tree[-capacity:])
+    assert memory.maxTree.root == np.max(memory.tree.tree[-capacity:])
+
+    print('{}\t{:.2f}\t{:.3f}\t{:.3f}'.format(capacity, pushTime * 1e6, sampleTime * 1e3, scanTime * 1e3))
@@ -0,0 +1,27 @@
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+
+memory = ArrayReplayMemory(10)
+for i in range(15):
+    state = np.random.rand(5, 5)
+    nextState = None if i % 4 == 3 else np.random.rand(5, 5)
+    memory.push(Transition(state, i, nextState, float(i)))
+
+# ring buffer keeps the last 10 experiences
+print(memory)
+print(memory.columns['action'])
+assert len(memory) == 10
+assert sorted(memory.columns['action'].tolist()) == list(range(5, 15))
+
+batch = memory.sample(6)
+print(batch.action)
+print(batch.reward)
+print(batch.nonFinalMask)
+assert batch.state.shape == (6, 5, 5)
+assert batch.nonFinalNextState.shape == (int(batch.nonFinalMask.sum()), 5, 5)
+# terminal transitions are every fourth experience
+assert np.all(batch.nonFinalMask == (batch.action % 4 != 3))
+
+memory.clear()
+print(memory)
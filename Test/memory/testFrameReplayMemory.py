@@ -0,0 +1,41 @@
+from Agents.Core.FrameReplayMemory import FrameReplayMemory
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+import random
+
+capacity = 200
+memory = FrameReplayMemory(capacity, frameCapacity=230, frameLookback=8)
+reference = ArrayReplayMemory(capacity)
+
+# episodes of random length, pushed the same way as DQNAgent does: state of a step is the next state of the previous step
+for episode in range(100):
+    state = np.random.rand(2, 4)
+    for step in range(random.randint(1, 12)):
+        done = random.random() < 0.1
+        nextState = None if done else np.random.rand(2, 4)
+        memory.push(Transition(state, step, nextState, float(episode)))
+        reference.push(Transition(state, step, nextState, float(episode)))
+        if done:
+            break
+        state = nextState
+
+print(memory)
+print(reference)
+
+# the frame memory keeps the most recent experiences, which are the last ones of the reference memory
+size = len(memory)
+assert size <= capacity
+refIdx = (reference.position - size + np.arange(size)) % capacity
+batch = memory.fetch_all()
+batchRef = reference.gather(refIdx)
+for field in batch._fields:
+    assert np.array_equal(getattr(batch, field), getattr(batchRef, field)), field
+
+sample = memory.sample(32)
+print(sample.reward)
+print(sample.nonFinalMask)
+
+frameBytes = sum(column.nbytes for name, column in memory.columns.items() if name.startswith('frame'))
+stateBytes = sum(column.nbytes for name, column in reference.columns.items() if 'state' in name)
+print('observation storage: {} bytes vs {} bytes'.format(frameBytes, stateBytes))
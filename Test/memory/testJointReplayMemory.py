@@ -0,0 +1,35 @@
+from Agents.Core.JointReplayMemory import JointReplayMemory
+from Agents.Core.GroupReplayMemory import GroupReplayMemory
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+import random
+
+numAgents = 3
+joint = JointReplayMemory(100, numAgents)
+group = GroupReplayMemory(100, numAgents)
+
+for i in range(250):
+    done = i % 10 == 9
+    transitions = [Transition(np.random.rand(4), random.randrange(5), None if done else np.random.rand(4), float(i))
+                   for n in range(numAgents)]
+    joint.push(transitions)
+    group.push(transitions)
+
+# the same index set gives the same experiences, with the agent axis first
+random.seed(1)
+batch = joint.sample(32)
+random.seed(1)
+groupBatch = group.sample(32)
+assert batch.state.shape == (numAgents, 32, 4) and batch.action.shape == (numAgents, 32)
+for n in range(numAgents):
+    assert np.array_equal(batch.state[n], np.stack([t.state for t in groupBatch[n]]))
+    assert np.array_equal(batch.action[n], [t.action for t in groupBatch[n]])
+    assert np.array_equal(batch.nonFinalNextState[n], np.stack([t.next_state for t in groupBatch[n] if t.next_state is not None]))
+assert np.array_equal(batch.reward, [t.reward for t in groupBatch[0]])
+assert np.array_equal(batch.nonFinalMask, [t.next_state is not None for t in groupBatch[0]])
+
+# dictionary states are stacked field by field
+joint = JointReplayMemory(10, 2)
+joint.push([Transition({'sensor': np.ones((2, 2)), 'target': np.zeros(2)}, 1, None, 1.0)] * 2)
+batch = joint.sample(1)
+print(joint, batch.state['sensor'].shape, batch.state['target'].shape, batch.nonFinalNextState['target'].shape)
@@ -0,0 +1,36 @@
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+from Agents.Core.MemmapReplayMemory import MemmapReplayMemory
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+import pickle
+
+memory = MemmapReplayMemory(50, 'memmapTest/', cacheSize=8)
+reference = ArrayReplayMemory(50)
+
+for i in range(137):
+    state = np.random.rand(3, 3, 3)
+    nextState = None if i % 7 == 6 else np.random.rand(3, 3, 3)
+    memory.push(Transition(state, i, nextState, float(i)))
+    reference.push(Transition(state, i, nextState, float(i)))
+
+print(memory)
+# part of the experiences are still in the cache, reading has to combine cache and disk
+idx = np.arange(50)
+batch = memory.gather(idx)
+batchRef = reference.gather(idx)
+for field in batch._fields:
+    assert np.array_equal(getattr(batch, field), getattr(batchRef, field))
+
+batch = memory.sample(16)
+print(batch.action)
+print(batch.nonFinalMask)
+
+# pickling only stores meta data, the memmap files are reopened
+with open('memmapTest/memory.pickle', 'wb') as file:
+    pickle.dump(memory, file)
+with open('memmapTest/memory.pickle', 'rb') as file:
+    memory2 = pickle.load(file)
+print(memory2)
+batch = memory2.gather(idx)
+for field in batch._fields:
+    assert np.array_equal(getattr(batch, field), getattr(batchRef, field))
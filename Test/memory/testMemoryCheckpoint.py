@@ -0,0 +1,90 @@
+from Agents.Core.ReplayMemory import ReplayMemory, Transition
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+from Agents.Core.FrameReplayMemory import FrameReplayMemory
+from Agents.Core.MemmapReplayMemory import MemmapReplayMemory
+from Agents.Core.PrioritizedReplayMemory import PrioritizedReplayMemory
+from Agents.Core.GroupReplayMemory import GroupReplayMemory
+from Agents.Core.JointReplayMemory import JointReplayMemory
+from Agents.Core.MemoryCheckpoint import MemoryCheckpoint
+from Agents.Core.StateCodec import BitPackCodec
+import numpy as np
+from copy import deepcopy
+import shutil
+import os
+
+folder = 'checkpointTest/'
+capacity = 50
+
+def randomState():
+    return {'sensor': (np.random.rand(1, 5, 5) > 0.5).astype(np.float32), 'target': np.random.rand(2)}
+
+def randomTransition(i):
+    return Transition(randomState(), i % 3, None if i % 7 == 6 else randomState(), float(i))
+
+def same(a, b):
+    # structural comparison of experiences, states and arrays
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, np.ndarray) and a.dtype == np.float64:
+        # sums of priorities are accumulated in a different order after loading
+        return np.allclose(a, b)
+    if isinstance(a, np.ndarray):
+        return np.array_equal(a, b)
+    return a == b
+
+def content(memory):
+    if isinstance(memory, MemmapReplayMemory):
+        # cached experiences are not on disk yet
+        return [memory.position, memory.size, memory.pushCount,
+                {name: memory.read(name, np.arange(memory.size)) for name in memory.columns}]
+    if isinstance(memory, ArrayReplayMemory) and not isinstance(memory, FrameReplayMemory):
+        return [memory.position, memory.size, memory.pushCount,
+                {name: column[:memory.size] for name, column in memory.columns.items()}]
+    if isinstance(memory, PrioritizedReplayMemory):
+        return [memory.tree.data_pointer, list(memory.tree.data), memory.storeCount, memory.tree.tree,
+                memory.minTree.tree, memory.maxTree.tree, memory.storeStep, memory.beta]
+    if isinstance(memory, FrameReplayMemory):
+        return [memory.tail, memory.size, memory.frameCount, memory.columns]
+    return [memory.position, memory.pushCount, memory.memory]
+
+makers = {'natural': lambda: ReplayMemory(capacity),
+          'array': lambda: ArrayReplayMemory(capacity, codecs={'sensor': BitPackCodec()}),
+          'frame': lambda: FrameReplayMemory(capacity),
+          'memmap': lambda: MemmapReplayMemory(capacity, folder + 'memmap/', cacheSize=8),
+          'priority': lambda: PrioritizedReplayMemory(capacity, {}),
+          'group': lambda: GroupReplayMemory(capacity, 2),
+          'joint': lambda: JointReplayMemory(capacity, 2)}
+
+for name, make in makers.items():
+    memory = make()
+    checkpoint = MemoryCheckpoint()
+    saved = []
+    count = 0
+    # checkpoints after few experiences, many experiences and more than capacity experiences
+    for epoch, n in enumerate([5, 20, 3, 0, 40, 60, 10, 10, 10, 10]):
+        for i in range(n):
+            transition = randomTransition(count)
+            if name == 'priority':
+                memory.store(transition)
+            elif name in ('group', 'joint'):
+                memory.push([transition, transition])
+            else:
+                memory.push(transition)
+            count += 1
+        if name == 'priority' and n > 0:
+            data, b_idx, ISWeights = memory.sample(4)
+            memory.batch_update(b_idx, np.random.rand(4, 1))
+        prefix = folder + 'Epoch' + str(epoch)
+        checkpoint.save(memory, prefix)
+        saved.append((prefix, deepcopy(content(memory))))
+
+    # every checkpoint, including earlier ones, can be loaded
+    for prefix, expected in saved:
+        loaded = MemoryCheckpoint().load(make(), prefix)
+        assert same(content(loaded), expected), (name, prefix)
+
+    segments = os.listdir(folder + 'memorySegments') if os.path.exists(folder + 'memorySegments') else []
+    print(name, len(memory), 'segment files:', len(segments))
+    shutil.rmtree(folder)
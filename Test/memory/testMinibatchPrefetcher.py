@@ -0,0 +1,43 @@
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+from Agents.Core.PrioritizedReplayMemory import PrioritizedReplayMemory
+from Agents.Core.MinibatchPrefetcher import MinibatchPrefetcher, PreparedMinibatch
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+import torch
+
+memory = ArrayReplayMemory(500)
+for i in range(64):
+    memory.push(Transition(np.random.rand(4), i % 3, np.random.rand(4), float(i)))
+
+def sample():
+    return memory.sample(32), {}
+
+def prepare(batch):
+    return torch.from_numpy(batch.state), torch.from_numpy(batch.reward)
+
+prefetcher = MinibatchPrefetcher(sample, prepare, depth=4)
+
+# the learner keeps pushing while minibatches are prepared in the background
+for step in range(1000):
+    with prefetcher.lock:
+        memory.push(Transition(np.random.rand(4), step % 3, None if step % 10 == 0 else np.random.rand(4), 1.0))
+    batch, info = prefetcher.get()
+    assert isinstance(batch, PreparedMinibatch)
+    assert batch[0].shape == (32, 4)
+thread = prefetcher.thread
+prefetcher.close()
+assert not thread.is_alive() and prefetcher.queue.empty()
+print(memory)
+
+# priority updates of experiences overwritten after sampling are discarded
+memory = PrioritizedReplayMemory(8, {})
+for i in range(8):
+    memory.store(i)
+data, b_idx, ISWeights = memory.sample(8)
+storeStep = memory.store_step(b_idx)
+memory.store(8)
+memory.store(9)
+memory.batch_update(b_idx, np.full((8, 1), 0.5), storeStep)
+for d, idx in zip(data, b_idx):
+    print(d, memory.tree.tree[idx])
+    assert (memory.tree.tree[idx] == 1.0) == (d < 2)
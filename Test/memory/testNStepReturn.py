@@ -0,0 +1,53 @@
+from Agents.Core.NStepReturn import NStepReturn, discounted_cumsum, lambda_returns
+from Agents.Core.ReplayMemoryReward import ReplayMemoryReward
+import numpy as np
+
+gamma = 0.9
+
+# discounted cumulative sum with episode ends against a python loop
+x = np.random.rand(1000)
+nonFinal = np.random.rand(1000) > 0.05
+y = np.zeros(1001)
+for t in reversed(range(1000)):
+    y[t] = x[t] + gamma * nonFinal[t] * y[t + 1]
+assert np.allclose(discounted_cumsum(x, gamma * nonFinal), y[:-1])
+
+# lambda returns against the recursive definition
+lamb = 0.7
+nextValue = np.random.rand(1000)
+G = np.zeros(1000)
+for t in reversed(range(1000)):
+    if not nonFinal[t]:
+        G[t] = x[t]
+    elif t == 999:
+        G[t] = x[t] + gamma * nextValue[t]
+    else:
+        G[t] = x[t] + gamma * ((1 - lamb) * nextValue[t] + lamb * G[t + 1])
+assert np.allclose(lambda_returns(x, nextValue, nonFinal, gamma, lamb), G)
+
+# n step returns of episodes, terminal rewards are backed up to the pending experiences
+nStep = 10
+engine = NStepReturn(nStep, gamma)
+for episodeLength in [3, 10, 11, 200]:
+    rewards = np.random.rand(episodeLength)
+    transitions = []
+    for t in range(episodeLength):
+        terminal = t == episodeLength - 1
+        transitions += engine.append(t, t % 4, None if terminal else t + 1, rewards[t])
+    assert [tr.state for tr in transitions] == list(range(episodeLength))
+    for tr in transitions:
+        t = tr.state
+        expected = sum(rewards[k] * gamma ** (k - t) for k in range(t, min(t + nStep, episodeLength)))
+        assert np.isclose(tr.reward, expected)
+        assert tr.next_state == (None if t + nStep >= episodeLength else t + nStep)
+    assert len(engine) == 0
+
+# reward memory backs up terminal rewards to the nStepBackup previous experiences
+memory = ReplayMemoryReward(100, 3, gamma)
+for t in range(6):
+    memory.push(t, 0, None if t == 5 else t + 1, 1.0)
+batch = memory.fetch_all()
+terminal = ~batch.nonFinalMask
+print(batch.state[terminal], batch.reward[terminal])
+assert sorted(batch.state[terminal]) == [2, 3, 4, 5]
+assert np.isclose(batch.reward[terminal].max(), 1 + gamma + gamma ** 2 + gamma ** 3)
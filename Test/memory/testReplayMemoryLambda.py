@@ -0,0 +1,41 @@
+from Agents.Core.ReplayMemoryLambda import ReplayMemoryLambda
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+
+gamma = 0.9
+lamb = 0.8
+config = {'gamma': gamma, 'eligibilityTraceLambda': lamb, 'eligibilityTracePartitionNum': 4,
+          'eligibilityTraceRefreshStep': 1}
+
+def value(nextState):
+    return nextState[:, 0] * 0.1
+
+memory = ReplayMemoryLambda(config, 200, value)
+
+# episodes end with a terminal experience every 9 steps or are truncated every 20 steps
+for i in range(500):
+    if i % 20 == 0:
+        memory.start_episode()
+    memory.push(Transition(np.array([i, 0.0]), i % 2, None if i % 9 == 8 else np.array([i + 1, 0.0]), float(i % 5)))
+
+for repeat in range(20):
+    batch = memory.sample(16)
+    start, end = memory.partitionRange
+    assert end - start <= 50
+
+    # lambda returns of the partition by the recursive definition
+    G = {}
+    for k in reversed(range(start, end)):
+        reward = float(k % 5)
+        if k % 9 == 8:
+            G[k] = reward
+        elif k == end - 1 or (k + 1) % 20 == 0:
+            G[k] = reward + gamma * (k + 1) * 0.1
+        else:
+            G[k] = reward + gamma * ((1 - lamb) * (k + 1) * 0.1 + lamb * G[k + 1])
+
+    steps = batch.state[:, 0].astype(np.int64)
+    assert ((steps >= start) & (steps < end)).all()
+    assert np.allclose(batch.reward, [G[k] for k in steps], atol=1e-4)
+
+print(memory, memory.partitionRange, batch.reward[:4])
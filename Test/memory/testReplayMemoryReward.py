@@ -0,0 +1,28 @@
+from Agents.Core.ReplayMemoryReward import ReplayMemoryReward
+from Agents.Core.ArrayReplayMemory import TransitionBatch
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+
+gamma = 0.9
+memory = ReplayMemoryReward(200, 2, gamma, terminalRatio=0.25)
+
+# episodes of 20 steps with reward 1 at the terminal step, the state is the step in the episode
+for i in range(1000):
+    step = i % 20
+    terminal = step == 19
+    state = np.array([step, 0.0], dtype=np.float32)
+    memory.push(Transition(state, step % 4, None if terminal else state + [1, 0], 1.0 if terminal else 0.0))
+
+print(memory)
+assert len(memory) == 200 and memory.terminalSize == 150
+
+batch = memory.sample(32)
+assert isinstance(batch, TransitionBatch) and batch.state.shape == (32, 2)
+terminal = ~batch.nonFinalMask
+# a quarter of the minibatch are terminal experiences with backed-up rewards
+assert terminal.sum() == 8
+expected = gamma ** (19 - batch.state[terminal, 0])
+assert np.allclose(batch.reward[terminal], expected)
+assert set(batch.state[terminal, 0]) <= {17, 18, 19}
+assert (batch.reward[~terminal] == 0).all()
+assert np.array_equal(batch.nonFinalNextState, batch.state[~terminal] + [1, 0])
@@ -0,0 +1,46 @@
+from Agents.Core.SequenceReplayMemory import SequenceReplayMemory
+from Agents.Core.ReplayMemory import Transition
+import numpy as np
+
+capacity = 40
+sequenceLength = 4
+memory = SequenceReplayMemory(capacity, sequenceLength)
+
+# episodes end with a terminal experience every 7 steps or are truncated every 13 steps,
+# the state is the write count and the episode counter
+experiences = []
+episode = 0
+for i in range(100):
+    if i % 13 == 10:
+        # episode truncated without a terminal experience
+        memory.start_episode()
+        episode += 1
+    terminal = i % 7 == 6
+    state = np.array([i, episode], dtype=np.float32)
+    memory.push(Transition(state, i % 3, None if terminal else state + [1, 0], float(i)))
+    experiences.append((i, episode))
+    if terminal:
+        episode += 1
+
+batch = memory.fetch_all()
+oldest = 100 - capacity
+nonFinal = 0
+for b, end in enumerate(range(oldest, 100)):
+    # the expected window contains earlier experiences of the same episode still in memory
+    window = [k for k in range(end - sequenceLength + 1, end + 1)
+              if k >= oldest and experiences[k][1] == experiences[end][1]]
+    padding = sequenceLength - len(window)
+    assert not batch.padMask[b, :padding].any() and batch.padMask[b, padding:].all()
+    assert (batch.state[b, :padding] == 0).all() and (batch.reward[b, :padding] == 0).all()
+    assert list(batch.state[b, padding:, 0]) == window, (end, batch.state[b])
+    assert list(batch.reward[b, padding:]) == window
+    if batch.nonFinalMask[b]:
+        # next sequence is shifted by one step
+        assert batch.nonFinalNextState[nonFinal, -1, 0] == end + 1
+        assert (batch.nonFinalNextState[nonFinal, :-1] == batch.state[b, 1:]).all()
+        assert (batch.nextPadMask[nonFinal, :-1] == batch.padMask[b, 1:]).all()
+        nonFinal += 1
+assert nonFinal == batch.nonFinalMask.sum() == len(batch.nonFinalNextState)
+
+batch = memory.sample(32)
+print(memory, batch.state.shape, batch.nonFinalNextState.shape, batch.padMask.sum(axis=1))
@@ -0,0 +1,50 @@
+from Agents.Core.SharedReplayMemory import SharedReplayMemory
+from Agents.Core.ReplayMemory import Transition
+import torch.multiprocessing as mp
+import numpy as np
+
+numWorkers = 4
+numPush = 5000
+
+def worker(memory, rank):
+    # every experience is consistent: state = [rank, i], next_state = state + 1, reward = rank * numPush + i
+    for i in range(numPush):
+        state = np.array([rank, i], dtype=np.float32)
+        memory.push(Transition(state, i % 3, None if i % 50 == 49 else state + 1, float(rank * numPush + i)))
+        if i % 10 == 0 and len(memory) >= 32:
+            check(memory.sample(32))
+
+def check(batch):
+    assert np.array_equal(batch.reward, batch.state[:, 0] * numPush + batch.state[:, 1])
+    assert np.array_equal(batch.action, batch.state[:, 1] % 3)
+    assert np.array_equal(batch.nonFinalNextState, batch.state[batch.nonFinalMask] + 1)
+
+if __name__ == '__main__':
+    memory = SharedReplayMemory(3000, 2)
+    processes = [mp.Process(target=worker, args=(memory, rank)) for rank in range(numWorkers)]
+    for p in processes:
+        p.start()
+    # the main process samples while workers push
+    while any(p.is_alive() for p in processes):
+        if len(memory) >= 32:
+            check(memory.sample(32))
+    for p in processes:
+        p.join()
+        assert p.exitcode == 0
+
+    # every write count was reserved by exactly one push
+    assert memory.cursor.value == numWorkers * numPush
+    stamps = np.sort(memory.stamp.numpy())
+    assert np.array_equal(stamps, np.arange(numWorkers * numPush - 3000, numWorkers * numPush))
+    print(memory)
+
+    # rows which stay incomplete are not returned
+    memory = SharedReplayMemory(4, 2, maxRetry=3)
+    for i in range(4):
+        memory.push(Transition(np.zeros(2), 0, np.ones(2), 0.0))
+    memory.stamp.fill_(-1)
+    try:
+        memory.sample(2)
+        raise AssertionError('torn rows were sampled')
+    except Exception as e:
+        assert 'maxRetry' in str(e)
@@ -0,0 +1,46 @@
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory
+from Agents.Core.ReplayMemory import Transition
+from Agents.Core.StateCodec import BitPackCodec, Float16Codec, AffineQuantizedCodec, make_codecs
+import numpy as np
+
+# dictionary states similar to the maze envs, the sensor is a binary obstacle map
+def randomState():
+    return {'sensor': (np.random.rand(1, 15, 15) > 0.7).astype(np.float64),
+            'target': np.random.rand(2) * 2 - 1}
+
+rawMemory = ArrayReplayMemory(100)
+codecMemory = ArrayReplayMemory(100, codecs={'sensor': BitPackCodec(), 'target': Float16Codec()})
+quantizedMemory = ArrayReplayMemory(100, codecs=make_codecs({'sensor': 'bitpack',
+                                                             'target': {'codec': 'affine', 'low': -1, 'high': 1}}))
+
+for i in range(100):
+    nextState = None if i % 10 == 9 else randomState()
+    transition = Transition(randomState(), i % 4, nextState, 0.0)
+    rawMemory.push(transition)
+    codecMemory.push(transition)
+    quantizedMemory.push(transition)
+
+for memory in [rawMemory, codecMemory, quantizedMemory]:
+    nbytes = sum(column.nbytes for column in memory.columns.values())
+    print('{} bytes'.format(nbytes))
+    for name, column in memory.columns.items():
+        print(name, column.shape, column.dtype)
+
+idx = np.arange(100)
+raw = rawMemory.gather(idx)
+coded = codecMemory.gather(idx)
+quantized = quantizedMemory.gather(idx)
+
+# binary grids are exact, target vectors are approximate
+assert np.array_equal(raw.state['sensor'], coded.state['sensor'])
+assert np.array_equal(raw.nonFinalNextState['sensor'], quantized.nonFinalNextState['sensor'])
+print(np.max(np.abs(raw.state['target'] - coded.state['target'])))
+print(np.max(np.abs(raw.state['target'] - quantized.state['target'])))
+assert np.allclose(raw.state['target'], coded.state['target'], atol=1e-3)
+assert np.allclose(raw.state['target'], quantized.state['target'], atol=1.0 / 255 + 1e-6)
+
+# array states with a single codec
+memory = ArrayReplayMemory(10, codecs=AffineQuantizedCodec(0.0, 1.0, bits=16))
+state = np.random.rand(4)
+memory.push(state, 0, None, 1.0)
+print(memory.gather(np.array([0])).state, state)
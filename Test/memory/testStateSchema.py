@@ -0,0 +1,42 @@
+from Agents.Core.ArrayReplayMemory import ArrayReplayMemory, state_to_tensor
+from Agents.Core.FrameReplayMemory import FrameReplayMemory
+from Agents.Core.ReplayMemory import Transition
+from Agents.Core.StateSchema import StateSchema
+import numpy as np
+import torch
+
+schema = StateSchema({'sensor': {'shape': [1, 15, 15], 'dtype': 'uint8', 'codec': 'bitpack'},
+                      'target': {'shape': [2]}})
+print(schema)
+
+# maze states also carry a time step, which is not declared and thus not stored
+def randomState(step):
+    return {'sensor': (np.random.rand(1, 15, 15) > 0.7).astype(np.float64),
+            'target': np.random.rand(2),
+            'timeStep': step}
+
+states = [randomState(i) for i in range(20)]
+nextStates = [None if i % 5 == 4 else randomState(i + 1) for i in range(20)]
+
+# collate as a stateProcessor, compared with the list comprehension used in the examples
+nonFinalState, nonFinalMask = schema.collate(nextStates)
+sensorList = [item['sensor'] for item in nextStates if item is not None]
+targetList = [item['target'] for item in nextStates if item is not None]
+assert torch.equal(nonFinalState['sensor'], torch.tensor(np.array(sensorList), dtype=torch.float32))
+assert torch.equal(nonFinalState['target'], torch.tensor(np.array(targetList), dtype=torch.float32))
+assert nonFinalMask.tolist() == [s is not None for s in nextStates]
+assert set(nonFinalState.keys()) == {'sensor', 'target'}
+
+for memory in [ArrayReplayMemory(20, schema=schema), FrameReplayMemory(20, schema=schema)]:
+    for i in range(20):
+        memory.push(Transition(states[i], i % 4, nextStates[i], float(i)))
+    for name, column in memory.columns.items():
+        print(name, column.shape, column.dtype)
+    assert 'state.timeStep' not in memory.columns
+
+    batch = memory.fetch_all()
+    assert np.array_equal(batch.nonFinalMask, nonFinalMask.numpy())
+    nextStateTensor = state_to_tensor(batch.nonFinalNextState, 'cpu')
+    for key in schema.keys:
+        assert torch.equal(nextStateTensor[key], nonFinalState[key]), key
+print('done')
@@ -0,0 +1,107 @@
+from Agents.Core.SharedVecEnv import SharedVecEnv, unbatch_observations
+from Env.CustomEnv.StablizerOneD import StablizerOneD
+import multiprocessing
+import numpy as np
+import time
+
+
+class VoxelEnv(object):
+    # dictionary observations with a 3D voxel sensor, episodes end after 5 steps
+    def __init__(self, seed):
+        self.seed = seed
+        self.stepCount = 0
+
+    def observation(self):
+        return {'sensor': np.full((1, 32, 32, 32), self.stepCount, dtype=np.uint8),
+                'target': np.array([self.seed, self.stepCount, 0.0], dtype=np.float32)}
+
+    def reset(self):
+        self.stepCount = 0
+        return self.observation()
+
+    def step(self, action):
+        self.stepCount += 1
+        return self.observation(), float(action), self.stepCount == 5, {'stepCount': self.stepCount}
+
+
+def make_env(seed):
+    def _thunk():
+        return VoxelEnv(seed)
+    return _thunk
+
+
+def pipe_worker(remote, seed):
+    env = VoxelEnv(seed)
+    while True:
+        action = remote.recv()
+        if action is None:
+            break
+        observation, reward, done, info = env.step(action)
+        if done:
+            observation = env.reset()
+        remote.send((observation, reward, done, info))
+
+
+if __name__ == '__main__':
+    numEnvs = 4
+
+    # array observations of the Stabilizer
+    envs = SharedVecEnv([lambda i=i: StablizerOneD(None, i) for i in range(numEnvs)])
+    states = envs.reset()
+    assert states.shape == (numEnvs, 1)
+    for _ in range(20):
+        states, rewards, dones, infos = envs.step(np.random.randint(0, 3, numEnvs))
+        assert states.shape == (numEnvs, 1) and rewards.shape == (numEnvs,) and dones.shape == (numEnvs,)
+        for i in np.where(dones)[0]:
+            # finished environments are reset, the terminal observation is kept
+            assert states[i, 0] == 0.514
+            assert infos[i]['terminal_observation'].shape == (1,)
+    assert len(unbatch_observations(states)) == numEnvs
+    assert envs.env_method('step_count') == [info['stepCount'] for info in infos]
+    envs.close()
+
+    # dictionary observations with auto reset
+    envs = SharedVecEnv([make_env(i) for i in range(numEnvs)])
+    observations = envs.reset()
+    assert observations['sensor'].shape == (numEnvs, 1, 32, 32, 32) and observations['sensor'].dtype == np.uint8
+    assert np.all(observations['target'][:, 0] == np.arange(numEnvs))
+    for step in range(1, 11):
+        observations, rewards, dones, infos = envs.step(np.arange(numEnvs))
+        assert np.all(rewards == np.arange(numEnvs))
+        if step % 5 == 0:
+            assert np.all(dones)
+            assert np.all(observations['sensor'] == 0)
+            for i in range(numEnvs):
+                assert np.all(infos[i]['terminal_observation']['sensor'] == 5)
+                assert infos[i]['terminal_observation']['target'][0] == i
+        else:
+            assert not np.any(dones)
+            assert np.all(observations['sensor'] == step % 5)
+    assert len(unbatch_observations(observations)) == numEnvs
+
+    # steps per second against sending observations through pipes
+    nStep = 500
+    start = time.time()
+    for _ in range(nStep):
+        envs.step(np.zeros(numEnvs))
+    sharedTime = time.time() - start
+    envs.close()
+
+    remotes, workRemotes = zip(*[multiprocessing.Pipe() for _ in range(numEnvs)])
+    processes = [multiprocessing.Process(target=pipe_worker, args=(workRemote, i), daemon=True)
+                 for i, workRemote in enumerate(workRemotes)]
+    for process in processes:
+        process.start()
+    start = time.time()
+    for _ in range(nStep):
+        for remote in remotes:
+            remote.send(0)
+        results = [remote.recv() for remote in remotes]
+        observations = {key: np.stack([result[0][key] for result in results]) for key in results[0][0]}
+    pipeTime = time.time() - start
+    for remote in remotes:
+        remote.send(None)
+    for process in processes:
+        process.join()
+    print('voxel observations, shared memory {:.0f} steps/s, pipes {:.0f} steps/s'.format(nStep / sharedTime,
+                                                                                          nStep / pipeTime))
@@ -0,0 +1,57 @@
+from Agents.DQN.DQN import DQNAgent
+from Agents.Core.MLPNet import MultiLayerNetRegression
+from Env.CustomEnv.StablizerOneD import StablizerOneD
+from copy import deepcopy
+from torch import optim
+import contextlib
+import io
+import time
+import torch
+
+# wall clock time of DQN training on the Stabilizer example, serial against actor learner training
+# (numActorThreads), for an environment whose step costs about as much as a gradient update.
+# The step sleeps like a C++ simulator which releases the GIL.
+
+torch.manual_seed(1)
+
+stepTime = 0.001
+
+
+class SlowStabilizer(StablizerOneD):
+    def step(self, action):
+        time.sleep(stepTime)
+        nextState, reward, done, info = super(SlowStabilizer, self).step(action)
+        # episodes have a fixed length
+        return nextState, reward, False, info
+
+
+config = dict()
+config['trainStep'] = 20
+config['episodeLength'] = 100
+config['epsThreshold'] = 0.1
+config['targetNetUpdateStep'] = 100
+config['memoryCapacity'] = 2000
+config['trainBatchSize'] = 32
+config['gamma'] = 0.9
+config['netGradClip'] = 1
+config['logFlag'] = False
+config['netUpdateOption'] = 'doubleQ'
+config['dataLogFolder'] = 'Log/'
+
+policyNet = MultiLayerNetRegression(1, [100], 3)
+
+for numActorThreads in [0, 1, 2]:
+    agentConfig = dict(config, numActorThreads=numActorThreads)
+    net = deepcopy(policyNet)
+    agent = DQNAgent(agentConfig, net, deepcopy(net), SlowStabilizer(), optim.Adam(net.parameters(), lr=1e-3),
+                     torch.nn.MSELoss(reduction='none'), 3)
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent.train()
+    elapsed = time.time() - start
+
+    # every environment step is learned from once, as in serial training
+    assert agent.epIdx == config['trainStep']
+    assert agent.learnStepCounter == agent.globalStepCount - config['trainBatchSize'] + 1
+    print('numActorThreads {}: {} steps, {} updates, {:.0f} steps/s'.format(
+        numActorThreads, agent.globalStepCount, agent.learnStepCounter, agent.globalStepCount / elapsed))
@@ -0,0 +1,136 @@
+from Agents.DQN.DQN import DQNAgent
+from Agents.DDPG.DDPG import DDPGAgent
+from Agents.Core.MLPNet import MultiLayerNetRegression
+from Agents.Core.ReplayMemory import Transition
+from Env.CustomEnv.StablizerOneD import StablizerOneD, StablizerOneDContinuous
+from copy import deepcopy
+from torch import optim
+import numpy as np
+import time
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+# updates per second of the learner step of DQN and DDPG agents on the Stabilizer examples,
+# eager against the compiled losses (compileMode compile and trace)
+
+torch.manual_seed(1)
+np.random.seed(1)
+
+nUpdate = 2000
+config = dict()
+config['trainStep'] = 1
+config['targetNetUpdateStep'] = 100
+config['memoryCapacity'] = 2000
+config['trainBatchSize'] = 32
+config['gamma'] = 0.9
+config['tau'] = 0.01
+config['netGradClip'] = 1
+config['logFlag'] = False
+config['netUpdateOption'] = 'doubleQ'
+config['memoryOption'] = 'array'
+config['dataLogFolder'] = 'Log/'
+
+
+class Critic(nn.Module):
+    def __init__(self, input_size, hidden_size):
+        super(Critic, self).__init__()
+        self.linear1 = nn.Linear(input_size, hidden_size)
+        self.linear2 = nn.Linear(hidden_size, hidden_size)
+        self.linear3 = nn.Linear(hidden_size, 1)
+
+    def forward(self, state, action):
+        x = torch.cat([state, action], 1)
+        x = F.relu(self.linear1(x))
+        x = F.relu(self.linear2(x))
+        return self.linear3(x)
+
+
+class Actor(nn.Module):
+    def __init__(self, input_size, hidden_size, output_size):
+        super(Actor, self).__init__()
+        self.linear1 = nn.Linear(input_size, hidden_size)
+        self.linear2 = nn.Linear(hidden_size, hidden_size)
+        self.linear3 = nn.Linear(hidden_size, output_size)
+
+    def forward(self, state):
+        x = F.relu(self.linear1(state))
+        x = F.relu(self.linear2(x))
+        return torch.tanh(self.linear3(x))
+
+
+def fill(memory, discrete):
+    for i in range(config['memoryCapacity']):
+        state = np.random.uniform(-1, 1, 1)
+        action = np.random.randint(3) if discrete else np.random.uniform(-1, 1, 1)
+        # about one in ten experiences is terminal
+        nextState = None if np.random.rand() < 0.1 else np.random.uniform(-1, 1, 1)
+        memory.push(Transition(state, action, nextState, np.random.rand()))
+
+
+def dqn_agent(policyNet, compileMode):
+    agentConfig = dict(config, compileMode=compileMode)
+    policyNet = deepcopy(policyNet)
+    agent = DQNAgent(agentConfig, policyNet, deepcopy(policyNet), StablizerOneD(),
+                     optim.Adam(policyNet.parameters(), lr=1e-3), torch.nn.MSELoss(reduction='none'), 3)
+    fill(agent.memory, True)
+    return agent
+
+
+def ddpg_agent(actor, critic, compileMode):
+    agentConfig = dict(config, compileMode=compileMode)
+    actor, critic = deepcopy(actor), deepcopy(critic)
+    agent = DDPGAgent(agentConfig, {'actor': actor, 'target': deepcopy(actor)},
+                      {'critic': critic, 'target': deepcopy(critic)}, StablizerOneDContinuous(),
+                      {'actor': optim.Adam(actor.parameters(), lr=1e-3),
+                       'critic': optim.Adam(critic.parameters(), lr=1e-3)}, torch.nn.MSELoss(), 1)
+    fill(agent.memory, False)
+    return agent
+
+
+def dqn_update(agent, batch):
+    agent.update_net_on_transitions(batch, agent.netLossFunc, 1, updateOption=agent.netUpdateOption,
+                                    netGradClip=agent.netGradClip, info={})
+
+
+def ddpg_update(agent, batch):
+    agent.update_net_on_transitions(batch)
+    agent.copy_nets()
+    agent.learnStepCounter += 1
+
+
+policyNet = MultiLayerNetRegression(1, [100], 3)
+actor, critic = Actor(1, 100, 1), Critic(2, 100)
+makeAgents = {'DQN': (lambda mode: dqn_agent(policyNet, mode), dqn_update),
+              'DDPG': (lambda mode: ddpg_agent(actor, critic, mode), ddpg_update)}
+
+for name, (makeAgent, update) in makeAgents.items():
+    agents = {mode: makeAgent(mode) for mode in ['eager', 'compile', 'trace']}
+    batches = [agents['eager'].memory.sample(config['trainBatchSize']) for _ in range(20)]
+
+    # the compiled learner steps follow the eager one, building the graphs is not timed
+    for i in range(10):
+        for agent in agents.values():
+            update(agent, batches[i])
+    for mode in ['compile', 'trace']:
+        nets = [agents[mode].policyNet] if name == 'DQN' else [agents[mode].actorNet, agents[mode].criticNet]
+        eagerNets = [agents['eager'].policyNet] if name == 'DQN' else [agents['eager'].actorNet,
+                                                                        agents['eager'].criticNet]
+        for net, eagerNet in zip(nets, eagerNets):
+            for p, eagerP in zip(net.parameters(), eagerNet.parameters()):
+                assert torch.allclose(p, eagerP, atol=1e-4), mode
+
+    # minibatches of another size run eagerly
+    for agent in agents.values():
+        update(agent, agents['eager'].memory.sample(config['trainBatchSize'] // 2))
+
+    # modes take turns to even out load changes of the machine
+    elapsed = {mode: 0.0 for mode in agents}
+    for round in range(10):
+        for mode, agent in agents.items():
+            start = time.time()
+            for i in range(nUpdate // 10):
+                update(agent, batches[i % len(batches)])
+            elapsed[mode] += time.time() - start
+    for mode in agents:
+        print('{} {}: {:.0f} updates/s'.format(name, mode, nUpdate / elapsed[mode]))
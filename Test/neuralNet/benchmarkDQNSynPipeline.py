@@ -0,0 +1,62 @@
+from Agents.DQN.DQNSyn import DQNSynAgent
+from Agents.Core.MLPNet import MultiLayerNetRegression
+from Agents.Core.SharedVecEnv import SharedVecEnv
+from Env.CustomEnv.StablizerOneD import StablizerOneD
+from copy import deepcopy
+from torch import optim
+import contextlib
+import io
+import time
+import torch
+
+# wall clock time of DQNSynAgent training on the Stabilizer example, stepping and learning in turn (policyLag 0)
+# against pipelined stepping (policyLag 1), for environments whose step costs about as much as the gradient updates
+# of a step. The step sleeps like a simulator waiting for its engine.
+
+torch.manual_seed(1)
+
+stepTime = 0.005
+
+
+class SlowStabilizer(StablizerOneD):
+    def step(self, action):
+        time.sleep(stepTime)
+        return super(SlowStabilizer, self).step(action)
+
+
+config = dict()
+config['trainStep'] = 300
+config['epsThreshold'] = 0.1
+config['targetNetUpdateStep'] = 100
+config['memoryCapacity'] = 2000
+config['trainBatchSize'] = 32
+config['gamma'] = 0.9
+config['netGradClip'] = 1
+config['logFlag'] = False
+config['netUpdateOption'] = 'doubleQ'
+config['netUpdateStep'] = 5
+config['numWorkers'] = 4
+config['dataLogFolder'] = 'Log/'
+
+if __name__ == '__main__':
+    envs = SharedVecEnv([lambda i=i: SlowStabilizer(None, i) for i in range(config['numWorkers'])])
+    policyNet = MultiLayerNetRegression(1, [100], 3)
+
+    for policyLag in [0, 1]:
+        agentConfig = dict(config, policyLag=policyLag)
+        net = deepcopy(policyNet)
+        agent = DQNSynAgent(agentConfig, net, deepcopy(net), envs, optim.Adam(net.parameters(), lr=1e-3),
+                            torch.nn.MSELoss(reduction='none'), 3)
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.train()
+        elapsed = time.time() - start
+
+        # every step of every environment is stored, updates follow the same schedule in both modes
+        assert agent.globalStepCount == config['trainStep'] * config['numWorkers']
+        assert len(agent.memory) == agent.globalStepCount
+        readyStep = config['trainBatchSize'] // config['numWorkers']
+        assert agent.learnStepCounter == (config['trainStep'] - readyStep + 1) * config['netUpdateStep']
+        print('policyLag {}: {} episodes, {} updates, {:.0f} steps/s'.format(
+            policyLag, agent.epIdx, agent.learnStepCounter, agent.globalStepCount / elapsed))
+    envs.close()
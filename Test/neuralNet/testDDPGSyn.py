@@ -0,0 +1,164 @@
+from Agents.DDPG.DDPGSyn import DDPGSynAgent
+from Agents.TDDDPG.TDDDPGSyn import TDDDPGSynAgent
+from Agents.SAC.SACSyn import SACSynAgent
+from Agents.Core.SharedVecEnv import SharedVecEnv
+from Env.CustomEnv.StablizerOneD import StablizerOneDContinuous
+from Env.CustomEnv.StablizerMultiD import StablizerMultiDContinuous
+from copy import deepcopy
+from torch import optim
+from torch.distributions import Normal
+import contextlib
+import io
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+# DDPG, TD3 and SAC agents training on the continuous Stabilizer with four synchronized environments
+
+torch.manual_seed(1)
+
+
+class Critic(nn.Module):
+    def __init__(self, input_size, hidden_size):
+        super(Critic, self).__init__()
+        self.linear1 = nn.Linear(input_size, hidden_size)
+        self.linear2 = nn.Linear(hidden_size, 1)
+
+    def forward(self, state, action=None):
+        x = state if action is None else torch.cat([state, action], 1)
+        return self.linear2(F.relu(self.linear1(x)))
+
+
+class Actor(nn.Module):
+    def __init__(self, input_size, hidden_size, output_size):
+        super(Actor, self).__init__()
+        self.linear1 = nn.Linear(input_size, hidden_size)
+        self.linear2 = nn.Linear(hidden_size, output_size)
+
+    def forward(self, state):
+        return torch.tanh(self.linear2(F.relu(self.linear1(state))))
+
+    def select_action(self, state, noiseFlag=False):
+        return self.forward(state)
+
+
+class GaussianPolicy(nn.Module):
+    def __init__(self, input_size, hidden_size, output_size):
+        super(GaussianPolicy, self).__init__()
+        self.linear1 = nn.Linear(input_size, hidden_size)
+        self.mean_linear = nn.Linear(hidden_size, output_size)
+        self.log_std_linear = nn.Linear(hidden_size, output_size)
+
+    def forward(self, state):
+        x = F.relu(self.linear1(state))
+        return self.mean_linear(x), torch.clamp(self.log_std_linear(x), -20, 1)
+
+    def select_action(self, state, noiseFlag=True, probFlag=False):
+        mean, log_std = self.forward(state)
+        if not noiseFlag:
+            return torch.tanh(mean)
+        normal = Normal(mean, log_std.exp())
+        x_t = normal.rsample()
+        action = torch.tanh(x_t)
+        if not probFlag:
+            return action
+        log_prob = normal.log_prob(x_t) - torch.log(1 - action.pow(2) + 1e-6)
+        return action, log_prob.sum(1, keepdim=True)
+
+
+numWorkers = 4
+config = dict()
+config['trainStep'] = 20
+config['episodeLength'] = 50
+config['numWorkers'] = numWorkers
+config['memoryCapacity'] = 5000
+config['trainBatchSize'] = 32
+config['gamma'] = 0.9
+config['tau'] = 0.01
+config['netGradClip'] = 1
+config['logFlag'] = False
+config['dataLogFolder'] = 'Log/'
+
+
+def ddpg_agent(envs, agentConfig):
+    actor, critic = Actor(1, 32, 1), Critic(2, 32)
+    return DDPGSynAgent(agentConfig, {'actor': actor, 'target': deepcopy(actor)},
+                        {'critic': critic, 'target': deepcopy(critic)}, envs,
+                        {'actor': optim.Adam(actor.parameters(), lr=1e-3),
+                         'critic': optim.Adam(critic.parameters(), lr=1e-3)}, torch.nn.MSELoss(), 1)
+
+
+def td3_agent(envs, agentConfig):
+    actor, criticOne, criticTwo = Actor(1, 32, 1), Critic(2, 32), Critic(2, 32)
+    return TDDDPGSynAgent(agentConfig, {'actor': actor, 'target': deepcopy(actor)},
+                          {'criticOne': criticOne, 'criticTwo': criticTwo, 'targetOne': deepcopy(criticOne),
+                           'targetTwo': deepcopy(criticTwo)}, envs,
+                          {'actor': optim.Adam(actor.parameters(), lr=1e-3),
+                           'criticOne': optim.Adam(criticOne.parameters(), lr=1e-3),
+                           'criticTwo': optim.Adam(criticTwo.parameters(), lr=1e-3)}, torch.nn.MSELoss(), 1)
+
+
+def sac_agent(envs, agentConfig):
+    actor, softQOne, softQTwo, value = GaussianPolicy(1, 32, 1), Critic(2, 32), Critic(2, 32), Critic(1, 32)
+    return SACSynAgent(agentConfig, {'actor': actor},
+                       {'softQOne': softQOne, 'softQTwo': softQTwo, 'value': value, 'valueTarget': deepcopy(value)},
+                       envs, {'actor': optim.Adam(actor.parameters(), lr=1e-3),
+                              'softQOne': optim.Adam(softQOne.parameters(), lr=1e-3),
+                              'softQTwo': optim.Adam(softQTwo.parameters(), lr=1e-3),
+                              'value': optim.Adam(value.parameters(), lr=1e-3)}, torch.nn.MSELoss(), 1)
+
+
+if __name__ == '__main__':
+    envs = SharedVecEnv([lambda i=i: StablizerOneDContinuous(None, i) for i in range(numWorkers)])
+
+    for makeAgent, memoryOption in [(ddpg_agent, 'natural'), (td3_agent, 'array'), (sac_agent, 'array')]:
+        agent = makeAgent(envs, dict(config, memoryOption=memoryOption))
+
+        # actions of all environments in one forward pass, with independent noise for each environment
+        states = np.zeros((numWorkers, 1))
+        actions = agent.select_action(agent.actorNet, states, noiseFlag=True)
+        assert actions.shape == (numWorkers, 1) and np.all(np.abs(actions) <= 1)
+        assert len(np.unique(actions)) == numWorkers
+        greedy = agent.select_action(agent.actorNet, states, noiseFlag=False)
+        assert len(np.unique(greedy)) == 1
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            agent.train()
+
+        # every step of every environment is stored and learned from once the memory is ready
+        assert agent.epIdx >= config['trainStep']
+        assert len(agent.memory) == agent.globalStepCount
+        assert agent.learnStepCounter == agent.globalStepCount - numWorkers * (config['trainBatchSize'] // numWorkers - 1)
+        # episodes are truncated at episodeLength
+        assert all(reward[1] < config['episodeLength'] for reward in agent.rewards)
+        print('{}: {} episodes, {} steps, {} updates'.format(type(agent).__name__, agent.epIdx,
+                                                             agent.globalStepCount, agent.learnStepCounter))
+    envs.close()
+
+    # hindsight experiences are relabeled by the environment of the worker which produced the experience
+    envs = SharedVecEnv([lambda i=i: StablizerMultiDContinuous({'Dim': 1}, i) for i in range(numWorkers)])
+    agent = ddpg_agent(envs, dict(config, trainStep=8, hindSightER=True, hindSightERFreq=1))
+    observations = envs.reset()
+    nextObservations, _, dones, infos = envs.step(np.zeros((numWorkers, 1)))
+    # workers whose episodes are done are reset already, hindsight experiences are of non-terminal experiences
+    for i in np.where(~dones)[0]:
+        stateNew = agent.workerEnvs[i].getHindSightExperience(observations[i], np.zeros(1), nextObservations[i],
+                                                              infos[i])[0]
+        # the relabeled state is the movement of the step, observations are the negated states
+        assert np.allclose(stateNew, -nextObservations[i] - infos[i]['initial state'])
+    # exceptions of environment methods are raised in the main process
+    envs.reset()
+    try:
+        agent.workerEnvs[0].getHindSightExperience(observations[0], np.zeros(1), None, {})
+        raise AssertionError('the worker did not raise')
+    except KeyError:
+        pass
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent.train()
+    # every non-terminal experience is stored with a terminal hindsight experience
+    terminals = sum(1 for transition in agent.memory.memory if transition.next_state is None)
+    assert len(agent.memory) > agent.globalStepCount and terminals == agent.globalStepCount
+    print('{} with hindsight experience replay: {} episodes, {} steps, {} experiences'.format(
+        type(agent).__name__, agent.epIdx, agent.globalStepCount, len(agent.memory)))
+    envs.close()
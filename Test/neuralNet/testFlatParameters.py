@@ -0,0 +1,107 @@
+from Agents.Core.FlatParameters import FlatParameters, flat_parameters, flatten_parameters, sync_net
+from Agents.Core.MLPNet import MultiLayerNetRegression
+from Agents.Core.DuelingNet import DuelingMLP
+from Agents.Core.SoftUpdate import SoftUpdate
+from copy import deepcopy
+import io
+import pickle
+import time
+import torch
+import torch.multiprocessing as mp
+
+
+class CNN(torch.nn.Module):
+    def __init__(self):
+        super(CNN, self).__init__()
+        self.conv = torch.nn.Conv2d(1, 4, 3)
+        self.norm = torch.nn.BatchNorm2d(4)
+        self.fc = torch.nn.Linear(4 * 6 * 6, 3)
+
+    def forward(self, x):
+        return self.fc(torch.relu(self.norm(self.conv(x))).view(x.shape[0], -1))
+
+
+def train(policyNet, targetNet, inputs, softUpdate):
+    optimizer = torch.optim.Adam(policyNet.parameters(), lr=1e-2)
+    for step, x in enumerate(inputs):
+        loss = torch.mean((policyNet(x) - targetNet(x).detach() - 1.0) ** 2)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        if step % 3 == 0:
+            sync_net(targetNet, policyNet)
+        else:
+            softUpdate()
+
+
+def saved(net):
+    buffer = io.BytesIO()
+    torch.save(net, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def fill(net):
+    with torch.no_grad():
+        flat_parameters(net).flat.fill_(1.0)
+
+
+if __name__ == '__main__':
+    torch.manual_seed(1)
+    for makeNet, shape in [(lambda: MultiLayerNetRegression(4, [16, 16], 2), (8, 4)),
+                           (lambda: DuelingMLP(4, [16], 2, 8), (8, 4)),
+                           (lambda: CNN(), (8, 1, 8, 8))]:
+        policyNet = makeNet()
+        targetNet = makeNet()
+        inputs = [torch.randn(shape) for _ in range(10)]
+
+        flatPolicyNet = deepcopy(policyNet)
+        flatTargetNet = deepcopy(targetNet)
+        FlatParameters(flatPolicyNet)
+        flatten_parameters(flatTargetNet)
+
+        train(policyNet, targetNet, inputs, SoftUpdate([(targetNet, policyNet)], 0.1))
+        train(flatPolicyNet, flatTargetNet, inputs, SoftUpdate([(flatTargetNet, flatPolicyNet)], 0.1))
+
+        assert flat_parameters(flatPolicyNet) is not None and flat_parameters(flatTargetNet) is not None
+        for net, flatNet in [(policyNet, flatPolicyNet), (targetNet, flatTargetNet)]:
+            for (name, tensor), (flatName, flatTensor) in zip(net.state_dict().items(),
+                                                              flatNet.state_dict().items()):
+                assert name == flatName
+                assert torch.allclose(tensor.float(), flatTensor.float(), atol=1e-5), name
+
+        # copies are flattened again
+        copyNet = deepcopy(flatPolicyNet)
+        assert flat_parameters(copyNet) is not None
+        assert flat_parameters(copyNet).flat.data_ptr() != flat_parameters(flatPolicyNet).flat.data_ptr()
+
+        # pickled networks are flattened again
+        loadedNets = [pickle.loads(pickle.dumps(flatPolicyNet)), torch.load(saved(flatPolicyNet), weights_only=False)]
+        for loadedNet in loadedNets:
+            assert flat_parameters(loadedNet) is not None
+            for tensor, loadedTensor in zip(flatPolicyNet.state_dict().values(), loadedNet.state_dict().values()):
+                assert torch.equal(tensor, loadedTensor)
+
+    # the shared flat tensor is written by another process without copies
+    net = MultiLayerNetRegression(4, [16, 16], 2)
+    flatten_parameters(net).share_memory_()
+    process = mp.Process(target=fill, args=(net,))
+    process.start()
+    process.join()
+    assert all(torch.all(p == 1.0) for p in net.parameters())
+
+    # timing of target syncs
+    policyNet = MultiLayerNetRegression(64, [256, 256, 256], 8)
+    targetNet = deepcopy(policyNet)
+    repeat = 2000
+    start = time.time()
+    for _ in range(repeat):
+        targetNet.load_state_dict(policyNet.state_dict())
+    stateDictTime = time.time() - start
+    flatten_parameters(policyNet)
+    flatten_parameters(targetNet)
+    start = time.time()
+    for _ in range(repeat):
+        sync_net(targetNet, policyNet)
+    flatTime = time.time() - start
+    print('state_dict {:.2f} us, flat {:.2f} us per sync'.format(stateDictTime / repeat * 1e6, flatTime / repeat * 1e6))
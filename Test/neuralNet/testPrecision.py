@@ -0,0 +1,54 @@
+from Agents.Core.Precision import autocast_context
+from Agents.Core.TDTarget import TDTarget
+import time
+import torch
+
+torch.manual_seed(1)
+
+
+class CNN(torch.nn.Module):
+    def __init__(self):
+        super(CNN, self).__init__()
+        self.conv1 = torch.nn.Conv2d(1, 32, 3, padding=1)
+        self.conv2 = torch.nn.Conv2d(32, 32, 3, padding=1)
+        self.fc = torch.nn.Linear(32 * 21 * 21, 4)
+
+    def forward(self, x):
+        x = torch.relu(self.conv2(torch.relu(self.conv1(x))))
+        return self.fc(x.view(x.shape[0], -1))
+
+
+policyNet = CNN()
+targetNet = CNN()
+batchSize = 64
+state = torch.rand(batchSize, 1, 21, 21)
+action = torch.randint(4, (batchSize, 1))
+reward = torch.randn(batchSize, 1)
+nonFinalMask = torch.rand(batchSize) > 0.2
+nonFinalNextState = torch.rand(int(nonFinalMask.sum()), 1, 21, 21)
+
+results = {}
+for precision in ['fp32', 'bf16']:
+    policyNet.zero_grad()
+    with autocast_context(precision):
+        QValues, targetValues = TDTarget().compute('doubleQ', policyNet, targetNet, state, action, reward,
+                                                   nonFinalNextState, nonFinalMask, 0.9)
+    # losses and priority errors are fp32
+    assert QValues.dtype == torch.float32 and targetValues.dtype == torch.float32
+    loss = torch.mean((QValues - targetValues) ** 2)
+    loss.backward()
+    (QValues - targetValues).data.numpy()
+    # master weights and gradients stay fp32
+    assert all(p.dtype == torch.float32 and p.grad.dtype == torch.float32 for p in policyNet.parameters())
+    results[precision] = loss.item()
+
+assert abs(results['fp32'] - results['bf16']) < 0.05 * abs(results['fp32']) + 1e-3
+
+# throughput of training forward and backward passes
+for precision in ['fp32', 'bf16']:
+    start = time.time()
+    for _ in range(20):
+        with autocast_context(precision):
+            out = policyNet(state).float()
+        out.mean().backward()
+    print('{} {:.2f} ms per step'.format(precision, (time.time() - start) / 20 * 1e3))
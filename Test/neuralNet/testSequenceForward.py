@@ -0,0 +1,42 @@
+from Agents.DRQN.DRQN import sequence_forward
+from Agents.Core.SequenceReplayMemory import SequenceReplayMemory
+from Agents.Core.ReplayMemory import Transition
+from Agents.Core.MLPNet import MultiLayerNetRegressionWithGRU, SingleGRULayerNetRegression
+import numpy as np
+import torch
+
+torch.manual_seed(1)
+sequenceLength = 5
+
+# episodes of 3 to 8 steps, sequences at the start of episodes are padded
+memory = SequenceReplayMemory(200, sequenceLength)
+for episode in range(30):
+    episodeLength = np.random.randint(3, 9)
+    for step in range(episodeLength):
+        state = np.random.randn(2).astype(np.float32)
+        memory.push(Transition(state, 0, None if step == episodeLength - 1 else state + 1, 0.0))
+batch = memory.fetch_all()
+assert not batch.padMask.all()
+state = torch.from_numpy(batch.state)
+padMask = torch.from_numpy(batch.padMask)
+
+for net in [SingleGRULayerNetRegression(2, 3, 16), MultiLayerNetRegressionWithGRU(2, [8], 3, 16)]:
+    with torch.no_grad():
+        QValues = sequence_forward(net, state, padMask)
+        assert QValues.shape == (len(state), 3)
+        for b in range(len(state)):
+            # the Q values of a padded window are those of the same sequence without padding
+            suffix = state[b, ~padMask[b]].shape[0]
+            expected = net(state[b:b + 1, suffix:]).view(-1)
+            assert torch.allclose(QValues[b], expected, atol=1e-6)
+
+    # gradients flow to the outputs of every group of sequence lengths
+    net.zero_grad()
+    sequence_forward(net, state, padMask).sum().backward()
+    assert all(p.grad is not None for p in net.parameters())
+# zero padded steps change the recurrent state of nets with biases
+net = SingleGRULayerNetRegression(2, 3, 16)
+padded = torch.nonzero(~padMask.all(1))[0, 0]
+with torch.no_grad():
+    assert not torch.allclose(net(state[padded:padded + 1]).view(-1), sequence_forward(net, state, padMask)[padded])
+print('sequence forward tests passed')
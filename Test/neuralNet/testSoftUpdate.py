@@ -0,0 +1,42 @@
+from Agents.Core.SoftUpdate import SoftUpdate
+from copy import deepcopy
+import time
+import torch
+
+torch.manual_seed(1)
+tau = 0.01
+
+def make_net():
+    return torch.nn.Sequential(torch.nn.Linear(8, 64), torch.nn.ReLU(), torch.nn.Linear(64, 64), torch.nn.ReLU(),
+                               torch.nn.Linear(64, 1))
+
+nets = [make_net() for _ in range(3)]
+targetNets = [make_net() for _ in range(3)]
+refNets = deepcopy(targetNets)
+
+softUpdate = SoftUpdate(list(zip(targetNets, nets)) + [(None, make_net())], tau)
+for step in range(5):
+    softUpdate()
+    for refNet, net in zip(refNets, nets):
+        for target_param, param in zip(refNet.parameters(), net.parameters()):
+            target_param.data.copy_(param.data * tau + target_param.data * (1.0 - tau))
+
+for refNet, targetNet in zip(refNets, targetNets):
+    for refParam, targetParam in zip(refNet.parameters(), targetNet.parameters()):
+        assert torch.allclose(refParam, targetParam, atol=1e-6)
+        assert not targetParam.requires_grad or targetParam.grad is None
+
+# timing against the python loop over parameters
+repeat = 2000
+start = time.time()
+for _ in range(repeat):
+    for refNet, net in zip(refNets, nets):
+        for target_param, param in zip(refNet.parameters(), net.parameters()):
+            target_param.data.copy_(param.data * tau + target_param.data * (1.0 - tau))
+loopTime = time.time() - start
+
+start = time.time()
+for _ in range(repeat):
+    softUpdate()
+fusedTime = time.time() - start
+print('loop {:.2f} us, fused {:.2f} us per update'.format(loopTime / repeat * 1e6, fusedTime / repeat * 1e6))
@@ -0,0 +1,66 @@
+from Agents.Core.TDTarget import TDTarget
+import torch
+
+torch.manual_seed(1)
+gamma = 0.9
+batchSize = 32
+
+policyNet = torch.nn.Sequential(torch.nn.Linear(4, 16), torch.nn.ReLU(), torch.nn.Linear(16, 3))
+targetNet = torch.nn.Sequential(torch.nn.Linear(4, 16), torch.nn.ReLU(), torch.nn.Linear(16, 3))
+
+state = torch.randn(batchSize, 4)
+action = torch.randint(3, (batchSize, 1))
+reward = torch.randn(batchSize, 1)
+nonFinalMask = torch.rand(batchSize) > 0.3
+nonFinalNextState = torch.randn(int(nonFinalMask.sum()), 4)
+
+# unfused computation
+QValuesRef = policyNet(state).gather(1, action)
+QNext = torch.zeros(batchSize)
+QNext[nonFinalMask] = targetNet(nonFinalNextState).max(1)[0].detach()
+targetRef = reward + gamma * QNext.unsqueeze(-1)
+nextAction = policyNet(nonFinalNextState).max(1)[1].unsqueeze(-1)
+QNext = torch.zeros(batchSize)
+QNext[nonFinalMask] = targetNet(nonFinalNextState).gather(1, nextAction).squeeze(-1).detach()
+doubleRef = reward + gamma * QNext.unsqueeze(-1)
+
+for fuseForward in [True, False]:
+    tdTarget = TDTarget(fuseForward=fuseForward)
+    for updateOption, ref in [('targetNet', targetRef), ('doubleQ', doubleRef)]:
+        QValues, targetValues = tdTarget.compute(updateOption, policyNet, targetNet, state, action, reward,
+                                                 nonFinalNextState, nonFinalMask, gamma)
+        assert torch.allclose(QValues, QValuesRef, atol=1e-6)
+        assert torch.allclose(targetValues, ref, atol=1e-6)
+        assert not targetValues.requires_grad
+
+# gradients flow only through the Q values of the actions
+policyNet.zero_grad()
+QValues, targetValues = TDTarget().compute('doubleQ', policyNet, targetNet, state, action, reward,
+                                           nonFinalNextState, nonFinalMask, gamma)
+torch.mean((QValues - targetValues) ** 2).backward()
+grad = [p.grad.clone() for p in policyNet.parameters()]
+policyNet.zero_grad()
+torch.mean((QValuesRef - doubleRef) ** 2).backward()
+for g, p in zip(grad, policyNet.parameters()):
+    assert torch.allclose(g, p.grad, atol=1e-6)
+
+# dictionary states, next stage bootstrap and all terminal batches
+dictNet = lambda s: policyNet(s['x'])
+dictState = {'x': state}
+dictNext = {'x': nonFinalNextState}
+finalMask = ~nonFinalMask
+finalNextState = torch.randn(int(finalMask.sum()), 4)
+finalValue = lambda s: targetNet(s).max(1)[0]
+QValues, targetValues = TDTarget().compute('doubleQ', dictNet, lambda s: targetNet(s['x']), dictState, action, reward,
+                                           dictNext, nonFinalMask, gamma, finalNextState, finalMask, finalValue)
+QNext = torch.zeros(batchSize)
+QNext[nonFinalMask] = doubleRef[nonFinalMask].squeeze(-1) - reward[nonFinalMask].squeeze(-1)
+QNext[nonFinalMask] /= gamma
+QNext[finalMask] = finalValue(finalNextState).detach()
+assert torch.allclose(targetValues, reward + gamma * QNext.unsqueeze(-1), atol=1e-5)
+
+QValues, targetValues = TDTarget().compute('doubleQ', policyNet, targetNet, state, action, reward,
+                                           torch.zeros(0, 4), torch.zeros(batchSize, dtype=torch.bool), gamma)
+assert torch.allclose(targetValues, reward)
+
+print('TDTarget tests passed')
@@ -33,3 +33,35 @@ class OUNoise(object):
     #    ou_state = self.evolve_state()
     #    self.sigma = self.max_sigma - (self.max_sigma - self.min_sigma) * min(1.0, t / self.decay_period)
     #    return np.clip(action + ou_state, self.low, self.high)
+
+
+# Ornstein-Ulhenbeck Processes of a batch of environments, one independent process per row
+class VecOUNoise(object):
+    def __init__(self, numEnvs, action_dim, seed = 1, mu=0.0, theta=0.5, max_sigma=0.3, min_sigma=0.3, decay_period=100000):
+        self.numEnvs = numEnvs
+        self.mu = mu
+        self.theta = theta
+        self.sigma = max_sigma
+        self.max_sigma = max_sigma
+        self.min_sigma = min_sigma
+        self.decay_period = decay_period
+        self.action_dim = action_dim
+        # own random state, so that seeding does not touch the global numpy random state
+        self.random = np.random.RandomState(seed)
+        self.state = np.ones((self.numEnvs, self.action_dim), dtype=np.float32) * self.mu
+        self.t = 0.0
+
+    def reset(self, indices=None):
+        # reset the processes of the given rows, e.g., environments whose episodes ended, default all rows
+        if indices is None:
+            indices = slice(None)
+            self.t = 0.0
+        self.state[indices] = self.mu
+
+    def get_noise(self):
+        self.t += 1.0
+        self.sigma = self.max_sigma - (self.max_sigma - self.min_sigma) * min(1.0, self.t / self.decay_period)
+        x = self.state
+        dx = self.theta * (self.mu - x) + self.sigma * self.random.randn(self.numEnvs, self.action_dim)
+        self.state = (x + dx).astype(np.float32)
+        return self.state